@@ -26,6 +26,7 @@
 '''usage: python run_tests.py
             [--verbose] [--log-to-stdout] [--cleanup] [--bin=<path>]
             [--parallel | --parallel=<n>] [--global-scheduler]
+            [--persistent-workers] [--timings-file=<file>] [--stream-log]
             [--url=<base-url>] [--http-library=<http-library>] [--enable-sasl]
             [--fs-type=<fs-type>] [--fsfs-packing] [--fsfs-sharding=<n>]
             [--list] [--milestone-filter=<regex>] [--mode-filter=<type>]
@@ -34,7 +35,9 @@
             [--config-file=<file>] [--ssl-cert=<file>]
             [--exclusive-wc-locks] [--memcached-server=<url:port>]
             [--fsfs-compression=<type>] [--fsfs-dir-deltification=<true|false>]
-            [--allow-remote-http-connection]
+            [--allow-remote-http-connection] [--clone-repos]
+            [--verify-checkout] [--fork-server]
+            [--work-dir-in-memory] [--work-dir-in-memory-limit=<MB>]
             <abs_srcdir> <abs_builddir>
             <prog ...>
 
@@ -49,9 +52,10 @@ separated list of test numbers; the default is to run all the tests in it.
 
 import os, sys, shutil
 import re
+import json
 import logging
 import optparse, subprocess, threading, traceback
-from datetime import datetime
+from datetime import datetime, timedelta
 
 try:
   # Python >=3.0
@@ -63,6 +67,9 @@ except ImportError:
 if sys.version_info < (3, 0):
   # Python >= 3.0 already has this build in
   import exceptions
+  from cStringIO import StringIO
+else:
+  from io import StringIO
 
 if sys.version_info < (3, 5):
   import imp
@@ -176,6 +183,152 @@ def open_logfile(filename, mode, encoding='utf-8'):
         return getattr(self._stream, name)
     return Wrapper(open(filename, mode), encoding)
 
+def load_py_test_module(progabs, progbase):
+  '''Import the Python test program PROGABS (whose file name is PROGBASE)
+  as a module and return it.'''
+  if sys.version_info < (3, 0):
+    prog_mod = imp.load_module(progbase[:-3], open(progabs, 'r'), progabs,
+                               ('.py', 'U', imp.PY_SOURCE))
+  elif sys.version_info < (3, 5):
+    prog_mod = imp.load_module(progbase[:-3],
+                               open(progabs, 'r', encoding="utf-8"),
+                               progabs, ('.py', 'U', imp.PY_SOURCE))
+  else:
+     spec = importlib.util.spec_from_file_location(progbase[:-3], progabs)
+     prog_mod = importlib.util.module_from_spec(spec)
+     sys.modules[progbase[:-3]] = prog_mod
+     spec.loader.exec_module(prog_mod)
+  return prog_mod
+
+# Written by a Python test worker on its stderr after each request, so that
+# the scheduler knows which test any other output there belongs to.
+WORKER_STDERR_END = '--- end of svntest worker request ---\n'
+
+# How long to wait for the rest of the stderr of a worker that died.
+WORKER_STDERR_TIMEOUT = 5
+
+def run_py_test_worker(testdir, cmdline):
+  '''Run individual Python tests on request, as a persistent worker
+  process of the global scheduler.  TESTDIR is the directory that contains
+  the svntest package, CMDLINE are the options for the tests.
+
+  Each request is a line on stdin with a JSON object naming the test
+  program ("progabs") and the test number ("number").  Each reply is a
+  line on stdout with a JSON object holding the exit code ("result") and
+  the output ("stdout", "stderr") of the test, as it would have been
+  produced by running the test in a child process.  If "restart" is set
+  in the reply, the worker has stopped serving requests.  Anything else
+  written to stderr while serving a request, e.g. by child processes, is
+  followed by WORKER_STDERR_END.'''
+
+  # Keep the real stdout for the replies; anything else that writes to
+  # that file descriptor (e.g. an inheriting child process) goes to stderr.
+  replies = os.fdopen(os.dup(sys.stdout.fileno()), 'w')
+  os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+  sys.stdout = StringIO()
+
+  sys.path.insert(0, testdir)
+  global svntest
+  __import__('svntest')
+  __import__('svntest.main')
+  __import__('svntest.testcase')
+  svntest = sys.modules['svntest']
+  svntest.main = sys.modules['svntest.main']
+  svntest.testcase = sys.modules['svntest.testcase']
+
+  # Run in "child process" mode, i.e. w/o setting up or cleaning up the
+  # global directories; the scheduler has already done that.
+  svntest.main.parse_options(cmdline + ['-c'], optparse.SUPPRESS_USAGE)
+  svntest.main.tweak_options_for_precooked_repos()
+  svntest.testcase.TextColors.disable()
+
+  modules = {}
+  saved_stds = sys.stdout, sys.stderr
+  for request in iter(sys.stdin.readline, ''):
+    request = json.loads(request)
+    progabs = request['progabs']
+    restart = False
+    sys.stdout = StringIO()
+    sys.stderr = StringIO()
+    try:
+      if progabs not in modules:
+        modules[progabs] = load_py_test_module(progabs,
+                                               os.path.basename(progabs))
+      result = svntest.main.execute_tests(
+                 modules[progabs].test_list, test_name=progabs,
+                 test_selection=[str(request['number'])])
+    except SystemExit as ex:
+      # The test asked for its process to die; don't trust our state
+      # any longer.
+      if ex.code is None or isinstance(ex.code, int):
+        result = ex.code or 0
+      else:
+        sys.stderr.write('%s\n' % ex.code)
+        result = 1
+      restart = True
+    except:
+      traceback.print_exc()
+      result = 1
+      restart = True
+
+    reply = { 'result' : result,
+              'stdout' : sys.stdout.getvalue(),
+              'stderr' : sys.stderr.getvalue(),
+              'restart' : restart }
+    sys.stdout, sys.stderr = saved_stds
+    sys.stderr.write(WORKER_STDERR_END)
+    sys.stderr.flush()
+    replies.write(json.dumps(reply) + '\n')
+    replies.flush()
+    if restart:
+      break
+
+class TestTimings:
+  '''The wall clock time taken by each test in previous runs, kept in a
+  JSON file so that the global scheduler can start the slowest tests first.
+  '''
+
+  def __init__(self, filename):
+    self.filename = filename
+    self.timings = {}
+    try:
+      with open(filename, 'r') as f:
+        timings = json.load(f)['timings']
+      if isinstance(timings, dict):
+        self.timings = timings
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+      # No usable timings yet; they will be recorded after this run.
+      pass
+
+  def expected(self, job, default=None):
+    '''Return the number of seconds JOB is expected to take, or DEFAULT if
+    it has not been run before.'''
+    return self.timings.get(job.timing_key(), default)
+
+  def record(self, job):
+    '''Remember the time taken by JOB, if it has been executed.'''
+    if job.result is None or not isinstance(job.taken, timedelta):
+      # The job never ran, or failed to; its time means nothing.
+      return
+    taken = job.taken.total_seconds()
+    previous = self.timings.get(job.timing_key())
+    if previous is not None:
+      # Smooth out the noise of individual runs.
+      taken = (previous + taken) / 2
+    self.timings[job.timing_key()] = taken
+
+  def save(self):
+    '''Write the timings back to the file they were read from.'''
+    dirname = os.path.dirname(self.filename)
+    if dirname and not os.path.isdir(dirname):
+      os.makedirs(dirname)
+    tmpname = self.filename + '.tmp'
+    with open(tmpname, 'w') as f:
+      json.dump({ 'timings' : self.timings }, f, indent=0, sort_keys=True)
+    if os.path.exists(self.filename):
+      os.remove(self.filename)
+    os.rename(tmpname, self.filename)
+
 class TestHarness:
   '''Test harness for Subversion tests.
   '''
@@ -294,6 +447,17 @@ class TestHarness:
       cmdline.append('--server-minor-version=%d' % self.opts.server_minor_version)
     if self.opts.dump_load_cross_check is not None:
       cmdline.append('--dump-load-cross-check')
+    if self.opts.clone_repos is not None:
+      cmdline.append('--clone-repos')
+    if self.opts.verify_checkout is not None:
+      cmdline.append('--verify-checkout')
+    if self.opts.fork_server is not None:
+      cmdline.append('--fork-server')
+    if self.opts.work_dir_in_memory is not None:
+      cmdline.append('--work-dir-in-memory')
+    if self.opts.work_dir_in_memory_limit is not None:
+      cmdline.append('--work-dir-in-memory-limit=%d'
+                     % self.opts.work_dir_in_memory_limit)
     if self.opts.enable_sasl is not None:
       cmdline.append('--enable-sasl')
     if self.opts.config_file is not None:
@@ -364,12 +528,30 @@ class TestHarness:
       self.stderr_lines = []
       self.taken = 0
 
+    def mark_unfinished(self):
+      '''If this job has not finished, e.g. because its thread died, make
+      it a failure of its own.'''
+      if self.result is None:
+        # Not 1, so that it is reported as an unknown failure.
+        self.result = 2
+        self.stderr_lines = ['%s %d did not finish\n'
+                             % (self.progbase, self.number)]
+      if not isinstance(self.taken, timedelta):
+        self.taken = timedelta(0)
+
     def test_count(self):
       if self.is_python:
         return 1
       else:
         return self.number
 
+    def timing_key(self):
+      '''Return the name of this job in the timings file.'''
+      if self.is_python:
+        return '%s#%d' % (self.progbase, self.number)
+      else:
+        return self.progbase
+
     def _command_line(self, harness):
       if self.is_python:
         cmdline = list(harness.py_test_cmdline)
@@ -385,19 +567,115 @@ class TestHarness:
         cmdline[1] = '--srcdir=%s' % os.path.join(harness.srcdir, self.progdir)
       return cmdline
 
-    def execute(self, harness):
+    def execute(self, harness, worker=None):
       start_time = datetime.now()
-      with Popen(self._command_line(harness),
-                 stdout=subprocess.PIPE,
-                 stderr=subprocess.PIPE,
-                 cwd=self.progdir) as prog:
-
-        self.stdout_lines = prog.stdout.readlines()
-        self.stderr_lines = prog.stderr.readlines()
-        prog.wait()
-        self.result = prog.returncode
+      if worker is not None:
+        self.result, self.stdout_lines, self.stderr_lines = worker.run(self)
+      else:
+        with Popen(self._command_line(harness),
+                   stdout=subprocess.PIPE,
+                   stderr=subprocess.PIPE,
+                   cwd=self.progdir) as prog:
+
+          self.stdout_lines = prog.stdout.readlines()
+          self.stderr_lines = prog.stderr.readlines()
+          prog.wait()
+          self.result = prog.returncode
       self.taken = datetime.now() - start_time
 
+  class PyTestWorker:
+    '''A persistent process that runs individual Python tests for the
+    global scheduler, so that starting the interpreter, importing svntest
+    and parsing the options is done once per worker rather than once per
+    test.  See run_py_test_worker() for the protocol.'''
+
+    def __init__(self, harness, progdir):
+      testdir = os.path.abspath(os.path.join(harness.srcdir, progdir))
+      cmdline = [sys.executable, os.path.abspath(__file__),
+                 '--py-test-worker', testdir] + harness.py_test_cmdline
+      self.proc = subprocess.Popen(cmdline,
+                                   stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE,
+                                   cwd=progdir,
+                                   universal_newlines=True)
+      self.finished = False
+
+      # Drain the worker's stderr as it comes, so that it never blocks on
+      # a full pipe; run() hands it to the log with the job's output.
+      self.stderr_queue = queue.Queue()
+      self.stderr_eof = False
+      self.stderr_reader = threading.Thread(target=self._read_stderr)
+      self.stderr_reader.daemon = True
+      self.stderr_reader.start()
+
+    def _read_stderr(self):
+      for line in iter(self.proc.stderr.readline, ''):
+        self.stderr_queue.put(line)
+      self.stderr_queue.put(None)
+
+    def _collect_stderr(self, timeout=None):
+      '''Return the lines the worker wrote to stderr up to the next
+      WORKER_STDERR_END, or up to its end if the worker stopped, waiting at
+      most TIMEOUT seconds for each line.'''
+      lines = []
+      while not self.stderr_eof:
+        try:
+          line = self.stderr_queue.get(timeout=timeout)
+        except queue.Empty:
+          break
+        if line is None:
+          self.stderr_eof = True
+        elif line.endswith(WORKER_STDERR_END):
+          # Possibly after an unterminated line.
+          if line != WORKER_STDERR_END:
+            lines.append(line[:-len(WORKER_STDERR_END)] + '\n')
+          break
+        else:
+          lines.append(line)
+      return lines
+
+    def run(self, job):
+      '''Run the Python test JOB in the worker.  Return its exit code and
+      its stdout and stderr as lists of lines.'''
+      request = { 'progabs' : job.progabs, 'number' : job.number }
+      try:
+        self.proc.stdin.write(json.dumps(request) + '\n')
+        self.proc.stdin.flush()
+        reply = self.proc.stdout.readline()
+      except (IOError, OSError):
+        reply = ''
+
+      if not reply:
+        self.close()
+        return (self.proc.returncode or 1, [],
+                self._collect_stderr(WORKER_STDERR_TIMEOUT)
+                + ['Python test worker died while running %s %d\n'
+                   % (job.progbase, job.number)])
+
+      reply = json.loads(reply)
+      stderr_lines = self._collect_stderr()
+      if reply['restart']:
+        self.close()
+        stderr_lines += self._collect_stderr(WORKER_STDERR_TIMEOUT)
+      return (reply['result'],
+              reply['stdout'].splitlines(True),
+              stderr_lines + reply['stderr'].splitlines(True))
+
+    def close(self):
+      '''Stop the worker and wait for it to exit.'''
+      self.finished = True
+      try:
+        self.proc.stdin.close()
+      except (IOError, OSError):
+        pass
+      self.proc.wait()
+      self.proc.stdout.close()
+      # Child processes left behind may keep the pipe open.
+      self.stderr_reader.join(WORKER_STDERR_TIMEOUT)
+      if not self.stderr_reader.is_alive():
+        self.proc.stderr.close()
+
   class CollectingThread(threading.Thread):
     '''A thread that lists the individual tests in a given case and creates
     jobs objects for them.  in  in  test cases in their own processes.
@@ -449,26 +727,105 @@ class TestHarness:
     Receives test jobs to run from the queue, and shows some progress
     indication on stdout.  The detailed test results are stored inside
     the job objects.'''
-    def __init__(self, queue, harness):
+    def __init__(self, queue, harness, job_finished=None):
       threading.Thread.__init__(self)
       self.queue = queue
       self.harness = harness
+      self.job_finished = job_finished
       self.results = []
 
     def run(self):
-      while True:
-        try:
-          job = self.queue.get_nowait()
-        except queue.Empty:
-          return
+      worker = None
+      try:
+        while True:
+          try:
+            job = self.queue.get_nowait()
+          except queue.Empty:
+            return
+
+          if job.is_python and self.harness.opts.persistent_workers:
+            if worker is None or worker.finished:
+              worker = TestHarness.PyTestWorker(self.harness, job.progdir)
+            job.execute(self.harness, worker)
+          else:
+            job.execute(self.harness)
+
+          if self.job_finished:
+            self.job_finished(job)
+
+          if job.result:
+            os.write(sys.stdout.fileno(), b'!' * job.test_count())
+          else:
+            os.write(sys.stdout.fileno(), b'.' * job.test_count())
+      finally:
+        if worker is not None and not worker.finished:
+          worker.close()
 
-        job.execute(self.harness)
 
-        if job.result:
-          os.write(sys.stdout.fileno(), b'!' * job.test_count())
-        else:
-          os.write(sys.stdout.fileno(), b'.' * job.test_count())
+  class StreamingResults:
+    '''Writes the output of each finished job to the log as soon as all
+    jobs before it from the same test program have been written, and then
+    drops it.  This keeps the log in test order within each test program
+    without holding the output of the whole run in memory.'''
 
+    def __init__(self, harness, log, jobs):
+      self.harness = harness
+      self.log = log
+      self.lock = threading.Lock()
+      self.failed = 0
+      # Reorder buffers: the not yet logged jobs of each test program, in
+      # order, and the set of those that have finished.
+      self.pending = {}
+      self.finished = set()
+      self.taken = {}
+      for job in jobs:
+        self.pending.setdefault(job.progbase, []).append(job)
+
+    def job_finished(self, job):
+      '''Log JOB and any jobs that were waiting for it.  Called from the
+      TestSpawningThread that executed JOB.'''
+      with self.lock:
+        self.finished.add(job)
+        pending = self.pending[job.progbase]
+        while pending and pending[0] in self.finished:
+          done = pending.pop(0)
+          self.finished.remove(done)
+          self._log(done)
+
+        if not pending:
+          self._log_elapsed(job.progbase)
+        self.log.flush()
+
+    def finish(self):
+      '''Log the jobs still waiting after all threads have stopped, i.e.
+      those behind, or themselves, jobs that never finished.  Count the
+      latter as failures.  Return whether any job failed.'''
+      with self.lock:
+        for progbase, pending in self.pending.items():
+          if not pending:
+            continue
+          for job in pending:
+            job.mark_unfinished()
+            self._log(job)
+          del pending[:]
+          self._log_elapsed(progbase)
+        self.finished.clear()
+        self.log.flush()
+      return self.failed
+
+    def _log(self, done):
+      self.harness._log_job_output(self.log, done)
+      self.failed = done.result or self.failed
+      if done.progbase in self.taken:
+        self.taken[done.progbase] += done.taken
+      else:
+        self.taken[done.progbase] = done.taken
+      done.stdout_lines = []
+      done.stderr_lines = []
+
+    def _log_elapsed(self, progbase):
+      self.log.write('ELAPSED: %s %s\n\n'
+                     % (progbase, str(self.taken[progbase])))
 
   def _run_global_scheduler(self, testlist, has_py_tests):
     # Collect all tests to execute (separate jobs for each test in python
@@ -494,6 +851,12 @@ class TestHarness:
     scrambled = list(jobs)
     # TODO: What's this line doing, and what's the magic number?
     scrambled.sort(key=lambda x: ("1" if x.test_count() < 30 else "0") + str(x.number))
+    if self.opts.timings_file:
+      # Start the tests that took longest in previous runs first, so that
+      # no slow test is left running alone at the end.  Tests without
+      # recorded timings keep their order and go before all others.
+      timings = TestTimings(self.opts.timings_file)
+      scrambled.sort(key=lambda x: -timings.expected(x, float('inf')))
     for job in scrambled:
       total_count += job.test_count()
       job_queue.put(job)
@@ -525,7 +888,14 @@ class TestHarness:
     print('Tests to execute: %d' % total_count)
     sys.stdout.flush()
 
-    threads = [ TestHarness.TestSpawningThread(job_queue, self)
+    if self.opts.stream_log:
+      results = TestHarness.StreamingResults(self, log, jobs)
+      job_finished = results.job_finished
+    else:
+      results = None
+      job_finished = None
+
+    threads = [ TestHarness.TestSpawningThread(job_queue, self, job_finished)
                 for i in range(thread_count) ]
     for t in threads:
       t.start()
@@ -534,11 +904,22 @@ class TestHarness:
 
     print("")
 
+    if self.opts.timings_file and not self.opts.list_tests:
+      for job in jobs:
+        timings.record(job)
+      timings.save()
+
+    if results is not None:
+      # Everything has been logged while the tests were running, except
+      # what a job that never finished held back.
+      return results.finish()
+
     # Aggregate and log the results
     failed = 0
     taken = 0
     last_test_name = ""
     for job in jobs:
+      job.mark_unfinished()
       if last_test_name != job.progbase:
         if last_test_name != "":
           log.write('ELAPSED: %s %s\n\n' % (last_test_name, str(taken)))
@@ -547,19 +928,23 @@ class TestHarness:
       else:
         taken += job.taken
 
-      for line in job.stderr_lines:
-        log.write(ensure_str(line))
-
-      for line in job.stdout_lines:
-        self._process_test_output_line(ensure_str(line))
-
-      self._check_for_unknown_failure(log, job.progbase, job.result)
+      self._log_job_output(log, job)
       failed = job.result or failed
 
     log.write('ELAPSED: %s %s\n\n' % (last_test_name, str(taken)))
 
     return failed
 
+  def _log_job_output(self, log, job):
+    '''Write the output of the executed JOB to LOG.'''
+    for line in job.stderr_lines:
+      log.write(ensure_str(line))
+
+    for line in job.stdout_lines:
+      self._process_test_output_line(ensure_str(line))
+
+    self._check_for_unknown_failure(log, job.progbase, job.result)
+
   def _run_local_schedulers(self, testlist):
     '''Serial execution of all test suites using their respective internal
     schedulers.'''
@@ -618,12 +1003,28 @@ class TestHarness:
       self._init_c_tests()
       c_tests.sort(key=lambda x: x[1])
 
+    # Keep the sandboxes of all Python tests in memory for the whole run.
+    memory_work_dir = None
+    if len(py_tests) and self.opts.work_dir_in_memory:
+      old_cwd = os.getcwd()
+      os.chdir(py_tests[0][0])
+      if svntest.main.setup_work_dir_in_memory():
+        memory_work_dir = os.getcwd()
+      os.chdir(old_cwd)
+
     # Run the tests
     testlist = c_tests + py_tests
-    if self.opts.global_scheduler is None:
-      failed = self._run_local_schedulers(testlist)
-    else:
-      failed = self._run_global_scheduler(testlist, len(py_tests) > 0)
+    try:
+      if self.opts.global_scheduler is None:
+        failed = self._run_local_schedulers(testlist)
+      else:
+        failed = self._run_global_scheduler(testlist, len(py_tests) > 0)
+    finally:
+      if memory_work_dir:
+        old_cwd = os.getcwd()
+        os.chdir(memory_work_dir)
+        svntest.main.teardown_work_dir_in_memory()
+        os.chdir(old_cwd)
 
     # Open the log again to for filtering.
     if self.logfile:
@@ -860,18 +1261,7 @@ class TestHarness:
   def _run_py_test(self, progabs, progdir, progbase, test_nums, dot_count):
     'Run a python test, passing parameters as needed.'
     try:
-      if sys.version_info < (3, 0):
-        prog_mod = imp.load_module(progbase[:-3], open(progabs, 'r'), progabs,
-                                   ('.py', 'U', imp.PY_SOURCE))
-      elif sys.version_info < (3, 5):
-        prog_mod = imp.load_module(progbase[:-3],
-                                   open(progabs, 'r', encoding="utf-8"),
-                                   progabs, ('.py', 'U', imp.PY_SOURCE))
-      else:
-         spec = importlib.util.spec_from_file_location(progbase[:-3], progabs)
-         prog_mod = importlib.util.module_from_spec(spec)
-         sys.modules[progbase[:-3]] = prog_mod
-         spec.loader.exec_module(prog_mod)
+      prog_mod = load_py_test_module(progabs, progbase)
     except:
       print("\nError loading test (details in following traceback): " + progbase)
       traceback.print_exc()
@@ -1027,6 +1417,17 @@ def create_parser():
                     help='Subversion file system type (fsfs(-v[46]), bdb or fsx)')
   parser.add_option('-g', '--global-scheduler', action='store_true',
                     help='Run tests from all scripts together')
+  parser.add_option('--persistent-workers', action='store_true',
+                    help='Run Python tests in persistent worker processes ' +
+                         '(with --global-scheduler)')
+  parser.add_option('--stream-log', action='store_true',
+                    help='Write test results to the log while the tests ' +
+                         'are running (with --global-scheduler)')
+  parser.add_option('--timings-file', action='store',
+                    help='Record test durations in this file and run the ' +
+                         'slowest tests first (with --global-scheduler; ' +
+                         'default: subversion/tests/cmdline/svn-test-work/' +
+                         'tests-timings.json in the build directory)')
   parser.add_option('--http-library', action='store',
                     help="Make svn use this DAV library (neon or serf)")
   parser.add_option('--bin', action='store', dest='svn_bin',
@@ -1044,6 +1445,21 @@ def create_parser():
                          "tests with svnadmin, svnrdump and svndumpfilter " +
                          " on the testcase repositories to cross-check " +
                          " dump file compatibility.")
+  parser.add_option('--clone-repos', action='store_true',
+                    help="Copy the pristine repositories by cloning an " +
+                         "on-disk template instead of dump/load (fsfs only)")
+  parser.add_option('--verify-checkout', action='store_true',
+                    help="Check out and verify every sandbox's working copy " +
+                         "instead of copying a pristine template")
+  parser.add_option('--fork-server', action='store_true',
+                    help="With --parallel, fork each Python test from an " +
+                         "initialized process instead of starting it anew")
+  parser.add_option('--work-dir-in-memory', action='store_true',
+                    help="Keep the Python tests' repositories and working " +
+                         "copies on a memory-backed file system")
+  parser.add_option('--work-dir-in-memory-limit', action='store', type='int',
+                    help="Space in MB the sandboxes may take in memory " +
+                         "with --work-dir-in-memory")
   parser.add_option('--enable-sasl', action='store_true',
                     help='Whether to enable SASL authentication')
   parser.add_option('--config-file', action='store',
@@ -1087,6 +1503,11 @@ def create_parser():
   return parser
 
 def main():
+  if sys.argv[1:2] == ['--py-test-worker']:
+    # We were started by PyTestWorker.
+    run_py_test_worker(sys.argv[2], sys.argv[3:])
+    return
+
   (opts, args) = create_parser().parse_args(sys.argv[1:])
 
   if len(args) < 3:
@@ -1102,6 +1523,13 @@ def main():
     logfile = os.path.abspath('tests.log')
     faillogfile = os.path.abspath('fails.log')
 
+  # Keep the timings with the other scratch files of the tests, so that
+  # 'make check-clean' removes them.
+  if opts.global_scheduler and opts.timings_file is None:
+    opts.timings_file = os.path.join(args[1], 'subversion', 'tests',
+                                     'cmdline', 'svn-test-work',
+                                     'tests-timings.json')
+
   th = TestHarness(args[0], args[1], logfile, faillogfile, opts)
   failed = th.run(args[2:])
   if failed:
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+
+# ====================================================================
+#    Licensed to the Apache Software Foundation (ASF) under one
+#    or more contributor license agreements.  See the NOTICE file
+#    distributed with this work for additional information
+#    regarding copyright ownership.  The ASF licenses this file
+#    to you under the Apache License, Version 2.0 (the
+#    "License"); you may not use this file except in compliance
+#    with the License.  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing,
+#    software distributed under the License is distributed on an
+#    "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+#    KIND, either express or implied.  See the License for the
+#    specific language governing permissions and limitations
+#    under the License.
+# ====================================================================
+
+# Unit tests of the global scheduler's helpers in run_tests.py, which
+# don't need any test programs.  Run this without arguments.
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import timedelta
+
+import run_tests
+
+
+def make_job(number, result=None, taken=None):
+  job = run_tests.TestHarness.Job(number, True, '/tmp/foo_tests.py',
+                                  'subversion/tests/cmdline', 'foo_tests.py')
+  if result is not None:
+    job.result = result
+    job.taken = taken
+  return job
+
+class TestTimingsTestCase(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+    # Its directory is only created when the timings are saved.
+    self.filename = os.path.join(self.tmpdir, 'svn-test-work',
+                                 'timings.json')
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def test_record(self):
+    timings = run_tests.TestTimings(self.filename)
+    timings.record(make_job(1, 0, timedelta(seconds=4)))
+    timings.record(make_job(1, 1, timedelta(seconds=2)))
+    timings.save()
+    timings = run_tests.TestTimings(self.filename)
+    self.assertEqual(timings.expected(make_job(1)), 3)
+
+  def test_record_unexecuted(self):
+    # Jobs that never ran, e.g. because their thread died, are skipped
+    # rather than breaking the recording of the others.
+    timings = run_tests.TestTimings(self.filename)
+    timings.record(make_job(1))
+    timings.record(make_job(2, 0, timedelta(seconds=1)))
+    timings.save()
+    timings = run_tests.TestTimings(self.filename)
+    self.assertEqual(timings.expected(make_job(1)), None)
+    self.assertEqual(timings.expected(make_job(2)), 1)
+
+class FakeHarness:
+  "Logs what TestHarness._log_job_output() is given."
+  def _log_job_output(self, log, job):
+    log.write('%d %s %s\n' % (job.number, job.result,
+                              ''.join(job.stderr_lines).strip()))
+
+class StreamingResultsTestCase(unittest.TestCase):
+  def test_unfinished_job(self):
+    # Job 1 never finishes, e.g. because its thread died; jobs 2 and 3
+    # are held back behind it until finish().
+    log = run_tests.StringIO()
+    jobs = [make_job(1), make_job(2), make_job(3)]
+    results = run_tests.TestHarness.StreamingResults(FakeHarness(), log, jobs)
+    for job in jobs[1:]:
+      job.result = 0
+      job.taken = timedelta(seconds=1)
+      results.job_finished(job)
+    self.assertEqual(log.getvalue(), '')
+
+    self.assertTrue(results.finish())
+    lines = log.getvalue().splitlines()
+    self.assertEqual(lines[0], '1 2 foo_tests.py 1 did not finish')
+    self.assertEqual(lines[1:3], ['2 0 ', '3 0 '])
+    self.assertEqual(lines[3], 'ELAPSED: foo_tests.py 0:00:02')
+
+NOISY_TESTS = '''
+import os
+def noisy(sbox):
+  "writes to stderr from a child process"
+  os.system('echo child >&2; printf unterminated >&2')
+def quiet(sbox):
+  "writes nothing"
+test_list = [None, noisy, quiet]
+'''
+
+class PyTestWorkerTestCase(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.progabs = os.path.join(self.tmpdir, 'noisy_tests.py')
+    with open(self.progabs, 'w') as f:
+      f.write(NOISY_TESTS)
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def test_child_stderr(self):
+    # What child processes write to the worker's stderr is returned with
+    # the output of the test that ran them.
+    harness = FakeHarness()
+    harness.srcdir = os.path.dirname(os.path.dirname(
+                                       os.path.abspath(__file__)))
+    harness.py_test_cmdline = []
+    progdir = os.path.join(harness.srcdir, 'subversion', 'tests', 'cmdline')
+    worker = run_tests.TestHarness.PyTestWorker(harness, progdir)
+    try:
+      jobs = [run_tests.TestHarness.Job(number, True, self.progabs, progdir,
+                                        'noisy_tests.py')
+              for number in (1, 2)]
+      result, stdout_lines, stderr_lines = worker.run(jobs[0])
+      self.assertEqual(result, 0)
+      self.assertEqual(stderr_lines, ['child\n', 'unterminated\n'])
+      result, stdout_lines, stderr_lines = worker.run(jobs[1])
+      self.assertEqual(result, 0)
+      self.assertEqual(stderr_lines, [])
+    finally:
+      worker.close()
+
+
+if __name__ == '__main__':
+  unittest.main()
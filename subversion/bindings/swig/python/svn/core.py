@@ -26,6 +26,7 @@
 from libsvn.core import *
 import libsvn.core as _libsvncore
 import atexit as _atexit
+import io as _io
 import sys
 
 # __all__ is defined later, since some svn_* functions are implemented below.
@@ -179,17 +180,35 @@ class Stream:
       raise ValueError
     if amt is None:
       # read the rest of the stream
-      chunks = [ ]
-      while True:
-        data = svn_stream_read(self._stream, SVN_STREAM_CHUNK_SIZE)
-        if not data:
-          break
-        chunks.append(data)
-      return b''.join(chunks)
+      return b''.join(self)
 
     # read the amount specified
     return svn_stream_read(self._stream, int(amt))
 
+  def readinto(self, b):
+    """Read up to len(B) bytes into the writable buffer B, such as a
+    bytearray or a memoryview, and return the number of bytes read, 0 at
+    the end of the stream."""
+    if self._stream is None:
+      raise ValueError
+    view = memoryview(b)
+    if hasattr(view, 'cast'):
+      view = view.cast('B')
+    data = svn_stream_read(self._stream, len(view))
+    view[:len(data)] = data
+    return len(data)
+
+  def __iter__(self):
+    """Iterate over the rest of the stream, in chunks of at most
+    SVN_STREAM_CHUNK_SIZE bytes."""
+    while True:
+      if self._stream is None:
+        raise ValueError
+      data = svn_stream_read(self._stream, SVN_STREAM_CHUNK_SIZE)
+      if not data:
+        return
+      yield data
+
   def write(self, buf):
     if self._stream is None:
       raise ValueError
@@ -201,6 +220,50 @@ class Stream:
       svn_stream_close(self._stream)
       self._stream = None
 
+class StreamIO(_io.RawIOBase):
+  """An io.RawIOBase for a Stream or an svn_stream_t, to use it where Python
+  expects a binary file: to wrap it in an io.BufferedReader, to pass it to
+  shutil.copyfileobj(), and so on.
+
+  A stream cannot tell whether it supports reading or writing, so say it
+  with READABLE and WRITABLE; by default, as for svn.fs.file_contents(),
+  it is only read."""
+  def __init__(self, stream, readable=True, writable=False):
+    _io.RawIOBase.__init__(self)
+    if not isinstance(stream, Stream):
+      stream = Stream(stream)
+    self._wrapped = stream
+    self._readable = readable
+    self._writable = writable
+
+  def readable(self):
+    return self._readable
+
+  def writable(self):
+    return self._writable
+
+  def readinto(self, b):
+    if self.closed:
+      raise ValueError('I/O operation on closed stream')
+    if not self._readable:
+      raise _io.UnsupportedOperation('read')
+    return self._wrapped.readinto(b)
+
+  def write(self, b):
+    if self.closed:
+      raise ValueError('I/O operation on closed stream')
+    if not self._writable:
+      raise _io.UnsupportedOperation('write')
+    if not isinstance(b, bytes):
+      b = memoryview(b).tobytes()
+    self._wrapped.write(b)
+    return len(b)
+
+  def close(self):
+    if not self.closed:
+      self._wrapped.close()
+    _io.RawIOBase.close(self)
+
 def secs_from_timestr(svn_datetime, pool=None):
   """Convert a Subversion datetime string into seconds since the Epoch."""
   aprtime = svn_time_from_cstring(svn_datetime, pool)
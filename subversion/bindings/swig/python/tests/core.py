@@ -20,6 +20,7 @@
 #
 import unittest
 import os
+import io
 import tempfile
 import sys
 
@@ -221,6 +222,61 @@ class SubversionCoreTestCase(unittest.TestCase):
     self.assertEqual(svn.core.svn_stream_read2(stream, 4096), b'')
     svn.core.svn_stream_close(stream)
 
+  def test_stream_readinto(self):
+    in_str = b'Python\x00Subversion\x00swig\r\nend'
+    stream = svn.core.Stream(svn.core.svn_stream_from_stringbuf(in_str))
+    buf = bytearray(16)
+    self.assertEqual(stream.readinto(buf), 16)
+    self.assertEqual(bytes(buf), in_str[:16])
+    view = memoryview(buf)
+    self.assertEqual(stream.readinto(view[4:]), len(in_str) - 16)
+    self.assertEqual(bytes(buf[4:len(in_str) - 12]), in_str[16:])
+    self.assertEqual(stream.readinto(buf), 0)
+    stream.close()
+    self.assertRaises(ValueError, stream.readinto, buf)
+
+  def test_stream_iter(self):
+    in_str = b'x' * (svn.core.SVN_STREAM_CHUNK_SIZE * 2 + 10)
+    stream = svn.core.Stream(svn.core.svn_stream_from_stringbuf(in_str))
+    chunks = list(stream)
+    self.assertEqual([len(chunk) for chunk in chunks],
+                     [svn.core.SVN_STREAM_CHUNK_SIZE,
+                      svn.core.SVN_STREAM_CHUNK_SIZE, 10])
+    self.assertEqual(b''.join(chunks), in_str)
+    self.assertEqual(list(stream), [])
+    stream.close()
+
+  def test_stream_io(self):
+    in_str = b'Python\x00Subversion\x00swig\r\nend\n' * 1000
+    raw = svn.core.StreamIO(svn.core.svn_stream_from_stringbuf(in_str))
+    self.assertTrue(raw.readable())
+    self.assertFalse(raw.writable())
+    self.assertRaises(io.UnsupportedOperation, raw.write, b'x')
+    reader = io.BufferedReader(raw)
+    self.assertEqual(reader.readline(), b'Python\x00Subversion\x00swig\r\n')
+    self.assertEqual(reader.read(), in_str[24:])
+    reader.close()
+    self.assertTrue(raw.closed)
+    self.assertRaises(ValueError, raw.readinto, bytearray(1))
+
+    fd, fname = tempfile.mkstemp()
+    fname_bytes = fname if isinstance(fname, bytes) else fname.encode('UTF-8')
+    os.close(fd)
+    try:
+      raw = svn.core.StreamIO(svn.core.svn_stream_from_aprfile2(fname_bytes,
+                                                                False),
+                              readable=False, writable=True)
+      self.assertFalse(raw.readable())
+      self.assertTrue(raw.writable())
+      self.assertEqual(raw.write(memoryview(in_str)[:10]), 10)
+      self.assertEqual(raw.write(in_str[10:]), len(in_str) - 10)
+      raw.close()
+      fp = open(fname, 'rb')
+      self.assertEqual(fp.read(), in_str)
+      fp.close()
+    finally:
+      os.remove(fname)
+
   @unittest.skipIf(not utils.IS_PY3 and utils.is_defaultencoding_utf8(),
                    "'utf-8' codecs of Python 2 accepts any unicode strings")
   def test_stream_write_exception(self):
@@ -112,12 +112,39 @@ def _setup_pristine_repo(tree_state,
                              output_tree.old_tree())
         sys.exit(1)
 
+    # Save a template for cheap copies of the pristine repos.
+    if main.use_repos_templates():
+      main.create_repos_template(repos_dir)
+
     # Finally, disallow any changes to the "pristine" repos.
     error_msg = "Don't modify the pristine repository"
     create_failing_hook(repos_dir, 'start-commit', error_msg)
     create_failing_hook(repos_dir, 'pre-lock', error_msg)
     create_failing_hook(repos_dir, 'pre-revprop-change', error_msg)
 
+def _setup_pristine_wc(tree_state, wc_dir, repos_url):
+  # Check out and verify the working copy that sandboxes copy instead of
+  # doing their own checkout.
+  if os.path.exists(wc_dir) or main.options.verify_checkout:
+    return
+  if main.options.use_jsvn or not main.python_sqlite_can_read_our_wc_db():
+    return
+
+  expected_output = tree_state.copy()
+  expected_output.wc_dir = wc_dir
+  expected_output.tweak(status='A ', contents=None)
+  run_and_verify_checkout(repos_url, wc_dir, expected_output, tree_state)
+
+  # Sandboxes write their own repository root URL into the copied wc.db,
+  # which is only safe if the client stored the URL the way we spell it.
+  db, root_path, relpath = wc.open_wc_db(wc_dir)
+  (root,) = db.execute('select root from repository').fetchone()
+  db.close()
+  if root != repos_url:
+    logger.info("Not using a working copy template: '%s' != '%s'"
+                % (root, repos_url))
+    main.safe_rmtree(wc_dir)
+
 def setup_pristine_repositories():
   """Create the pristine repository and 'svn import' the greek tree"""
 
@@ -138,13 +165,18 @@ def setup_pristine_repositories():
                        main.greek_dump_dir,
                        main.pristine_greek_repos_url)
 
-  # NOTE: We don't use precooked trojan repositories.
+  # NOTE: There are no precooked trojan repositories.  With --fsfs-version
+  # we clone the pristine one instead of doing dump/load for every sandbox.
   _setup_pristine_repo(main.trojan_state,
                        main.pristine_trojan_repos_dir,
                        main.trojan_dump_dir,
                        main.pristine_trojan_repos_url,
                        use_precooked=False)
 
+  _setup_pristine_wc(main.greek_state,
+                     main.pristine_greek_wc_dir,
+                     main.pristine_greek_repos_url)
+
 
 ######################################################################
 
@@ -174,6 +206,8 @@ def _guarantee_repos(path, repos_dir, minor_version, use_precooked=True):
   main.safe_rmtree(path)
   if (use_precooked and main.options.fsfs_version is not None):
     failed = main.unpack_greek_repos(path)
+  elif main.can_clone_repos(repos_dir, minor_version):
+    failed = main.clone_repos(repos_dir, path)
   else:
     failed = main.copy_repos(repos_dir, path, 1, 1, minor_version)
   if failed:
@@ -409,6 +443,47 @@ def run_and_verify_dump(repo_dir, deltas=False):
   return output
 
 
+def run_and_verify_dump_to_file(repo_dir, dump_path, deltas=False):
+  """Runs 'svnadmin dump' and reports any errors, writing the dump content
+  to the file DUMP_PATH."""
+  args = ()
+  if deltas:
+    args += ('--deltas',)
+  exit_code, err = main.run_command_with_files(main.svnadmin_binary,
+                                               None, dump_path,
+                                               'dump', '--quiet', repo_dir,
+                                               *args)
+  verify.verify_outputs("Unexpected output", None, err, None, [])
+  verify.verify_exit_code("Unexpected return code", exit_code, 0)
+
+
+def run_and_verify_load_from_file(repo_dir, dump_path):
+  "Runs 'svnadmin load' on the file DUMP_PATH and reports any errors."
+  exit_code, err = main.run_command_with_files(main.svnadmin_binary,
+                                               dump_path, None,
+                                               'load', '--force-uuid',
+                                               '--quiet', repo_dir)
+  verify.verify_outputs("Unexpected output", None, err, None, [])
+  verify.verify_exit_code("Unexpected return code", exit_code, 0)
+
+
+def run_and_verify_svnrdump_with_files(stdin_path, stdout_path, *varargs):
+  """Runs 'svnrdump dump|load' with stdin from the file STDIN_PATH and
+  stdout to the file STDOUT_PATH (either may be None), and reports any
+  errors."""
+  exit_code, err = main.run_svnrdump_with_files(stdin_path, stdout_path,
+                                                *varargs)
+
+  # Normalize line endings and ignore "consider upgrade" warnings, as
+  # run_and_verify_svnrdump() does.
+  if sys.platform == 'win32':
+    err = [x.replace('\r\n', '\n') for x in err]
+  err = [x for x in err if not re.search("warning: W200007", x)]
+
+  verify.verify_outputs("Unexpected output", None, err, None, [])
+  verify.verify_exit_code("Unexpected return code", exit_code, 0)
+
+
 def run_and_verify_svnrdump(dumpfile_content, expected_stdout,
                             expected_stderr, expected_exit, *varargs):
   """Runs 'svnrdump dump|load' depending on dumpfile_content and
@@ -1189,12 +1264,14 @@ def run_and_verify_merge2(dir, rev1, rev2, url1, url2,
   merge_command = tuple(merge_command)
 
   if dry_run:
-    pre_disk = tree.build_tree_from_wc(dir, keep_eol_style=keep_eol_style)
+    pre_disk = tree.build_tree_from_wc(dir, keep_eol_style=keep_eol_style,
+                                       content_digests=True)
     dry_run_command = merge_command + ('--dry-run',)
     dry_run_command = dry_run_command + args
     exit_code, out_dry, err_dry = run_and_verify_svn(None, expected_stderr,
                                                      *dry_run_command)
-    post_disk = tree.build_tree_from_wc(dir, keep_eol_style=keep_eol_style)
+    post_disk = tree.build_tree_from_wc(dir, keep_eol_style=keep_eol_style,
+                                        content_digests=True)
     try:
       tree.compare_trees("disk", post_disk, pre_disk)
     except tree.SVNTreeError:
@@ -1347,12 +1424,14 @@ def run_and_verify_patch2(dir, patch_path,
   patch_command = tuple(patch_command)
 
   if dry_run:
-    pre_disk = tree.build_tree_from_wc(dir, keep_eol_style=keep_eol_style)
+    pre_disk = tree.build_tree_from_wc(dir, keep_eol_style=keep_eol_style,
+                                       content_digests=True)
     dry_run_command = patch_command + ('--dry-run',)
     dry_run_command = dry_run_command + args
     exit_code, out_dry, err_dry = main.run_svn(error_re_string,
                                                *dry_run_command)
-    post_disk = tree.build_tree_from_wc(dir, keep_eol_style=keep_eol_style)
+    post_disk = tree.build_tree_from_wc(dir, keep_eol_style=keep_eol_style,
+                                        content_digests=True)
     try:
       tree.compare_trees("disk", post_disk, pre_disk)
     except tree.SVNTreeError:
@@ -1978,7 +2057,9 @@ def make_repo_and_wc(sbox, create_wc=True, read_only=False, empty=False,
   will be used.
 
   If CREATE_WC is True, a dedicated working copy will be checked out from
-  the repository, at the path SBOX.wc_dir.
+  the repository, at the path SBOX.wc_dir.  For the 'Greek tree' this is
+  done by copying the verified pristine working copy, unless the
+  --verify-checkout option is given.
 
   Returns on success, raises on failure."""
 
@@ -2002,7 +2083,13 @@ def make_repo_and_wc(sbox, create_wc=True, read_only=False, empty=False,
       raise ValueError("'tree' must be 'greek' or 'trojan'"
                        " but was '%s'" % str(tree))
 
-  if create_wc:
+  if (create_wc and not empty and tree == 'greek'
+      and not main.options.verify_checkout
+      and os.path.isdir(main.pristine_greek_wc_dir)):
+    # Copy the pristine working copy, pointing it to our repository.
+    copy_wc_template(main.pristine_greek_wc_dir, sbox.wc_dir,
+                     None if read_only else sbox.repo_dir, sbox.repo_url)
+  elif create_wc:
     # Generate the expected output tree.
     expected_output = expected_state.copy()
     expected_output.wc_dir = sbox.wc_dir
@@ -2024,6 +2111,36 @@ def make_repo_and_wc(sbox, create_wc=True, read_only=False, empty=False,
       if err.errno != errno.EEXIST:
         raise
 
+def _get_repos_uuid(repos_dir):
+  "Return the UUID of the repository at REPOS_DIR."
+
+  uuid_path = os.path.join(repos_dir, 'db', 'uuid')
+  if main.is_fs_type_fsfs() or main.is_fs_type_fsx():
+    with open(uuid_path, 'r') as f:
+      return f.readline().rstrip('\n')
+
+  exit_code, output, errput = run_and_verify_svnlook(None, [],
+                                                     'uuid', repos_dir)
+  return output[0].rstrip('\n')
+
+def copy_wc_template(template_dir, wc_dir, repos_dir, repos_url):
+  """Copy the checked out working copy TEMPLATE_DIR to WC_DIR.  Unless
+  REPOS_DIR is None, make the copy refer to the repository at REPOS_DIR
+  (which must have the same content as the template's repository) and
+  REPOS_URL by updating its wc.db, as 'svn relocate' would."""
+
+  main.safe_rmtree(wc_dir)
+  shutil.copytree(template_dir, wc_dir, symlinks=True)
+  if repos_dir is None:
+    return
+
+  db, root_path, relpath = wc.open_wc_db(wc_dir)
+  db.execute('update repository set root = ?, uuid = ?',
+             (repos_url, _get_repos_uuid(repos_dir)))
+  db.execute('update nodes set dav_cache = null')
+  db.commit()
+  db.close()
+
 # Duplicate a working copy or other dir.
 def duplicate_dir(wc_name, wc_copy_name):
   """Copy the working copy WC_NAME to WC_COPY_NAME.  Overwrite any
@@ -30,7 +30,10 @@ import re
 import stat
 import subprocess
 import time
+import tempfile
 import threading
+import traceback
+import uuid
 import optparse
 import xml
 import urllib
@@ -39,6 +42,12 @@ import hashlib
 import zipfile
 import codecs
 
+try:
+  import fcntl
+except ImportError:
+  # Not available on Windows
+  fcntl = None
+
 try:
   # Python >=3.0
   import queue
@@ -229,6 +238,16 @@ SVN_PROP_INHERITABLE_IGNORES = "svn:global-ignores"
 general_repo_dir = os.path.join(work_dir, "repositories")
 general_wc_dir = os.path.join(work_dir, "working_copies")
 
+# With --work-dir-in-memory, the sandbox directories above live on a
+# memory-backed file system and work_dir only holds symlinks to them.
+memory_sandbox_dirs = [general_repo_dir, general_wc_dir]
+# Failed sandboxes are saved here until the run finishes.
+saved_sandboxes_dir = os.path.join(work_dir, "saved-sandboxes")
+# While the sandboxes in memory take more than --work-dir-in-memory-limit
+# MB, new ones are made in these directories on disk instead.
+disk_sandbox_dirs = [os.path.join(work_dir, "repositories-on-disk"),
+                     os.path.join(work_dir, "working_copies-on-disk")]
+
 # Directories used for DAV tests
 other_dav_root_dir = os.path.join(work_dir, "fsdavroot")
 non_dav_root_dir = os.path.join(work_dir, "nodavroot")
@@ -241,6 +260,8 @@ temp_dir = os.path.join(work_dir, 'local_tmp')
 # (derivatives of the tmp dir.)
 pristine_greek_repos_dir = os.path.join(temp_dir, "repos")
 pristine_trojan_repos_dir = os.path.join(temp_dir, "trojan")
+pristine_greek_wc_dir = os.path.join(temp_dir, "greek-wc")
+repos_template_dir = os.path.join(temp_dir, "templates")
 greek_dump_dir = os.path.join(temp_dir, "greekfiles")
 trojan_dump_dir = os.path.join(temp_dir, "trojanfiles")
 default_config_dir = os.path.abspath(os.path.join(temp_dir, "config"))
@@ -276,7 +297,8 @@ greek_state = svntest.wc.State('', {
   })
 
 # Likewise our pristine trojan-tree state (for peg revision parsing tests)
-# NOTE: We don't use precooked trojan repositories.
+# NOTE: There are no precooked trojan repositories; with --fsfs-version,
+# the pristine one is cloned instead (see use_repos_templates()).
 trojan_state = svntest.wc.State('', {
   'iota'        : Item("This is the file 'iota'.\n"),
   '@zeta'       : Item("This is the file 'zeta'.\n"),
@@ -678,6 +700,44 @@ def run_command_stdin(command, error_expected, bufsize=-1, binary_mode=False,
          filter_dbg(stdout_lines, binary_mode), \
          stderr_lines
 
+def run_command_with_files(command, stdin_path, stdout_path, *varargs):
+  """Run COMMAND with VARARGS, reading its stdin from the file STDIN_PATH
+  and writing its stdout to the file STDOUT_PATH (either may be None).
+  Unlike run_command_stdin(), this works for any amount of data.  Return
+  exit code as int; stderr as list of lines (including line terminators)."""
+
+  logger.info('CMD: %s %s%s%s'
+              % (os.path.basename(command),
+                 ' '.join([_quote_arg(x) for x in varargs]),
+                 stdin_path and ' < ' + _quote_arg(stdin_path) or '',
+                 stdout_path and ' > ' + _quote_arg(stdout_path) or ''))
+  start = time.time()
+
+  stdin = stdin_path and open(stdin_path, 'rb') or None
+  stdout = stdout_path and open(stdout_path, 'wb') or None
+  try:
+    infile, outfile, errfile, waiter = open_pipe([command] + list(varargs),
+                                                 stdin=stdin, stdout=stdout)
+    kid, command_string = waiter
+    errput = kid.communicate()[1]
+  finally:
+    if stdin:
+      stdin.close()
+    if stdout:
+      stdout.close()
+
+  if not isinstance(errput, str):
+    errput = errput.decode("utf-8", 'surrogateescape')
+  stderr_lines = errput.splitlines(True)
+
+  logger.info('<TIME = %.6f>' % (time.time() - start))
+  for x in stderr_lines:
+    logger.info(x.rstrip())
+  if kid.returncode:
+    logger.info("CMD: %s exited with %d" % (command_string, kid.returncode))
+
+  return kid.returncode, stderr_lines
+
 def create_config_dir(cfgdir, config_contents=None, server_contents=None,
                       ssl_cert=None, ssl_url=None, http_proxy=None,
                       exclusive_wc_locks=None):
@@ -858,6 +918,12 @@ def run_svnrdump(stdin_input, *varargs):
     return run_command(svnrdump_binary, 1, True,
                        *(_with_auth(_with_config_dir(varargs))))
 
+def run_svnrdump_with_files(stdin_path, stdout_path, *varargs):
+  """Run svnrdump with VARARGS like run_command_with_files(); returns exit
+  code as int; stderr as list of lines (including line terminators)."""
+  return run_command_with_files(svnrdump_binary, stdin_path, stdout_path,
+                                *(_with_auth(_with_config_dir(varargs))))
+
 def run_svnsync(*varargs):
   """Run svnsync with VARARGS, returns exit code as int; stdout, stderr as
   list of lines (including line terminators)."""
@@ -1139,22 +1205,70 @@ def _post_create_repos(path, minor_version = None):
     # Note that some tests (currently only commit_tests) create their own
     # post-commit hooks, which would override this one. :-(
     if options.fsfs_packing and minor_version >=6:
-      # some tests chdir.
-      abs_path = os.path.abspath(path)
-      create_python_hook_script(get_post_commit_hook_path(abs_path),
-          "import subprocess\n"
-          "import sys\n"
-          "command = %s\n"
-          "sys.exit(subprocess.Popen(command).wait())\n"
-          % repr([svnadmin_binary, 'pack', abs_path]))
+      _create_pack_hook(path)
 
   # make the repos world-writeable, for mod_dav_svn's sake.
   chmod_tree(path, S_ALL_RW, S_ALL_RW)
 
+def _create_pack_hook(path):
+  "Install a post-commit hook that runs 'svnadmin pack' on PATH."
+
+  # some tests chdir.
+  abs_path = os.path.abspath(path)
+  create_python_hook_script(get_post_commit_hook_path(abs_path),
+      "import subprocess\n"
+      "import sys\n"
+      "command = %s\n"
+      "sys.exit(subprocess.Popen(command).wait())\n"
+      % repr([svnadmin_binary, 'pack', abs_path]))
+
+def _save_repos_template(template, populate):
+  """Create the repository template directory TEMPLATE by calling POPULATE
+  with the path of an empty scratch directory.  Concurrent test processes
+  may race to create the same template; the first one to finish wins."""
+
+  if not os.path.exists(repos_template_dir):
+    try:
+      os.makedirs(repos_template_dir)
+    except OSError:
+      if not os.path.isdir(repos_template_dir):
+        raise
+
+  scratch = tempfile.mkdtemp(prefix=os.path.basename(template) + '.',
+                             dir=repos_template_dir)
+  try:
+    populate(scratch)
+    os.rename(scratch, template)
+  except OSError:
+    if not os.path.isdir(template):
+      raise
+  finally:
+    if os.path.exists(scratch):
+      safe_rmtree(scratch)
+
+def _set_fsfs_uuid(path):
+  """Give the FSFS repository at PATH a new UUID and, for formats that
+  have one, a new instance ID, like 'svnadmin setuuid' does."""
+
+  uuid_path = os.path.join(path, 'db', 'uuid')
+  with open(uuid_path, 'r') as f:
+    lines = f.read().split('\n')
+  os.chmod(uuid_path, S_ALL_RW)
+  file_write(uuid_path,
+             '\n'.join([line and str(uuid.uuid4()) for line in lines]))
+
 def _unpack_precooked_repos(path, template):
-  testdir = os.path.dirname(os.path.abspath(os.path.dirname(__file__)))
-  repozip = os.path.join(os.path.dirname(testdir), "templates", template)
-  zipfile.ZipFile(repozip, 'r').extractall(path)
+  """Copy the pre-cooked repository in the zip file TEMPLATE to PATH.
+  The zip file is extracted only once per test run."""
+
+  cache = os.path.join(repos_template_dir, os.path.splitext(template)[0])
+  if not os.path.isdir(cache):
+    testdir = os.path.dirname(os.path.abspath(os.path.dirname(__file__)))
+    repozip = os.path.join(os.path.dirname(testdir), "templates", template)
+    _save_repos_template(cache,
+                         lambda scratch: zipfile.ZipFile(repozip, 'r')
+                                                .extractall(scratch))
+  _copy_repos_tree(cache, path)
 
 # For creating new, pre-cooked greek repositories
 def unpack_greek_repos(path):
@@ -1177,18 +1291,31 @@ def create_repos(path, minor_version = None):
       opts = ()
     if minor_version is None or minor_version > options.server_minor_version:
       minor_version = options.server_minor_version
-    opts += ("--compatible-version=1.%d" % (minor_version),)
-    if options.fs_type is not None:
-      opts += ("--fs-type=" + options.fs_type,)
-    exit_code, stdout, stderr = run_command(svnadmin_binary, 1, False,
-                                            "create", path, *opts)
+
+    # FSFS repositories created by 'svnadmin create' only differ in their
+    # UUIDs, so we create one per compatible version and copy that.
+    template = os.path.join(repos_template_dir,
+                            "empty-fsfs-1.%d" % minor_version)
+    if is_fs_type_fsfs() and os.path.isdir(template):
+      _copy_repos_tree(template, path)
+      _set_fsfs_uuid(path)
+      stderr = []
+    else:
+      opts += ("--compatible-version=1.%d" % (minor_version),)
+      if options.fs_type is not None:
+        opts += ("--fs-type=" + options.fs_type,)
+      exit_code, stdout, stderr = run_command(svnadmin_binary, 1, False,
+                                              "create", path, *opts)
+      if is_fs_type_fsfs() and not stderr:
+        _save_repos_template(template,
+                             lambda scratch: _copy_repos_tree(path, scratch))
   else:
     # Copy a pre-cooked FSFS repository
     assert options.fs_type == "fsfs"
     template = "empty-fsfs-v%d.zip" % options.fsfs_version
     _unpack_precooked_repos(path, template)
-    exit_code, stdout, stderr = run_command(svnadmin_binary, 1, False,
-                                            "setuuid", path)
+    _set_fsfs_uuid(path)
+    stderr = []
 
   # Skip tests if we can't create the repository.
   if stderr:
@@ -1295,6 +1422,310 @@ def copy_repos(src_path, dst_path, head_revision, ignore_uuid = 1,
     raise SVNRepositoryCopyFailure
 
 
+# Linux ioctl request for cloning a file's data blocks (FICLONE).
+_FICLONE = 0x40049409
+
+def _clone_file(src, dst):
+  """Copy the file SRC to DST.  Where the file system supports copy-on-write
+  clones (reflinks), share the data blocks with SRC instead of copying them."""
+
+  if fcntl is not None and sys.platform.startswith('linux'):
+    try:
+      with open(src, 'rb') as src_fp:
+        with open(dst, 'wb') as dst_fp:
+          fcntl.ioctl(dst_fp.fileno(), _FICLONE, src_fp.fileno())
+      shutil.copystat(src, dst)
+      return
+    except (IOError, OSError):
+      pass
+
+  shutil.copy2(src, dst)
+
+def _copy_repos_tree(src_path, dst_path, skip_hooks=False):
+  """Copy the repository directory SRC_PATH to DST_PATH file by file.
+  If SKIP_HOOKS is true, copy only the hook templates, not the hooks."""
+
+  for dirpath, dirs, files in os.walk(src_path):
+    relpath = os.path.relpath(dirpath, src_path)
+    target = os.path.normpath(os.path.join(dst_path, relpath))
+    if not os.path.isdir(target):
+      os.makedirs(target)
+    if skip_hooks and relpath == 'hooks':
+      files = [name for name in files if name.endswith('.tmpl')]
+    for name in files:
+      _clone_file(os.path.join(dirpath, name), os.path.join(target, name))
+
+def get_repos_template_path(repos_path):
+  "Return the path of the clone template for the pristine repos REPOS_PATH."
+
+  return os.path.join(repos_template_dir, os.path.basename(repos_path))
+
+def create_repos_template(repos_path):
+  """Save the freshly created pristine repository at REPOS_PATH as the
+  template that clone_repos() copies from.  Hook scripts are not part of
+  the template."""
+
+  template = get_repos_template_path(repos_path)
+  safe_rmtree(template)
+  _copy_repos_tree(repos_path, template, skip_hooks=True)
+
+def use_repos_templates():
+  """Return True iff the pristine repositories should be saved as templates
+  for clone_repos().  This is always the case with pre-cooked repositories,
+  which are never copied with dump/load."""
+
+  return bool(options.clone_repos or options.fsfs_version is not None)
+
+def can_clone_repos(src_path, minor_version = None):
+  """Return True iff clone_repos() can be used instead of copy_repos()
+  to copy the pristine repository SRC_PATH for MINOR_VERSION."""
+
+  if not use_repos_templates() or not is_fs_type_fsfs():
+    return False
+
+  # The template has the format of the pristine repository, which is
+  # created for the server minor version.
+  if (minor_version is not None
+      and minor_version < options.server_minor_version):
+    return False
+
+  return os.path.isdir(get_repos_template_path(src_path))
+
+# For copying a repository without dump|load
+def clone_repos(src_path, dst_path):
+  """Copy the pristine repository SRC_PATH to DST_PATH by cloning the
+  on-disk template saved by create_repos_template().  The copy keeps the
+  UUID of SRC_PATH; use 'svnadmin setuuid' to give it a new one."""
+
+  template = get_repos_template_path(src_path)
+  logger.info('CLONE: %s -> %s' % (template, dst_path))
+  start = time.time()
+
+  try:
+    _copy_repos_tree(template, dst_path)
+  except (IOError, OSError) as e:
+    logger.warn('ERROR:  clone failed: %s', e)
+    raise SVNRepositoryCopyFailure
+
+  if options.fsfs_packing and options.server_minor_version >= 6:
+    _create_pack_hook(dst_path)
+
+  stop = time.time()
+  logger.info('<TIME = %.6f>' % (stop - start))
+
+
+# The memory-backed directory holding the sandboxes, if this process
+# placed them there.  Child processes find it through the symlinks.
+_memory_work_area = None
+
+# Places where a memory-backed file system is usually mounted.
+_memory_fs_candidates = ['/dev/shm', '/run/shm', '/tmp']
+
+def _find_memory_fs(min_free):
+  """Return the mount point of a writable, memory-backed file system with
+  at least MIN_FREE bytes available, or None if there is none."""
+
+  try:
+    with open('/proc/mounts', 'r') as f:
+      mounts = dict((fields[1], fields[2])
+                    for fields in [line.split() for line in f]
+                    if len(fields) > 2)
+  except (IOError, OSError):
+    return None
+
+  for path in _memory_fs_candidates:
+    if mounts.get(path) not in ('tmpfs', 'ramfs'):
+      continue
+    if not os.access(path, os.W_OK):
+      continue
+    st = os.statvfs(path)
+    if st.f_bavail * st.f_frsize >= min_free:
+      return path
+  return None
+
+def _get_memory_work_area():
+  "Return the memory-backed directory holding the sandboxes, or None."
+
+  if _memory_work_area:
+    return _memory_work_area
+  if os.path.islink(memory_sandbox_dirs[0]):
+    return os.path.dirname(os.path.realpath(memory_sandbox_dirs[0]))
+  return None
+
+def _space_used(path):
+  "Return the space taken by the files under PATH, in bytes."
+
+  used = 0
+  for dirpath, dirnames, filenames in os.walk(path):
+    for name in dirnames + filenames:
+      try:
+        st = os.lstat(os.path.join(dirpath, name))
+      except OSError:
+        # Removed by a test running in parallel.
+        continue
+      used += getattr(st, 'st_blocks', 0) * 512 or st.st_size
+  return used
+
+def setup_work_dir_in_memory():
+  """Move the repository and working copy directories of work_dir to a
+  memory-backed file system, leaving symlinks in their place.  Fall back
+  to the disk if no such file system has --work-dir-in-memory-limit MB
+  free.  Return True iff the sandboxes are in memory."""
+
+  global _memory_work_area
+
+  if _memory_work_area:
+    return True
+
+  # A previous run which didn't finish may have left its symlinks around.
+  for subdir in memory_sandbox_dirs:
+    if os.path.islink(subdir):
+      stale_area = os.path.dirname(os.path.realpath(subdir))
+      os.unlink(subdir)
+      safe_rmtree(stale_area)
+  for subdir in disk_sandbox_dirs:
+    safe_rmtree(subdir)
+
+  root = _find_memory_fs(options.work_dir_in_memory_limit * 1024 * 1024)
+  if root is None:
+    logger.warning("No memory-backed file system with %d MB free; "
+                   "keeping '%s' on disk."
+                   % (options.work_dir_in_memory_limit, work_dir))
+    return False
+
+  area = tempfile.mkdtemp(prefix='svn-test-work.', dir=root)
+  for subdir in memory_sandbox_dirs:
+    target = os.path.join(area, os.path.basename(subdir))
+    os.makedirs(target)
+    safe_rmtree(subdir)
+    if not os.path.exists(work_dir):
+      os.makedirs(work_dir)
+    os.symlink(target, subdir)
+  safe_rmtree(saved_sandboxes_dir)
+
+  _memory_work_area = area
+  logger.info("Sandboxes are in '%s'" % area)
+  return True
+
+def record_memory_usage():
+  """Note how much space the sandboxes in the memory-backed work area use
+  right now, for the peak usage reported by teardown_work_dir_in_memory().
+  Mark the work area as full while that is over the limit."""
+
+  area = _get_memory_work_area()
+  if area is None:
+    return
+
+  usage = sum([_space_used(subdir) for subdir in memory_sandbox_dirs])
+
+  # Small appends are atomic, even with tests running in parallel.
+  with open(os.path.join(area, 'usage'), 'a') as f:
+    f.write('%d\n' % usage)
+
+  full_marker = os.path.join(area, 'full')
+  if usage > options.work_dir_in_memory_limit * 1024 * 1024:
+    if not os.path.exists(full_marker):
+      logger.warning("The memory-backed work area uses %.1f MB, more than "
+                     "--work-dir-in-memory-limit=%d; making new sandboxes "
+                     "on disk"
+                     % (usage / 1048576.0, options.work_dir_in_memory_limit))
+      file_write(full_marker, '')
+  elif os.path.exists(full_marker):
+    try:
+      os.remove(full_marker)
+    except OSError:
+      # Removed by a test running in parallel.
+      pass
+
+def choose_sandbox_dirs():
+  """Make the sandboxes of the next test in the memory-backed work area,
+  unless it is full (see record_memory_usage()), else on disk."""
+
+  global general_repo_dir, general_wc_dir
+
+  area = _get_memory_work_area()
+  if area is None or not os.path.exists(os.path.join(area, 'full')):
+    general_repo_dir, general_wc_dir = memory_sandbox_dirs
+  else:
+    general_repo_dir, general_wc_dir = disk_sandbox_dirs
+    for subdir in disk_sandbox_dirs:
+      if not os.path.exists(subdir):
+        try:
+          os.makedirs(subdir)
+        except OSError:
+          # Created by a test running in parallel.
+          pass
+
+def save_sandbox_to_disk(sandbox):
+  """Copy the repositories and working copies of the failed SANDBOX and its
+  dependents from the memory-backed work area to saved_sandboxes_dir, then
+  remove them from memory."""
+
+  if _get_memory_work_area() is None:
+    return
+
+  for sbox in [sandbox] + (sandbox.dependents or []):
+    for path in sbox.test_paths:
+      relpath = os.path.relpath(path, work_dir)
+      if (relpath.split(os.sep)[0]
+          not in [os.path.basename(subdir) for subdir in memory_sandbox_dirs]
+          or not os.path.exists(path)):
+        continue
+      saved_path = os.path.join(saved_sandboxes_dir, relpath)
+      safe_rmtree(saved_path)
+      if os.path.isdir(path):
+        shutil.copytree(path, saved_path, symlinks=True)
+      else:
+        if not os.path.exists(os.path.dirname(saved_path)):
+          os.makedirs(os.path.dirname(saved_path))
+        shutil.copy2(path, saved_path)
+
+  sandbox.cleanup_test_paths()
+
+def teardown_work_dir_in_memory():
+  """Undo setup_work_dir_in_memory(): put the saved sandboxes, and any
+  left in memory or made on disk instead, back in their usual places on
+  disk.  Print the peak space used in memory."""
+
+  global _memory_work_area, general_repo_dir, general_wc_dir
+
+  area = _memory_work_area
+  if area is None:
+    return
+  _memory_work_area = None
+
+  peak = 0
+  usage_path = os.path.join(area, 'usage')
+  if os.path.exists(usage_path):
+    with open(usage_path, 'r') as f:
+      peak = max([int(line) for line in f if line.strip()] or [0])
+
+  general_repo_dir, general_wc_dir = memory_sandbox_dirs
+  for subdir, disk_subdir in zip(memory_sandbox_dirs, disk_sandbox_dirs):
+    os.unlink(subdir)
+    saved = os.path.join(saved_sandboxes_dir, os.path.basename(subdir))
+    if os.path.isdir(saved):
+      os.rename(saved, subdir)
+    else:
+      os.makedirs(subdir)
+
+    # Sandboxes of tests that didn't finish normally, and failed ones
+    # made on disk.
+    for left_over in [os.path.join(area, os.path.basename(subdir)),
+                      disk_subdir]:
+      if not os.path.isdir(left_over):
+        continue
+      for name in os.listdir(left_over):
+        if not os.path.exists(os.path.join(subdir, name)):
+          shutil.move(os.path.join(left_over, name), subdir)
+    safe_rmtree(disk_subdir)
+
+  safe_rmtree(saved_sandboxes_dir)
+  safe_rmtree(area)
+  print("Peak space used by sandboxes in memory: %.1f MB"
+        % (peak / 1048576.0))
+
+
 def canonicalize_url(input):
   "Canonicalize the url, if the scheme is unknown, returns intact input"
 
@@ -1733,12 +2164,13 @@ class TestSpawningThread(threading.Thread):
   """A thread that runs test cases in their own processes.
   Receives test numbers to run from the queue, and saves results into
   the results field."""
-  def __init__(self, queue, progress_func, tests_total):
+  def __init__(self, queue, progress_func, tests_total, fork_server=None):
     threading.Thread.__init__(self)
     self.queue = queue
     self.results = []
     self.progress_func = progress_func
     self.tests_total = tests_total
+    self.fork_server = fork_server
 
   def run(self):
     while True:
@@ -1755,6 +2187,10 @@ class TestSpawningThread(threading.Thread):
                            self.tests_total)
 
   def run_one(self, index):
+    if self.fork_server:
+      self.results.append((index,) + self.fork_server.run_test(index))
+      return
+
     command = os.path.abspath(sys.argv[0])
 
     args = []
@@ -1802,6 +2238,14 @@ class TestSpawningThread(threading.Thread):
       args.append('--fsfs-version=' + str(options.fsfs_version))
     if options.dump_load_cross_check:
       args.append('--dump-load-cross-check')
+    if options.clone_repos:
+      args.append('--clone-repos')
+    if options.verify_checkout:
+      args.append('--verify-checkout')
+    if options.work_dir_in_memory:
+      args.append('--work-dir-in-memory')
+      args.append('--work-dir-in-memory-limit='
+                  + str(options.work_dir_in_memory_limit))
     if options.fsfs_compression:
       args.append('--fsfs-compression=' + options.fsfs_compression)
     if options.fsfs_dir_deltification:
@@ -1815,6 +2259,127 @@ class TestSpawningThread(threading.Thread):
                                                        *args)
     self.results.append((index, result, stdout_lines, stderr_lines))
 
+class TestForkServer:
+  """A process forked from this fully initialized test process (options
+  parsed, svntest and the test module imported, pristine repositories
+  set up) which runs each requested test in a forked child of its own.
+  Used by TestSpawningThread instead of executing sys.argv[0] for every
+  test when --fork-server is given.
+
+  Requests are test numbers, one per line.  A reply is a line holding
+  the exit code and the sizes of the captured stdout and stderr,
+  followed by the output itself."""
+
+  # Our ends of the pipes of all running servers.  A new server must
+  # not hold on to those of its siblings, or they would never see EOF.
+  _server_fds = []
+
+  def __init__(self, test_list):
+    request_r, request_w = os.pipe()
+    reply_r, reply_w = os.pipe()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+      exit_code = 1
+      try:
+        os.close(request_w)
+        os.close(reply_r)
+        for fd in TestForkServer._server_fds:
+          os.close(fd)
+        self._serve(test_list, os.fdopen(request_r, 'rb'),
+                    os.fdopen(reply_w, 'wb'))
+        exit_code = 0
+      except:
+        traceback.print_exc()
+      finally:
+        os._exit(exit_code)
+
+    os.close(request_r)
+    os.close(reply_w)
+    self.pid = pid
+    self.fds = [request_w, reply_r]
+    TestForkServer._server_fds += self.fds
+    self.requests = os.fdopen(request_w, 'wb')
+    self.replies = os.fdopen(reply_r, 'rb')
+
+  def run_test(self, index):
+    """Run test number INDEX in a child of the server.  Return the exit
+    code and the stdout and stderr of the test as lists of lines, like
+    spawn_process() does."""
+    try:
+      self.requests.write(('%d\n' % index).encode())
+      self.requests.flush()
+      reply = self.replies.readline().split()
+    except (IOError, OSError):
+      reply = None
+    if not reply:
+      return 1, [], ['Test %d: the fork server died\n' % index]
+
+    result, stdout_size, stderr_size = [int(x) for x in reply]
+    stdout = self.replies.read(stdout_size).decode('utf-8', 'surrogateescape')
+    stderr = self.replies.read(stderr_size).decode('utf-8', 'surrogateescape')
+    stdout_lines = stdout.splitlines(True)
+    stderr_lines = stderr.splitlines(True)
+    if result < 0:
+      stderr_lines.append('Test %d: terminated by signal %d\n'
+                          % (index, -result))
+      result = 1
+    return result, stdout_lines, stderr_lines
+
+  def close(self):
+    "Stop the server and wait for it to exit."
+    self.requests.close()
+    self.replies.close()
+    os.waitpid(self.pid, 0)
+    for fd in self.fds:
+      TestForkServer._server_fds.remove(fd)
+
+  def _serve(self, test_list, requests, replies):
+    for line in iter(requests.readline, b''):
+      index = int(line)
+      outputs = [tempfile.TemporaryFile(), tempfile.TemporaryFile()]
+      pid = os.fork()
+      if pid == 0:
+        self._run_child(index, test_list, outputs)
+
+      status = os.waitpid(pid, 0)[1]
+      if os.WIFSIGNALED(status):
+        result = -os.WTERMSIG(status)
+      else:
+        result = os.WEXITSTATUS(status)
+
+      data = []
+      for f in outputs:
+        f.seek(0)
+        data.append(f.read())
+        f.close()
+      replies.write(('%d %d %d\n' % (result, len(data[0]), len(data[1])))
+                    .encode())
+      for d in data:
+        replies.write(d)
+      replies.flush()
+
+  def _run_child(self, index, test_list, outputs):
+    "Run test INDEX the way an 'INDEX -c' child process would; never return."
+    exit_code = 1
+    try:
+      os.dup2(outputs[0].fileno(), 1)
+      os.dup2(outputs[1].fileno(), 2)
+      options.is_child_process = True
+      options.parallel = 0
+      exit_code = run_one_test(index, test_list)
+      svntest.sandbox.cleanup_deferred_test_paths()
+    except SystemExit as e:
+      if isinstance(e.code, int):
+        exit_code = e.code
+    except:
+      traceback.print_exc()
+    finally:
+      sys.stdout.flush()
+      sys.stderr.flush()
+      os._exit(exit_code)
+
 class TestRunner:
   """Encapsulate a single test case (predicate), including logic for
   runing the test and test list output."""
@@ -1911,6 +2476,8 @@ class TestRunner:
         """
     sbox_name = self.pred.get_sandbox_name()
     if sbox_name:
+      if options.work_dir_in_memory:
+        choose_sandbox_dirs()
       sandbox = svntest.sandbox.Sandbox(sbox_name, self.index)
     else:
       sandbox = None
@@ -1971,7 +2538,15 @@ class TestRunner:
     exit_code, result_text, result_benignity = self.pred.results(result)
     if not (options.quiet and result_benignity):
       self._print_name(result_text)
-    if sandbox is not None and exit_code != 1 and options.cleanup:
+    if sandbox is not None and options.work_dir_in_memory:
+      # Keep the memory use down: drop passing sandboxes, and save the
+      # failing ones to disk.
+      record_memory_usage()
+      if exit_code != 1:
+        sandbox.cleanup_test_paths()
+      else:
+        save_sandbox_to_disk(sandbox)
+    elif sandbox is not None and exit_code != 1 and options.cleanup:
       sandbox.cleanup_test_paths()
     return exit_code
 
@@ -2014,7 +2589,8 @@ def _internal_run_tests(test_list, testnums, parallel, srcdir, progress_func):
 
   If we're running the tests in parallel spawn as much parallel processes
   as requested and gather the results in a temp. buffer when a child
-  process is finished.
+  process is finished.  With --fork-server, the child processes are
+  forked from this process rather than started from scratch.
   """
 
   exit_code = 0
@@ -2040,13 +2616,24 @@ def _internal_run_tests(test_list, testnums, parallel, srcdir, progress_func):
     for num in testnums:
       number_queue.put(num)
 
+    # Fork the servers before starting any threads.
+    servers = [None] * parallel
+    if options.fork_server and hasattr(os, 'fork'):
+      servers = [TestForkServer(test_list) for i in range(parallel)]
+
     threads = [ TestSpawningThread(number_queue, progress_func,
-                                   len(testnums)) for i in range(parallel) ]
-    for t in threads:
-      t.start()
+                                   len(testnums), servers[i])
+                for i in range(parallel) ]
+    try:
+      for t in threads:
+        t.start()
 
-    for t in threads:
-      t.join()
+      for t in threads:
+        t.join()
+    finally:
+      for server in servers:
+        if server:
+          server.close()
 
     # list of (index, result, stdout, stderr)
     results = []
@@ -2202,6 +2789,29 @@ def _create_parser(usage=None):
                          "tests with svnadmin, svnrdump and svndumpfilter " +
                          " on the testcase repositories to cross-check " +
                          " dump file compatibility.")
+  parser.add_option('--clone-repos', action='store_true',
+                    help="Copy the pristine FSFS repositories by cloning " +
+                         "an on-disk template instead of running " +
+                         "'svnadmin dump | svnadmin load'.")
+  parser.add_option('--verify-checkout', action='store_true',
+                    help="Check out and verify the working copy of every " +
+                         "sandbox instead of copying the pristine " +
+                         "working copy template.")
+  parser.add_option('--work-dir-in-memory', action='store_true',
+                    help="Keep the repositories and working copies on a " +
+                         "memory-backed file system, if one is available. " +
+                         "Passing tests are cleaned up, failing ones are " +
+                         "saved to disk.")
+  parser.add_option('--work-dir-in-memory-limit', action='store', type='int',
+                    default=2048,
+                    help="Space in MB the sandboxes may take in memory " +
+                         "with --work-dir-in-memory; further sandboxes are " +
+                         "made on disk while they take more (default: " +
+                         "%default)")
+  parser.add_option('--fork-server', action='store_true',
+                    help="With --parallel, run each test in a process " +
+                         "forked from this one instead of executing the " +
+                         "test script anew for every test (POSIX only).")
   parser.add_option('--config-file', action='store',
                     help="Configuration file for tests.")
   parser.add_option('--set-log-level', action='callback', type='str',
@@ -2589,8 +3199,15 @@ def execute_tests(test_list, serial_only = False, test_name = None,
   if serial_only or len(testnums) < 2:
     options.parallel = 0
 
+  # Unless our caller already did that, move the sandboxes into memory
+  # for this run.
+  owns_memory_work_area = False
+
   try:
     if not options.is_child_process:
+      if options.work_dir_in_memory and _memory_work_area is None:
+        owns_memory_work_area = setup_work_dir_in_memory()
+
       # Build out the default configuration directory
       create_config_dir(default_config_dir,
                         ssl_cert=options.ssl_cert,
@@ -2619,5 +3236,8 @@ def execute_tests(test_list, serial_only = False, test_name = None,
   # Cleanup after ourselves.
   svntest.sandbox.cleanup_deferred_test_paths()
 
+  if owns_memory_work_area:
+    teardown_work_dir_in_memory()
+
   # Return the appropriate exit code from the tests.
   return exit_code
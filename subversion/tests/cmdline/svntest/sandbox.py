@@ -22,21 +22,26 @@
 #
 
 import os
+import sys
 import shutil
 import copy
+import hashlib
 import logging
 import re
+import threading
 
 import svntest
 
 logger = logging.getLogger()
 
 
-def make_mirror(sbox, source_prop_encoding=None):
-  """Make a mirror of the repository in SBOX.
+def make_mirror(sbox, source_prop_encoding=None, dest_sbox=None):
+  """Make a mirror of the repository in SBOX, in DEST_SBOX if given, else
+  in a new clone_dependent() of SBOX.
   """
   # Set up the mirror repository.
-  dest_sbox = sbox.clone_dependent()
+  if dest_sbox is None:
+    dest_sbox = sbox.clone_dependent()
   dest_sbox.build(create_wc=False, empty=True)
   exit_code, output, errput = svntest.main.run_svnlook("uuid", sbox.repo_dir)
   svntest.actions.run_and_verify_svnadmin2(None, None, 0,
@@ -76,7 +81,7 @@ def verify_mirror(repo_url, repo_dir, expected_dumpfile):
   # Compare the mirror's dumpfile, ignoring any expected differences:
   # The original dumpfile in some cases lacks 'Text-content-sha1' headers;
   # the mirror dump always has them -- ### Why?
-  svnsync_headers_always = re.compile("Text-content-sha1: ")
+  svnsync_headers_always = re.compile(b"Text-content-sha1: ")
   dumpfile_a_n_cmp = [l for l in expected_dumpfile
                       if not svnsync_headers_always.match(l)]
   dumpfile_s_n_cmp = [l for l in dumpfile_s_n
@@ -86,6 +91,93 @@ def verify_mirror(repo_url, repo_dir, expected_dumpfile):
                                     dumpfile_s_n_cmp)
 
 
+def _read_dump(path, *skip):
+  """Yield the lines (bytes) of the dump file at PATH, leaving out those
+  matching any of the compiled regexes SKIP."""
+  with open(path, 'rb') as f:
+    for line in f:
+      for regex in skip:
+        if regex.match(line):
+          break
+      else:
+        yield line
+
+_uuid_header = re.compile(b"UUID: ")
+
+def _compare_dumps(label_expected, label_actual, path_expected, path_actual,
+                   skip_expected=(), skip_actual=(), **kwargs):
+  """Like svntest.verify.compare_dump_files(), for the dump files at
+  PATH_EXPECTED and PATH_ACTUAL without the lines matching SKIP_EXPECTED
+  and SKIP_ACTUAL, respectively.  KWARGS are passed on.
+
+  The files are compared line by line first; they are only read into
+  memory, to be parsed and compared ignoring the differences KWARGS allow,
+  if that finds a difference."""
+
+  # Identical dumps parse the same, unless the expected one is parsed
+  # ignoring its SHA-1 checksums.
+  if svntest.main.fs_has_sha1():
+    skip_uuid = kwargs.get('ignore_uuid') and (_uuid_header,) or ()
+    expected = _read_dump(path_expected, *(skip_expected + skip_uuid))
+    actual = _read_dump(path_actual, *(skip_actual + skip_uuid))
+    try:
+      for line in expected:
+        if line != next(actual, None):
+          break
+      else:
+        if next(actual, None) is None:
+          return
+    finally:
+      expected.close()
+      actual.close()
+
+  svntest.verify.compare_dump_files(label_expected, label_actual,
+                                    list(_read_dump(path_expected,
+                                                    *skip_expected)),
+                                    list(_read_dump(path_actual,
+                                                    *skip_actual)),
+                                    **kwargs)
+
+def _get_verified_marker(dump_path):
+  """Return the path of the file that marks repositories with the same
+  content as the one dumped to DUMP_PATH as verified by
+  Sandbox.verify_repo() in this test run.  The UUID doesn't count."""
+
+  sha1 = hashlib.sha1()
+  with open(dump_path, 'rb') as f:
+    for line in f:
+      if not line.startswith(b'UUID: '):
+        sha1.update(line)
+
+  marker_dir = os.path.join(svntest.main.temp_dir, 'verified-dumps')
+  if not os.path.isdir(marker_dir):
+    try:
+      os.makedirs(marker_dir)
+    except OSError:
+      # Created by a test running in parallel.
+      pass
+  return os.path.join(marker_dir, sha1.hexdigest())
+
+def _run_concurrently(*funcs):
+  """Call each of FUNCS in a thread of its own and wait for all of them.
+  Then re-raise the first exception raised by any of them, if any."""
+
+  errors = []
+  def run(func):
+    try:
+      func()
+    except:
+      errors.append(sys.exc_info()[1])
+
+  threads = [threading.Thread(target=run, args=(func,)) for func in funcs]
+  for t in threads:
+    t.start()
+  for t in threads:
+    t.join()
+  if errors:
+    raise errors[0]
+
+
 class Sandbox:
   """Manages a sandbox (one or more repository/working copy pairs) for
   a test to operate within."""
@@ -479,106 +571,149 @@ class Sandbox:
     return youngest
 
   def verify_repo(self):
-    """
+    """Cross-check the repository: dump it with svnadmin (with and without
+    deltas) and with svnrdump, load each dump with the other tool, dump
+    the loaded repositories and compare all the dumps; run each dump
+    through svndumpfilter; and mirror the repository with svnsync.
+
+    Independent steps run concurrently, and all dump data goes through
+    files.  A repository with the same content as one verified earlier in
+    this test run is not verified again.
     """
     svnrdump_headers_missing = re.compile(
-        "Text-content-sha1: .*|Text-copy-source-md5: .*|"
-        "Text-copy-source-sha1: .*|Text-delta-base-sha1: .*"
+        b"Text-content-sha1: .*|Text-copy-source-md5: .*|"
+        b"Text-copy-source-sha1: .*|Text-delta-base-sha1: .*"
     )
     svnrdump_headers_always = re.compile(
-        "Prop-delta: .*"
+        b"Prop-delta: .*"
     )
 
-    dumpfile_a_n = svntest.actions.run_and_verify_dump(self.repo_dir,
-                                                       deltas=False)
-    dumpfile_a_d = svntest.actions.run_and_verify_dump(self.repo_dir,
-                                                       deltas=True)
-    dumpfile_r_d = svntest.actions.run_and_verify_svnrdump(
-      None, svntest.verify.AnyOutput, [], 0, 'dump', '-q', self.repo_url,
-      svntest.main.svnrdump_crosscheck_authentication)
-
-    # Compare the two deltas dumpfiles, ignoring expected differences
-    dumpfile_a_d_cmp = [l for l in dumpfile_a_d
-                       if not svnrdump_headers_missing.match(l)
-                                and not svnrdump_headers_always.match(l)]
-    dumpfile_r_d_cmp = [l for l in dumpfile_r_d
-                       if not svnrdump_headers_always.match(l)]
-    # Ignore differences in number of blank lines between node records,
-    # as svnrdump puts 3 whereas svnadmin puts 2 after a replace-with-copy.
-    svntest.verify.compare_dump_files('svnadmin dump, tweaked',
-                                      'svnrdump dump, tweaked',
-                                      dumpfile_a_d_cmp,
-                                      dumpfile_r_d_cmp,
-                                      ignore_number_of_blank_lines=True)
-
-    # Try loading the dump files.
-    # For extra points, load each with the other tool:
-    #   svnadmin dump | svnrdump load
-    #   svnrdump dump | svnadmin load
-    repo_dir_a_n, repo_url_a_n = self.add_repo_path('load_a_n')
-    svntest.main.create_repos(repo_dir_a_n)
-    svntest.actions.enable_revprop_changes(repo_dir_a_n)
-    svntest.actions.run_and_verify_svnrdump(
-      dumpfile_a_n, svntest.verify.AnyOutput, [], 0, 'load', repo_url_a_n,
-      svntest.main.svnrdump_crosscheck_authentication)
+    # Keep debug output of maintainer builds out of the dump files.
+    saved_quiet = os.environ.get('SVN_DBG_QUIET')
+    os.environ['SVN_DBG_QUIET'] = 'y'
+    try:
+      dump_a_n = self.get_tempname('dump-a-n')
+      svntest.actions.run_and_verify_dump_to_file(self.repo_dir, dump_a_n)
+      verified_marker = _get_verified_marker(dump_a_n)
+      if os.path.exists(verified_marker):
+        logger.info("VERIFY: skipping dump/load cross-check:"
+                    " identical repository already verified")
+        return
+
+      self._verify_repo_dumps(dump_a_n, svnrdump_headers_missing,
+                              svnrdump_headers_always)
+    finally:
+      if saved_quiet is None:
+        del os.environ['SVN_DBG_QUIET']
+      else:
+        os.environ['SVN_DBG_QUIET'] = saved_quiet
 
-    repo_dir_a_d, repo_url_a_d = self.add_repo_path('load_a_d')
-    svntest.main.create_repos(repo_dir_a_d)
-    svntest.actions.enable_revprop_changes(repo_dir_a_d)
-    svntest.actions.run_and_verify_svnrdump(
-      dumpfile_a_d, svntest.verify.AnyOutput, [], 0, 'load', repo_url_a_d,
-      svntest.main.svnrdump_crosscheck_authentication)
+    svntest.main.file_write(verified_marker, '')
 
-    repo_dir_r_d, repo_url_r_d = self.add_repo_path('load_r_d')
-    svntest.main.create_repos(repo_dir_r_d)
-    svntest.actions.run_and_verify_load(repo_dir_r_d, dumpfile_r_d)
+  def _verify_repo_dumps(self, dump_a_n, svnrdump_headers_missing,
+                         svnrdump_headers_always):
+    "The work of verify_repo(), given the non-delta dump file DUMP_A_N."
 
-    # Dump the loaded repositories in the same way; expect exact equality
-    reloaded_dumpfile_a_n = svntest.actions.run_and_verify_dump(repo_dir_a_n)
-    reloaded_dumpfile_a_d = svntest.actions.run_and_verify_dump(repo_dir_a_d)
-    reloaded_dumpfile_r_d = svntest.actions.run_and_verify_dump(repo_dir_r_d)
-    svntest.verify.compare_dump_files('svnadmin dump no delta, loaded, dumped',
-                                      'svnadmin dump --deltas, loaded, dumped',
-                                      reloaded_dumpfile_a_n,
-                                      reloaded_dumpfile_a_d,
-                                      ignore_uuid=True)
-    svntest.verify.compare_dump_files('svnadmin dump, loaded, dumped',
-                                      'svnrdump dump, loaded, dumped',
-                                      reloaded_dumpfile_a_d,
-                                      reloaded_dumpfile_r_d,
-                                      ignore_uuid=True)
+    # Allocate all paths, and the sandbox of the svnsync mirror, up front;
+    # the threads below must not modify this sandbox.
+    dump_a_d = self.get_tempname('dump-a-d')
+    dump_r_d = self.get_tempname('dump-r-d')
+    repo_dir_a_n, repo_url_a_n = self.add_repo_path('load_a_n')
+    repo_dir_a_d, repo_url_a_d = self.add_repo_path('load_a_d')
+    repo_dir_r_d, repo_url_r_d = self.add_repo_path('load_r_d')
+    reloaded_a_n = self.get_tempname('reloaded-a-n')
+    reloaded_a_d = self.get_tempname('reloaded-a-d')
+    reloaded_r_d = self.get_tempname('reloaded-r-d')
+    dumps = [(dump_a_n, 'svnadmin dump'),
+             (dump_a_d, 'svnadmin dump --deltas'),
+             (dump_r_d, 'svnrdump dump')]
+    filtered = [self.get_tempname('filtered') for dump in dumps]
+    # Don't bother with svnsync if the repository was created by it.
+    with open(dump_a_n, 'rb') as f:
+      if b"svn:sync-from-url\n" in f:
+        mirror_sbox = None
+      else:
+        mirror_sbox = self.clone_dependent()
+
+    _run_concurrently(
+      lambda: svntest.actions.run_and_verify_dump_to_file(self.repo_dir,
+                                                          dump_a_d,
+                                                          deltas=True),
+      lambda: svntest.actions.run_and_verify_svnrdump_with_files(
+                None, dump_r_d, 'dump', '-q', self.repo_url,
+                svntest.main.svnrdump_crosscheck_authentication))
+
+    def compare_deltas_dumps():
+      # Compare the two deltas dumpfiles, ignoring expected differences
+      # Ignore differences in number of blank lines between node records,
+      # as svnrdump puts 3 whereas svnadmin puts 2 after a replace-with-copy.
+      _compare_dumps('svnadmin dump, tweaked', 'svnrdump dump, tweaked',
+                     dump_a_d, dump_r_d,
+                     (svnrdump_headers_missing, svnrdump_headers_always),
+                     (svnrdump_headers_always,),
+                     ignore_number_of_blank_lines=True)
+
+    # Try loading the dump files, and dump the results again.
+    # For extra points, load each with the other tool:
+    #   svnadmin dump | svnrdump load
+    #   svnrdump dump | svnadmin load
+    def svnrdump_load(dump, repo_dir, repo_url, reloaded):
+      svntest.main.create_repos(repo_dir)
+      svntest.actions.enable_revprop_changes(repo_dir)
+      svntest.actions.run_and_verify_svnrdump_with_files(
+        dump, None, 'load', repo_url,
+        svntest.main.svnrdump_crosscheck_authentication)
+      svntest.actions.run_and_verify_dump_to_file(repo_dir, reloaded)
+
+    def svnadmin_load(dump, repo_dir, reloaded):
+      svntest.main.create_repos(repo_dir)
+      svntest.actions.run_and_verify_load_from_file(repo_dir, dump)
+      svntest.actions.run_and_verify_dump_to_file(repo_dir, reloaded)
 
     # Run each dump through svndumpfilter and check for no further change.
-    for dumpfile, dumpfile_desc in [(dumpfile_a_n, 'svnadmin dump'),
-                                    (dumpfile_a_d, 'svnadmin dump --deltas'),
-                                    (dumpfile_r_d, 'svnrdump dump'),
-                                    ]:
-      ### No buffer size seems to work for update_tests-2. So skip that test?
-      ### (Its dumpfile size is ~360 KB non-delta, ~180 KB delta.)
-      if len(''.join(dumpfile)) > 100000:
-        continue
-
-      exit_code, dumpfile2, errput = svntest.main.run_command_stdin(
-        svntest.main.svndumpfilter_binary, None, -1, True,
-        dumpfile, '--quiet', 'include', '/')
+    def svndumpfilter(dump, dump_desc, filtered_dump):
+      exit_code, errput = svntest.main.run_command_with_files(
+        svntest.main.svndumpfilter_binary, dump, filtered_dump,
+        '--quiet', 'include', '/')
       assert not exit_code and not errput
       # Ignore empty prop sections in the input file during comparison, as
       # svndumpfilter strips them.
       # Ignore differences in number of blank lines between node records,
       # as svndumpfilter puts 3 instead of 2 after an add or delete record.
-      svntest.verify.compare_dump_files(dumpfile_desc,
-                                        'after svndumpfilter include /',
-                                        dumpfile, dumpfile2,
-                                        expect_content_length_always=True,
-                                        ignore_empty_prop_sections=True,
-                                        ignore_number_of_blank_lines=True)
+      _compare_dumps(dump_desc, 'after svndumpfilter include /',
+                     dump, filtered_dump,
+                     expect_content_length_always=True,
+                     ignore_empty_prop_sections=True,
+                     ignore_number_of_blank_lines=True)
 
     # Run the repository through 'svnsync' and check that this does not
-    # change the repository content. (Don't bother if it's already been
-    # created by svnsync.)
-    if "svn:sync-from-url\n" not in dumpfile_a_n:
-      dest_sbox = make_mirror(self)
-      verify_mirror(dest_sbox.repo_url, dest_sbox.repo_dir, dumpfile_a_n)
+    # change the repository content.  verify_mirror() needs both dumps in
+    # memory.
+    def svnsync_mirror():
+      if mirror_sbox:
+        make_mirror(self, dest_sbox=mirror_sbox)
+        verify_mirror(mirror_sbox.repo_url, mirror_sbox.repo_dir,
+                      list(_read_dump(dump_a_n)))
+
+    _run_concurrently(
+      compare_deltas_dumps,
+      lambda: svnrdump_load(dump_a_n, repo_dir_a_n, repo_url_a_n,
+                            reloaded_a_n),
+      lambda: svnrdump_load(dump_a_d, repo_dir_a_d, repo_url_a_d,
+                            reloaded_a_d),
+      lambda: svnadmin_load(dump_r_d, repo_dir_r_d, reloaded_r_d),
+      lambda: svndumpfilter(dumps[0][0], dumps[0][1], filtered[0]),
+      lambda: svndumpfilter(dumps[1][0], dumps[1][1], filtered[1]),
+      lambda: svndumpfilter(dumps[2][0], dumps[2][1], filtered[2]),
+      svnsync_mirror)
+
+    # Dump the loaded repositories in the same way; expect exact equality
+    _compare_dumps('svnadmin dump no delta, loaded, dumped',
+                   'svnadmin dump --deltas, loaded, dumped',
+                   reloaded_a_n, reloaded_a_d, ignore_uuid=True)
+    _compare_dumps('svnadmin dump, loaded, dumped',
+                   'svnrdump dump, loaded, dumped',
+                   reloaded_a_d, reloaded_r_d, ignore_uuid=True)
 
   def verify(self, skip_cross_check=False):
     """Do additional testing that should hold for any sandbox, such as
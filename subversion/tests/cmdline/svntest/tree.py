@@ -32,7 +32,7 @@ if sys.version_info[0] >= 3:
 else:
   # Python <3.0
   from cStringIO import StringIO
-from xml.dom.minidom import parseString
+import xml.etree.ElementTree as ElementTree
 import base64
 import logging
 
@@ -151,7 +151,9 @@ class SVNTypeMismatch(SVNTreeError):
 # A node in a tree.
 #
 # If CHILDREN is None, then the node is a file.  Otherwise, CHILDREN
-# is a list of the nodes making up that directory's children.
+# is a list of the nodes making up that directory's children.  Use
+# add_child() to add children; it also maintains an index of them by
+# name, for get_child() and compare_trees().
 #
 # NAME is simply the name of the file or directory.  CONTENTS is a
 # string that contains the file's contents (if a file), PROPS are
@@ -167,20 +169,34 @@ class SVNTreeNode:
     self.props = props
     self.atts = atts
     self.path = name
+    self._child_index = None
+    self._indexed_children = None
 
 # TODO: Check to make sure contents and children are mutually exclusive
 
+  def get_child_index(self):
+    """Return a dict that maps the names of this directory node's children
+    to the child nodes.  CHILDREN remains the authoritative, ordered list;
+    the index is rebuilt whenever that list was changed without going
+    through add_child()."""
+    index = self._child_index
+    if (index is None or self._indexed_children is not self.children
+        or len(index) != len(self.children)):
+      index = {}
+      for child in self.children:
+        # Like a linear search would, find the first child of that name.
+        index.setdefault(child.name, child)
+      self._child_index = index
+      self._indexed_children = self.children
+    return index
+
   def add_child(self, newchild):
-    child_already_exists = 0
     if self.children is None:  # if you're a file,
       self.children = []     # become an empty dir.
-    else:
-      for a in self.children:
-        if a.name == newchild.name:
-          child_already_exists = 1
-          break
+    index = self.get_child_index()
+    a = index.get(newchild.name)
 
-    if child_already_exists:
+    if a is not None:
       if newchild.children is None:
         # this is the 'end' of the chain, so copy any content here.
         a.contents = newchild.contents
@@ -193,6 +209,7 @@ class SVNTreeNode:
           a.add_child(i)
     else:
       self.children.append(newchild)
+      index[newchild.name] = newchild
       newchild.path = os.path.join(self.path, newchild.name)
 
 
@@ -508,27 +525,22 @@ def get_props(paths):
                                                    *paths)
 
   output = (line for line in output if not line.startswith('DBG:'))
-  dom = parseString(''.join(output))
-  target_nodes = dom.getElementsByTagName('target')
-  for target_node in target_nodes:
-    filename = target_node.attributes['path'].nodeValue
+  # Parse incrementally, dropping each target once we're done with it, so
+  # that big working copies don't need a full document tree in memory.
+  for event, target_node in ElementTree.iterparse(StringIO(''.join(output))):
+    if target_node.tag != 'target':
+      continue
+    filename = target_node.get('path')
     file_props = {}
-    for property_node in target_node.getElementsByTagName('property'):
-      name = property_node.attributes['name'].nodeValue
-      if property_node.hasChildNodes():
-        text_node = property_node.firstChild
-        value = text_node.nodeValue
-      else:
-        value = ''
-      try:
-        encoding = property_node.attributes['encoding'].nodeValue
-        if encoding == 'base64':
-          value = base64.b64decode(value)
-        else:
-          raise Exception("Unknown encoding '%s' for file '%s' property '%s'"
-                          % (encoding, filename, name,))
-      except KeyError:
-        pass
+    for property_node in target_node.iter('property'):
+      name = property_node.get('name')
+      value = property_node.text or ''
+      encoding = property_node.get('encoding')
+      if encoding == 'base64':
+        value = base64.b64decode(value)
+      elif encoding is not None:
+        raise Exception("Unknown encoding '%s' for file '%s' property '%s'"
+                        % (encoding, filename, name,))
       # If the property value contained a CR, or if under Windows an
       # "svn:*" property contains a newline, then the XML output
       # contains a CR character XML-encoded as '&#13;'.  The XML
@@ -540,8 +552,8 @@ def get_props(paths):
         value = eol_re_binary.sub(b'\n', value)
       file_props[name] = value
     files[filename] = file_props
+    target_node.clear()
 
-  dom.unlink()
   return files
 
 
@@ -564,10 +576,7 @@ def get_child(node, name):
   if node.children == None:
     logger.error("Foolish call to get_child.")
     sys.exit(1)
-  for n in node.children:
-    if name == n.name:
-      return n
-  return None
+  return node.get_child_index().get(name)
 
 
 # Helper for compare_trees
@@ -672,23 +681,25 @@ def compare_trees(label,
         display_nodes(a, b)
         raise SVNTreeUnequal
 
-      accounted_for = []
+      accounted_for = set()
       # For each child of A, check and see if it's in B.  If so, run
       # compare_trees on the two children and add b's child to
       # accounted_for.  If not, run FUNC_A on the child.  Next, for each
       # child of B, check and see if it's in accounted_for.  If it is,
-      # do nothing. If not, run FUNC_B on it.
+      # do nothing. If not, run FUNC_B on it.  Both lookups go through
+      # hashes, so that wide directories don't take quadratic time.
+      b_index = b.get_child_index()
       for a_child in a.children:
-        b_child = get_child(b, a_child.name)
-        if b_child:
-          accounted_for.append(b_child)
+        b_child = b_index.get(a_child.name)
+        if b_child is not None:
+          accounted_for.add(id(b_child))
           compare_trees(label, a_child, b_child,
                         singleton_handler_a, a_baton,
                         singleton_handler_b, b_baton)
         else:
           singleton_handler_a(a_child, a_baton)
       for b_child in b.children:
-        if b_child not in accounted_for:
+        if id(b_child) not in accounted_for:
           singleton_handler_b(b_child, b_baton)
   except SVNTypeMismatch:
     logger.warn('Unequal Types: one Node is a file, the other is a directory')
@@ -857,7 +868,8 @@ def build_tree_from_diff_summarize(lines):
 #   process for every file and dir in the working copy!
 
 
-def build_tree_from_wc(wc_path, load_props=0, ignore_svn=1, keep_eol_style=False):
+def build_tree_from_wc(wc_path, load_props=0, ignore_svn=1, keep_eol_style=False,
+                       content_digests=False):
     """Takes WC_PATH as the path to a working copy.  Walks the tree below
     that path, and creates the tree based on the actual found
     files.  If IGNORE_SVN is true, then exclude SVN admin dirs from the tree.
@@ -866,7 +878,11 @@ def build_tree_from_wc(wc_path, load_props=0, ignore_svn=1, keep_eol_style=False
     If KEEP_EOL_STYLE is set, don't let Python normalize the EOL when
     reading working copy contents as text files.  It has no effect on
     binary files.
+
+    If CONTENT_DIGESTS is set, the file nodes get a svntest.wc.ContentDigest
+    as their contents, see svntest.wc.State.from_wc().
     """
 
     return svntest.wc.State.from_wc(wc_path, load_props, ignore_svn,
-                                    keep_eol_style).old_tree()
+                                    keep_eol_style,
+                                    content_digests).old_tree()
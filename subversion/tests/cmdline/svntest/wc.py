@@ -29,6 +29,9 @@ import re
 import logging
 import pprint
 import io
+import bisect
+import hashlib
+import operator
 
 if sys.version_info[0] >= 3:
   # Python >=3.0
@@ -128,6 +131,211 @@ _re_parse_eid_merge_history = re.compile('merge-history: merge-ancestors ([0-9]+
 _re_parse_eid_ele = re.compile('^e([0-9]+): (none|normal|subbranch) '
                                '(-1|[0-9]+) (.*)$')
 
+class ContentDigest:
+  """Stands in for the contents of a file in a State created by
+  State.from_wc() with CONTENT_DIGESTS set.
+
+  A ContentDigest compares equal to another ContentDigest of the same
+  contents, and to the contents themselves as from_wc() would otherwise
+  have read them: a str for text, bytes for files that aren't UTF-8."""
+
+  def __init__(self, is_text, size, digest):
+    self.is_text = is_text
+    self.size = size
+    self.digest = digest
+
+  @classmethod
+  def from_contents(cls, contents):
+    "Return the ContentDigest of CONTENTS, a str or bytes object."
+    is_text = not isinstance(contents, bytes) or bytes is str
+    if not isinstance(contents, bytes):
+      contents = contents.encode('utf-8')
+    return cls(is_text, len(contents), hashlib.sha1(contents).hexdigest())
+
+  @classmethod
+  def from_file(cls, path, keep_eol_style=False):
+    """Return the ContentDigest of the working copy file PATH, reading it
+    in chunks.  KEEP_EOL_STYLE has the same meaning as for from_wc()."""
+    try:
+      checksum = hashlib.sha1()
+      size = 0
+      with io.open(path, 'r', encoding='utf-8',
+                   newline=('' if keep_eol_style else None)) as fp:
+        for chunk in iter(lambda: fp.read(65536), ''):
+          chunk = chunk.encode('utf-8')
+          checksum.update(chunk)
+          size += len(chunk)
+      return cls(True, size, checksum.hexdigest())
+    except ValueError:
+      # Not UTF-8; treat it as binary, just like _read_wc_file().
+      checksum = hashlib.sha1()
+      size = 0
+      with open(path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(65536), b''):
+          checksum.update(chunk)
+          size += len(chunk)
+      return cls(bytes is str, size, checksum.hexdigest())
+
+  def _key(self):
+    return (self.is_text, self.size, self.digest)
+
+  def __eq__(self, other):
+    if isinstance(other, (str, bytes, type(u''))):
+      other = ContentDigest.from_contents(other)
+    if not isinstance(other, ContentDigest):
+      return False
+    return self._key() == other._key()
+
+  def __ne__(self, other):
+    return not self.__eq__(other)
+
+  def __hash__(self):
+    return hash(self._key())
+
+  def __len__(self):
+    return self.size
+
+  def __repr__(self):
+    return '<%s of %d bytes, sha1 %s>' % (self.is_text and 'text' or 'binary',
+                                          self.size, self.digest)
+
+
+class _PathIndex:
+  """A sorted list of the paths of a State, used to find all paths in a
+  subtree without looking at every path in the State.
+
+  Paths use '/' as the separator, so the descendants of PATH are exactly
+  the paths that sort between PATH + '/' and PATH + '0' ('0' being the
+  character right after '/')."""
+
+  def __init__(self, paths):
+    self.paths = sorted(paths)
+
+  def __len__(self):
+    return len(self.paths)
+
+  def update(self, paths):
+    "Add PATHS, none of which may be in the index yet."
+    if len(paths) < 16:
+      for path in paths:
+        bisect.insort(self.paths, path)
+    else:
+      # Sorting two sorted runs is linear, and cheaper than many insorts.
+      self.paths.extend(paths)
+      self.paths.sort()
+
+  def discard(self, path):
+    "Remove PATH from the index, if it is there."
+    i = bisect.bisect_left(self.paths, path)
+    if i < len(self.paths) and self.paths[i] == path:
+      del self.paths[i]
+
+  def _range(self, subtree_path):
+    "Return the slice bounds of the descendants of SUBTREE_PATH."
+    lo = bisect.bisect_left(self.paths, subtree_path + '/')
+    hi = bisect.bisect_left(self.paths, subtree_path + '0', lo)
+    return lo, hi
+
+  def _root_index(self, subtree_path):
+    "Return the position of SUBTREE_PATH itself, or None."
+    i = bisect.bisect_left(self.paths, subtree_path)
+    if i < len(self.paths) and self.paths[i] == subtree_path:
+      return i
+    return None
+
+  def subtree(self, subtree_path, include_root=True):
+    """Return the paths of the descendants of SUBTREE_PATH, preceded by
+    SUBTREE_PATH itself if it is in the index and INCLUDE_ROOT is true."""
+    lo, hi = self._range(subtree_path)
+    paths = self.paths[lo:hi]
+    if include_root and self._root_index(subtree_path) is not None:
+      paths.insert(0, subtree_path)
+    return paths
+
+  def pop_subtree(self, subtree_path, include_root=True):
+    "Like subtree(), but also remove the returned paths from the index."
+    paths = self.subtree(subtree_path, include_root)
+    lo, hi = self._range(subtree_path)
+    del self.paths[lo:hi]
+    if include_root:
+      self.discard(subtree_path)
+    return paths
+
+
+class _StateDesc(dict):
+  """The DESC dictionary of a State: a dict which keeps a _PathIndex of
+  its paths up to date however paths are added or removed, so that States
+  sharing it, and tests editing it directly, never see a stale index.
+
+  The index is only built when first asked for; until then, changes cost
+  nothing extra."""
+
+  def __init__(self, *args, **kw):
+    dict.__init__(self, *args, **kw)
+    self._index = None
+
+  def path_index(self):
+    "Return the _PathIndex of the paths, building it if needed."
+    if self._index is None:
+      self._index = _PathIndex(self)
+    return self._index
+
+  def _added(self, paths):
+    if self._index is not None and paths:
+      self._index.update(paths)
+
+  def _removed(self, path):
+    if self._index is not None:
+      self._index.discard(path)
+
+  def __setitem__(self, path, item):
+    new = path not in self
+    dict.__setitem__(self, path, item)
+    if new:
+      self._added([path])
+
+  def __delitem__(self, path):
+    dict.__delitem__(self, path)
+    self._removed(path)
+
+  def setdefault(self, path, item=None):
+    if path not in self:
+      self[path] = item
+    return dict.__getitem__(self, path)
+
+  def pop(self, path, *default):
+    if path in self:
+      self._removed(path)
+    return dict.pop(self, path, *default)
+
+  def popitem(self):
+    path, item = dict.popitem(self)
+    self._removed(path)
+    return path, item
+
+  def update(self, *args, **kw):
+    more = dict(*args, **kw)
+    new = [path for path in more if path not in self]
+    dict.update(self, more)
+    self._added(new)
+
+  def clear(self):
+    dict.clear(self)
+    self._index = None
+
+  def pop_subtree(self, subtree_path, include_root=True):
+    """Remove SUBTREE_PATH's descendants, and SUBTREE_PATH itself if
+    INCLUDE_ROOT is true.  Return a dict mapping them to their items."""
+    removed = {}
+    for path in self.path_index().pop_subtree(subtree_path, include_root):
+      removed[path] = dict.pop(self, path)
+    return removed
+
+  def __reduce__(self):
+    # Copies and pickles get a fresh index.
+    return (_StateDesc, (dict(self),))
+
+
 class State:
   """Describes an existing or expected state of a working copy.
 
@@ -137,25 +345,47 @@ class State:
   Note: the paths should be *relative* to the root of the working copy,
   using '/' for the separator (see to_relpath()), and the root of the
   working copy is identified by the empty path: ''.
+
+  Subtree operations look up paths in a sorted index of DESC, which is
+  kept up to date however DESC is changed.  For that, DESC is copied into
+  a dict subclass unless it already is the DESC of another State, in
+  which case both States share it.
   """
 
   def __init__(self, wc_dir, desc):
     "Create a State using the specified description."
     assert isinstance(desc, dict)
 
+    if not isinstance(desc, _StateDesc):
+      desc = _StateDesc(desc)
     self.wc_dir = wc_dir
     self.desc = desc      # dictionary: path -> StateItem
 
+  def _update(self, more_desc):
+    "Add the items of MORE_DESC."
+    self.desc.update(more_desc)
+
+  def _del_item(self, path):
+    "Remove PATH from the state."
+    del self.desc[path]
+
+  def _del_subtree(self, subtree_path, include_root=True):
+    """Remove SUBTREE_PATH's descendants, and SUBTREE_PATH itself if
+    INCLUDE_ROOT is true, from the state.  Return a dict mapping the
+    removed paths to their items."""
+    return self.desc.pop_subtree(subtree_path, include_root)
+
   def add(self, more_desc):
     "Add more state items into the State."
     assert isinstance(more_desc, dict)
 
-    self.desc.update(more_desc)
+    self._update(more_desc)
 
   def add_state(self, parent, state, strict=False):
     "Import state items from a State object, reparent the items to PARENT."
     assert isinstance(state, State)
 
+    more_desc = {}
     for path, item in state.desc.items():
       if strict:
         path = parent + path
@@ -163,27 +393,25 @@ class State:
         path = parent
       else:
         path = parent + '/' + path
-      self.desc[path] = item
+      more_desc[path] = item
+    self._update(more_desc)
 
   def remove(self, *paths):
     "Remove PATHS from the state (the paths must exist)."
     for path in paths:
-      del self.desc[to_relpath(path)]
+      self._del_item(to_relpath(path))
 
   def remove_subtree(self, *paths):
     "Remove PATHS recursively from the state (the paths must exist)."
     for subtree_path in paths:
-      subtree_path = to_relpath(subtree_path)
-      for path, item in svntest.main.ensure_list(self.desc.items()):
-        if path == subtree_path or path[:len(subtree_path) + 1] == subtree_path + '/':
-          del self.desc[path]
+      self._del_subtree(to_relpath(subtree_path))
 
   def copy(self, new_root=None):
     """Make a deep copy of self.  If NEW_ROOT is not None, then set the
     copy's wc_dir NEW_ROOT instead of to self's wc_dir."""
-    desc = { }
+    desc = _StateDesc()
     for path, item in self.desc.items():
-      desc[path] = item.copy()
+      dict.__setitem__(desc, path, item.copy())
     if new_root is None:
       new_root = self.wc_dir
     return State(new_root, desc)
@@ -228,27 +456,26 @@ class State:
     """
     temp = {}
     for src, dst in sorted(moves.items(), key=lambda pair: pair[0])[::-1]:
-      temp[src] = {}
-      for path, item in svntest.main.ensure_list(self.desc.items()):
-        if path == src or path[:len(src) + 1] == src + '/':
-          temp[src][path] = item;
-          del self.desc[path]
+      temp[src] = self._del_subtree(src)
     for src, dst in sorted(moves.items(), key=lambda pair: pair[1]):
+      moved = {}
       for path, item in temp[src].items():
         if path == src:
           new_path = dst
         else:
           new_path = dst + path[len(src):]
-        self.desc[new_path] = item
+        moved[new_path] = item
+      self._update(moved)
 
   def subtree(self, subtree_path):
     """Return a State object which is a deep copy of the sub-tree
     beneath SUBTREE_PATH (which is assumed to be rooted at the tree of
     this State object's WC_DIR).  Exclude SUBTREE_PATH itself."""
-    desc = { }
-    for path, item in self.desc.items():
-      if path[:len(subtree_path) + 1] == subtree_path + '/':
-        desc[path[len(subtree_path) + 1:]] = item.copy()
+    desc = _StateDesc()
+    for path in self.desc.path_index().subtree(subtree_path,
+                                               include_root=False):
+      dict.__setitem__(desc, path[len(subtree_path) + 1:],
+                       self.desc[path].copy())
     return State(self.wc_dir, desc)
 
   def write_to_disk(self, target_dir):
@@ -387,19 +614,14 @@ class State:
         # These are only in their parents' THIS_DIR, they don't have entries.
         if item.status[0] in '!?' and item.treeconflict == 'C' and \
                                       item.entry_status is None:
-          del self.desc[path]
+          self._del_item(path)
         # Normal externals are not stored in the parent wc, drop the root
         # and everything in these working copies
         elif item.status == 'X ' or item.prev_status == 'X ':
-          del self.desc[path]
-          for p, i in self.desc.copy().items():
-            if p.startswith(path + '/'):
-              del self.desc[p]
+          self._del_subtree(path)
         elif item.entry_kind == 'file':
           # A file has no descendants in svn_wc_entry_t
-          for p, i in self.desc.copy().items():
-            if p.startswith(path + '/'):
-              del self.desc[p]
+          self._del_subtree(path, include_root=False)
         else:
           # when reading the entry structures, we don't examine for text or
           # property mods, so clear those flags. we also do not examine the
@@ -659,7 +881,7 @@ class State:
 
   @classmethod
   def from_wc(cls, base, load_props=False, ignore_svn=True,
-              keep_eol_style=False):
+              keep_eol_style=False, content_digests=False):
     """Create a State object from a working copy.
 
     Walks the tree at PATH, building a State based on the actual files
@@ -670,40 +892,30 @@ class State:
     If KEEP_EOL_STYLE is set, don't let Python normalize the EOL when
     reading working copy contents as text files.  It has no effect on
     binary files.
+
+    If CONTENT_DIGESTS is set, store a ContentDigest of each file rather
+    than its contents.  That saves memory when the State is only going
+    to be compared against another one.
     """
     if not base:
       # we're going to walk the base, and the OS wants "."
       base = '.'
 
     desc = { }
-    dot_svn = svntest.main.get_admin_name()
+    files = [ ]
 
-    for dirpath, dirs, files in os.walk(base):
-      parent = path_to_key(dirpath, base)
-      if ignore_svn and dot_svn in dirs:
-        dirs.remove(dot_svn)
-      for name in dirs + files:
-        node = os.path.join(dirpath, name)
-        if os.path.isfile(node):
-          try:
-            if keep_eol_style:
-              with io.open(node, 'r', newline='', encoding='utf-8') as fp:
-                contents = fp.read()
-            else:
-              with io.open(node, 'r', encoding='utf-8') as fp:
-                contents = fp.read()
-            if not isinstance(contents, str):
-              # Python 2: contents is read as an unicode object,
-              # but we expect it is a str.
-              contents = contents.encode()
-          except:
-            # If the file contains non UTF-8 character, we treat its
-            # content as binary represented as a bytes object.
-            with open(node, 'rb') as fp:
-              contents = fp.read()
-        else:
-          contents = None
-        desc[repos_join(parent, name)] = StateItem(contents=contents)
+    for key, node, is_file in _walk_wc(base, ignore_svn):
+      desc[key] = StateItem()
+      if is_file:
+        files.append((key, node))
+
+    if content_digests:
+      read = lambda node: ContentDigest.from_file(node, keep_eol_style)
+    else:
+      read = lambda node: _read_wc_file(node, keep_eol_style)
+    all_contents = _map_wc_files(read, [node for key, node in files])
+    for (key, node), contents in zip(files, all_contents):
+      desc[key].contents = contents
 
     if load_props:
       paths = [os.path.join(base, to_ospath(p)) for p in desc.keys()]
@@ -869,8 +1081,23 @@ class StateItem:
   Note that the location of this item is not specified. An external
   mechanism, such as the State class, will provide location information
   for each item.
+
+  Big expected states hold many of these and copy them often, so the
+  attributes live in slots, and a copy shares the PROPS dict with its
+  original until either of them accesses it for modification.
   """
 
+  # The attributes compared by __eq__(), WC_REV first; see __eq__().
+  _compared = ('wc_rev', 'contents', '_props', 'status', 'prev_status',
+               'verb', 'prev_verb', 'locked', 'copied', 'switched',
+               'writelocked', 'treeconflict', 'prev_treeconflict',
+               'moved_from', 'moved_to', 'eid', '_extra')
+  _not_compared = ('entry_kind', 'entry_rev', 'entry_status',
+                   'entry_copied', '_props_shared')
+  __slots__ = _compared + _not_compared
+
+  _get_compared = operator.attrgetter(*_compared)
+
   def __init__(self, contents=None, props=None,
                status=None, verb=None, wc_rev=None, entry_kind=None,
                entry_rev=None, entry_status=None, entry_copied=None,
@@ -892,8 +1119,10 @@ class StateItem:
 
     # A string of content (if the node is a file).
     self.contents = contents
-    # A dictionary mapping prop name to prop value; never None.
-    self.props = props
+    # A dictionary mapping prop name to prop value; never None.  See the
+    # props property below.
+    self._props = props
+    self._props_shared = False
     # A two-character string from the first two columns of 'svn status'.
     self.status = status
     self.prev_status = prev_status
@@ -923,12 +1152,57 @@ class StateItem:
     self.moved_from = moved_from
     self.moved_to = moved_to
     self.eid = eid
+    # Attributes set by tweak() that StateItem doesn't know; None if none.
+    self._extra = None
+
+  @property
+  def props(self):
+    "The PROPS dict; a copy of it if it is still shared with a copy()."
+    if self._props_shared:
+      self._props = self._props.copy()
+      self._props_shared = False
+    return self._props
+
+  @props.setter
+  def props(self, value):
+    self._props = value
+    self._props_shared = False
+
+  def __getattr__(self, name):
+    # Only called for names that aren't (initialized) slots.
+    if name == '_extra' or self._extra is None or name not in self._extra:
+      raise AttributeError("'StateItem' object has no attribute '%s'" % name)
+    return self._extra[name]
 
   def copy(self):
     "Make a deep copy of self."
-    new = StateItem()
-    vars(new).update(vars(self))
-    new.props = self.props.copy()
+    new = StateItem.__new__(StateItem)
+    # Spelled out, since that is a lot faster than looping over __slots__.
+    new.contents = self.contents
+    new._props = self._props
+    new.status = self.status
+    new.prev_status = self.prev_status
+    new.verb = self.verb
+    new.prev_verb = self.prev_verb
+    new.wc_rev = self.wc_rev
+    new.entry_kind = self.entry_kind
+    new.entry_rev = self.entry_rev
+    new.entry_status = self.entry_status
+    new.entry_copied = self.entry_copied
+    new.locked = self.locked
+    new.copied = self.copied
+    new.switched = self.switched
+    new.writelocked = self.writelocked
+    new.treeconflict = self.treeconflict
+    new.prev_treeconflict = self.prev_treeconflict
+    new.moved_from = self.moved_from
+    new.moved_to = self.moved_to
+    new.eid = self.eid
+    new._extra = self._extra
+    if self._extra is not None:
+      new._extra = self._extra.copy()
+    # Both copy the props before handing them out for modification.
+    self._props_shared = new._props_shared = True
     return new
 
   def tweak(self, **kw):
@@ -938,21 +1212,27 @@ class StateItem:
         value = str(value)
       if value is not None and name == 'eid':
         value = str(value)
-      setattr(self, name, value)
+      if name == 'props' or name in StateItem.__slots__:
+        setattr(self, name, value)
+      else:
+        # Not an attribute of ours, but remember (and compare) it anyway,
+        # as we always did.
+        if self._extra is None:
+          self._extra = { }
+        self._extra[name] = value
 
   def __eq__(self, other):
     if not isinstance(other, StateItem):
       return False
-    v_self = dict([(k, v) for k, v in vars(self).items()
-                   if not k.startswith('_') and not k.startswith('entry_')])
-    v_other = dict([(k, v) for k, v in vars(other).items()
-                    if not k.startswith('_') and not k.startswith('entry_')])
+    key_self = StateItem._get_compared(self)
+    key_other = StateItem._get_compared(other)
 
+    # Items added in revision 0 show up as '-'.
     if self.wc_rev == '0' and self.status == 'A ':
-      v_self['wc_rev'] = '-'
+      key_self = ('-',) + key_self[1:]
     if other.wc_rev == '0' and other.status == 'A ':
-      v_other['wc_rev'] = '-'
-    return v_self == v_other
+      key_other = ('-',) + key_other[1:]
+    return key_self == key_other
 
   def __ne__(self, other):
     return not self.__eq__(other)
@@ -988,7 +1268,7 @@ class StateItem:
     if self.eid is not None:
       atts['eid'] = self.eid
 
-    return (os.path.normpath(path), self.contents, self.props, atts)
+    return (os.path.normpath(path), self.contents, self._props, atts)
 
   @classmethod
   def from_entry(cls, entry):
@@ -1050,6 +1330,85 @@ else:
     return path.replace('/', os.sep)
 
 
+def _walk_wc(base, ignore_svn):
+  """Yield (KEY, PATH, IS_FILE) for each file and directory below BASE,
+  where KEY is the path relative to BASE as used in State.desc, PATH is
+  the path on disk and IS_FILE is what os.path.isfile(PATH) would say.
+  If IGNORE_SVN is true, skip the admin directories.
+
+  Like os.walk(), ignore errors reading directories and don't descend
+  into symlinks to directories."""
+
+  dot_svn = svntest.main.get_admin_name()
+
+  if not hasattr(os, 'scandir'):
+    # Python <3.5
+    for dirpath, dirs, files in os.walk(base):
+      parent = path_to_key(dirpath, base)
+      if ignore_svn and dot_svn in dirs:
+        dirs.remove(dot_svn)
+      for name in dirs + files:
+        node = os.path.join(dirpath, name)
+        yield repos_join(parent, name), node, os.path.isfile(node)
+    return
+
+  # The file type comes with the directory entries on most platforms, so
+  # this doesn't need to stat() every node like os.path.isfile() does.
+  dirpaths = [base]
+  while dirpaths:
+    dirpath = dirpaths.pop()
+    parent = path_to_key(dirpath, base)
+    try:
+      entries = list(os.scandir(dirpath))
+    except OSError:
+      continue
+    for entry in entries:
+      is_dir = entry.is_dir()
+      if is_dir and ignore_svn and entry.name == dot_svn:
+        continue
+      yield repos_join(parent, entry.name), entry.path, entry.is_file()
+      if is_dir and not entry.is_symlink():
+        dirpaths.append(entry.path)
+
+def _read_wc_file(path, keep_eol_style):
+  "Return the contents of the working copy file PATH, as from_wc() does."
+  try:
+    if keep_eol_style:
+      with io.open(path, 'r', newline='', encoding='utf-8') as fp:
+        contents = fp.read()
+    else:
+      with io.open(path, 'r', encoding='utf-8') as fp:
+        contents = fp.read()
+    if not isinstance(contents, str):
+      # Python 2: contents is read as an unicode object,
+      # but we expect it is a str.
+      contents = contents.encode()
+  except:
+    # If the file contains non UTF-8 character, we treat its
+    # content as binary represented as a bytes object.
+    with open(path, 'rb') as fp:
+      contents = fp.read()
+  return contents
+
+# Below this many files, starting threads costs more than it saves.
+_wc_files_per_thread = 64
+_wc_reader_threads = 8
+
+def _map_wc_files(func, paths):
+  """Return [FUNC(path) for path in PATHS], reading big working copies
+  with several threads: most of the time goes into waiting for I/O."""
+  threads = min(_wc_reader_threads, len(paths) // _wc_files_per_thread)
+  if threads < 2:
+    return [func(path) for path in paths]
+
+  from multiprocessing.pool import ThreadPool
+  pool = ThreadPool(threads)
+  try:
+    return pool.map(func, paths, _wc_files_per_thread)
+  finally:
+    pool.close()
+    pool.join()
+
 def path_to_key(path, base):
   """Return the relative path that represents the absolute path PATH under
   the absolute path BASE.  PATH must be a path under BASE.  The returned
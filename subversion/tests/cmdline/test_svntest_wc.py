@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+# ====================================================================
+#    Licensed to the Apache Software Foundation (ASF) under one
+#    or more contributor license agreements.  See the NOTICE file
+#    distributed with this work for additional information
+#    regarding copyright ownership.  The ASF licenses this file
+#    to you under the Apache License, Version 2.0 (the
+#    "License"); you may not use this file except in compliance
+#    with the License.  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing,
+#    software distributed under the License is distributed on an
+#    "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+#    KIND, either express or implied.  See the License for the
+#    specific language governing permissions and limitations
+#    under the License.
+# ====================================================================
+
+# Unit tests of svntest.wc.State, which don't need any Subversion binaries.
+# Run this without arguments.
+
+import copy
+import unittest
+
+from svntest.wc import State, StateItem as Item
+
+
+def paths(state):
+  return sorted(state.desc)
+
+class StateTestCase(unittest.TestCase):
+  def make_state(self, *paths):
+    return State('', dict([(path, Item()) for path in paths]))
+
+  def test_subtree_operations(self):
+    state = self.make_state('', 'A', 'A/B', 'A/B/C', 'A/D', 'AB', 'A-B')
+    self.assertEqual(paths(state.subtree('A')), ['B', 'B/C', 'D'])
+    state.rename({'A/B' : 'E'})
+    self.assertEqual(paths(state), ['', 'A', 'A-B', 'A/D', 'AB', 'E', 'E/C'])
+    state.remove_subtree('A')
+    self.assertEqual(paths(state), ['', 'A-B', 'AB', 'E', 'E/C'])
+
+  def test_direct_changes_same_count(self):
+    # Adding and removing as many paths directly must not leave a stale
+    # index behind.
+    state = self.make_state('A', 'A/B', 'C')
+    state.remove_subtree('C')
+    state.desc['D/E'] = Item()
+    del state.desc['A/B']
+    state.remove_subtree('D')
+    self.assertEqual(paths(state), ['A'])
+
+    state.desc.update({'F' : Item(), 'F/G' : Item()})
+    state.desc.pop('A')
+    self.assertEqual(paths(state.subtree('F')), ['G'])
+
+  def test_shared_desc(self):
+    # States sharing their DESC see each other's changes.
+    state = self.make_state('A', 'A/x')
+    other = State('', state.desc)
+    self.assertEqual(paths(other.subtree('A')), ['x'])
+    state.rename({'A' : 'B'})
+    self.assertEqual(paths(other), ['B', 'B/x'])
+    self.assertEqual(paths(other.subtree('B')), ['x'])
+    self.assertEqual(paths(other.subtree('A')), [])
+
+  def test_copies(self):
+    state = self.make_state('A', 'A/x')
+    state.subtree('A')
+    for dup in (state.copy(), copy.deepcopy(state)):
+      dup.remove_subtree('A')
+      self.assertEqual(paths(dup), [])
+      self.assertEqual(paths(state.subtree('A')), ['x'])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Usage: fanout.py [options]
+
+Time how svnpubsub's SvnPubSub.notifyAll() fans commits out to many
+subscribers (by default 10000), and compare it to the previous loop,
+which asked every connected client whether it was interested.
+
+The subscribers are spread over many repositories, a few of them asking
+for all the commits of a type or for all the commits.  They are driven
+by fake requests, which only count what is written to them, so no
+network is involved; both loops must write the same records.
+
+This needs Twisted, which svnpubsub.server imports."""
+
+import optparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', '..', '..', 'server-side', 'svnpubsub'))
+from svnpubsub import server
+
+
+class FakeDeferred:
+  def addErrback(self, func):
+    pass
+
+class FakeAddress:
+  port = 0
+
+class FakeRequest:
+  "Just enough of a twisted.web request for svnpubsub.server.Client."
+
+  client = FakeAddress()
+
+  def __init__(self):
+    self.records = 0
+
+  def notifyFinish(self):
+    return FakeDeferred()
+
+  def getClientIP(self):
+    return '127.0.0.1'
+
+  def write(self, data):
+    self.records += 1
+
+
+def make_clients(pubsub, subscribers, repositories, wildcards):
+  "Return SUBSCRIBERS clients of PUBSUB, as (client, request) pairs."
+  clients = [ ]
+  for i in range(subscribers):
+    if i < wildcards:
+      type, repository = None, None
+    elif i < 2 * wildcards:
+      type, repository = 'svn', None
+    else:
+      type, repository = 'svn', 'repos%d' % (i % repositories)
+    request = FakeRequest()
+    clients.append((server.Client(pubsub, request, server.Commit.KIND,
+                                  type, repository), request))
+  return clients
+
+def make_commit(i, repositories):
+  return server.Commit({'type' : 'svn', 'format' : 1,
+                        'repository' : 'repos%d' % (i % repositories),
+                        'id' : i + 1, 'committer' : 'johndoe',
+                        'log' : 'Frob the ganoozle with the snookish',
+                        'changed' : { 'trunk/file%d' % i : { 'flags' : 'U  ' },
+                                    }})
+
+def old_notify_all(clients, notification):
+  "The loop of SvnPubSub.notifyAll() before its clients were indexed."
+  data = notification.render()
+  for client in clients:
+    if client.interested_in(notification):
+      client.write_data(data)
+
+def main():
+  parser = optparse.OptionParser(usage=__doc__)
+  parser.add_option('-s', '--subscribers', action='store', type='int',
+                    default=10000,
+                    help='Number of subscribers (default: %default)')
+  parser.add_option('-r', '--repositories', action='store', type='int',
+                    default=1000,
+                    help='Number of repositories (default: %default)')
+  parser.add_option('-w', '--wildcards', action='store', type='int',
+                    default=10,
+                    help='Number of subscribers to all the commits, and to '
+                         'all the svn commits (default: %default each)')
+  parser.add_option('-c', '--commits', action='store', type='int',
+                    default=1000,
+                    help='Number of commits to send (default: %default)')
+  options, args = parser.parse_args()
+
+  pubsub = server.SvnPubSub(server.Commit, server.EventLog())
+  clients = make_clients(pubsub, options.subscribers, options.repositories,
+                         options.wildcards)
+  for client, request in clients:
+    pubsub.clients.add(client)
+  commits = [make_commit(i, options.repositories)
+             for i in range(options.commits)]
+
+  start = time.time()
+  for commit in commits:
+    old_notify_all([client for client, request in clients], commit)
+  t_old = time.time() - start
+  old_records = sum([request.records for client, request in clients])
+
+  for client, request in clients:
+    request.records = 0
+  start = time.time()
+  for commit in commits:
+    pubsub.notifyAll(commit)
+  t_new = time.time() - start
+  new_records = sum([request.records for client, request in clients])
+
+  assert old_records == new_records
+  print('%d subscribers, %d commits, %d records written'
+        % (options.subscribers, options.commits, new_records))
+  print('%-6s %10s %12s' % ('', 'total [s]', 'commit [ms]'))
+  for name, t in (('old', t_old), ('new', t_new)):
+    print('%-6s %10.3f %12.3f' % (name, t, 1000.0 * t / options.commits))
+
+if __name__ == '__main__':
+  main()
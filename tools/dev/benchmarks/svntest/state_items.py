@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Usage: state_items.py [options]
+
+Measure the time and memory taken by svntest.wc.StateItem when building,
+copying and comparing large states (by default 100000 items), and compare
+them to the previous StateItem, which kept its attributes in a __dict__.
+
+Memory is the growth reported by tracemalloc (Python 3) while building
+the state and making the copies, which are all kept alive, the way a
+test keeps the expected states of each step.
+
+This only needs the svntest package, not any Subversion binaries."""
+
+import gc
+import optparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', '..', '..', '..',
+                                'subversion', 'tests', 'cmdline'))
+import svntest
+from svntest.wc import State, StateItem
+
+
+class OldStateItem:
+  "The previous implementation of svntest.wc.StateItem, abridged."
+
+  def __init__(self, contents=None, props=None,
+               status=None, verb=None, wc_rev=None, entry_kind=None,
+               entry_rev=None, entry_status=None, entry_copied=None,
+               locked=None, copied=None, switched=None, writelocked=None,
+               treeconflict=None, moved_from=None, moved_to=None,
+               prev_status=None, prev_verb=None, prev_treeconflict=None,
+               eid=None):
+    if props is None:
+      props = { }
+    if wc_rev is not None:
+      wc_rev = str(wc_rev)
+    if eid is not None:
+      eid = str(eid)
+    self.contents = contents
+    self.props = props
+    self.status = status
+    self.prev_status = prev_status
+    self.verb = verb
+    self.prev_verb = prev_verb
+    self.wc_rev = wc_rev
+    self.entry_kind = None
+    self.entry_rev = entry_rev
+    self.entry_status = entry_status
+    self.entry_copied = entry_copied
+    self.locked = locked
+    self.copied = copied
+    self.switched = switched
+    self.writelocked = writelocked
+    self.treeconflict = treeconflict
+    self.prev_treeconflict = prev_treeconflict
+    self.moved_from = moved_from
+    self.moved_to = moved_to
+    self.eid = eid
+
+  def copy(self):
+    new = OldStateItem()
+    vars(new).update(vars(self))
+    new.props = self.props.copy()
+    return new
+
+  def __eq__(self, other):
+    if not isinstance(other, OldStateItem):
+      return False
+    v_self = dict([(k, v) for k, v in vars(self).items()
+                   if not k.startswith('_') and not k.startswith('entry_')])
+    v_other = dict([(k, v) for k, v in vars(other).items()
+                    if not k.startswith('_') and not k.startswith('entry_')])
+
+    if self.wc_rev == '0' and self.status == 'A ':
+      v_self['wc_rev'] = '-'
+    if other.wc_rev == '0' and other.status == 'A ':
+      v_other['wc_rev'] = '-'
+    return v_self == v_other
+
+  def __ne__(self, other):
+    return not self.__eq__(other)
+
+
+def make_state(item_class, items):
+  "Return a State of ITEMS items of ITEM_CLASS, a third of them files."
+  desc = { }
+  for i in range(items):
+    if i % 3:
+      desc['dir%d/sub%d' % (i // 100, i)] = item_class(status='  ', wc_rev=1)
+    else:
+      desc['dir%d/file%d' % (i // 100, i)] = item_class(
+                                  'This is file %d.\n' % i, {'p' : 'v'},
+                                  status='  ', wc_rev=1)
+  return State('', desc)
+
+def run(item_class, items, copies):
+  "Return time and memory measurements for ITEM_CLASS."
+  gc.collect()
+  tracemalloc.start()
+
+  start = time.time()
+  state = make_state(item_class, items)
+  t_build = time.time() - start
+  mem_build = tracemalloc.get_traced_memory()[0]
+
+  start = time.time()
+  all_copies = [state.copy() for i in range(copies)]
+  t_copy = (time.time() - start) / copies
+  mem_copy = (tracemalloc.get_traced_memory()[0] - mem_build) / copies
+
+  all_copies[-1].desc['dir0/file0'].status = 'M '
+  start = time.time()
+  assert state == all_copies[0]
+  assert state != all_copies[-1]
+  t_compare = (time.time() - start) / 2
+
+  tracemalloc.stop()
+  return t_build, t_copy, t_compare, mem_build, mem_copy
+
+def main():
+  parser = optparse.OptionParser(usage=__doc__)
+  parser.add_option('-n', '--items', action='store', type='int',
+                    default=100000,
+                    help='Number of items in the state (default: %default)')
+  parser.add_option('-c', '--copies', action='store', type='int', default=5,
+                    help='Number of copies to make (default: %default)')
+  options, args = parser.parse_args()
+
+  print('%d items, %d copies' % (options.items, options.copies))
+  print('%-10s %9s %9s %11s %10s %10s'
+        % ('', 'build [s]', 'copy [s]', 'compare [s]',
+           'build [MB]', 'copy [MB]'))
+  for name, item_class in (('old', OldStateItem), ('new', StateItem)):
+    t_build, t_copy, t_compare, mem_build, mem_copy = \
+      run(item_class, options.items, options.copies)
+    print('%-10s %9.3f %9.3f %11.3f %10.1f %10.1f'
+          % (name, t_build, t_copy, t_compare,
+             mem_build / 1048576.0, mem_copy / 1048576.0))
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Usage: state_ops.py [options]
+
+Time the subtree operations of svntest.wc.State -- subtree(),
+remove_subtree() and rename() -- on a large synthetic state (by default
+50000 items), and compare them to the previous implementations, which
+looked at every path of the state for every operation.
+
+Each operation is repeated on many small subtrees, the way a test tweaks
+its expected state after each step.  The "old" and "new" columns show
+the total time in seconds; both must produce the same states.
+
+This only needs the svntest package, not any Subversion binaries."""
+
+import optparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', '..', '..', '..',
+                                'subversion', 'tests', 'cmdline'))
+import svntest
+from svntest.wc import State, StateItem
+
+
+# The implementations before svntest.wc.State was indexed.
+
+def old_remove_subtree(state, *paths):
+  for subtree_path in paths:
+    for path, item in list(state.desc.items()):
+      if path == subtree_path or path[:len(subtree_path) + 1] == subtree_path + '/':
+        del state.desc[path]
+
+def old_rename(state, moves):
+  temp = {}
+  for src, dst in sorted(moves.items(), key=lambda pair: pair[0])[::-1]:
+    temp[src] = {}
+    for path, item in list(state.desc.items()):
+      if path == src or path[:len(src) + 1] == src + '/':
+        temp[src][path] = item;
+        del state.desc[path]
+  for src, dst in sorted(moves.items(), key=lambda pair: pair[1]):
+    for path, item in temp[src].items():
+      if path == src:
+        new_path = dst
+      else:
+        new_path = dst + path[len(src):]
+      state.desc[new_path] = item
+
+def old_subtree(state, subtree_path):
+  desc = { }
+  for path, item in state.desc.items():
+    if path[:len(subtree_path) + 1] == subtree_path + '/':
+      desc[path[len(subtree_path) + 1:]] = item.copy()
+  return State(state.wc_dir, desc)
+
+
+def make_state(items, fanout):
+  """Return a State of about ITEMS items, with FANOUT subdirectories and
+  FANOUT files per directory."""
+  desc = { '' : StateItem(status='  ', wc_rev=1) }
+  dirs = ['']
+  while len(desc) < items:
+    parent = dirs.pop(0)
+    for i in range(fanout):
+      path = svntest.wc.repos_join(parent, 'dir%d' % i)
+      desc[path] = StateItem(status='  ', wc_rev=1)
+      dirs.append(path)
+      path = svntest.wc.repos_join(parent, 'file%d' % i)
+      desc[path] = StateItem(status='  ', wc_rev=1)
+  return State('', desc)
+
+def leaf_dirs(state, count):
+  "Return COUNT directories of STATE that have no subdirectories."
+  dirs = [path for path in state.desc if path.endswith('dir0')
+          and path + '/dir0' not in state.desc]
+  return sorted(dirs)[:count]
+
+def timed(func, *args):
+  start = time.time()
+  func(*args)
+  return time.time() - start
+
+def bench_subtree(state, dirs, subtree):
+  for path in dirs:
+    subtree(state, path)
+
+def bench_remove_subtree(state, dirs, remove_subtree):
+  for path in dirs:
+    remove_subtree(state, path)
+
+def bench_rename(state, dirs, rename):
+  for path in dirs:
+    rename(state, { path : path + '_moved' })
+    rename(state, { path + '_moved' : path })
+
+def main():
+  parser = optparse.OptionParser(usage=__doc__)
+  parser.add_option('-n', '--items', action='store', type='int',
+                    default=50000,
+                    help='Number of items in the state (default: %default)')
+  parser.add_option('-f', '--fanout', action='store', type='int', default=8,
+                    help='Subdirectories and files per directory '
+                         '(default: %default)')
+  parser.add_option('-o', '--operations', action='store', type='int',
+                    default=50,
+                    help='Number of subtrees to operate on '
+                         '(default: %default)')
+  options, args = parser.parse_args()
+
+  template = make_state(options.items, options.fanout)
+  dirs = leaf_dirs(template, options.operations)
+  print('%d items, %d operations per benchmark'
+        % (len(template.desc), len(dirs)))
+  print('%-16s %10s %10s %8s' % ('operation', 'old [s]', 'new [s]', 'speedup'))
+
+  benchmarks = [
+    ('subtree', bench_subtree, old_subtree, State.subtree),
+    ('remove_subtree', bench_remove_subtree,
+     old_remove_subtree, State.remove_subtree),
+    ('rename', bench_rename, old_rename, State.rename),
+    ]
+  for name, bench, old_impl, new_impl in benchmarks:
+    old_state = template.copy()
+    new_state = template.copy()
+    t_old = timed(bench, old_state, dirs, old_impl)
+    t_new = timed(bench, new_state, dirs, new_impl)
+    assert old_state == new_state
+    print('%-16s %10.3f %10.3f %7.1fx'
+          % (name, t_old, t_new, t_old / max(t_new, 1e-6)))
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Usage: tree_compare.py [options] [WIDTH ...]
+
+Time building and comparing synthetic svntest.tree trees made of wide,
+flat directories: a root with a few subdirectories of WIDTH files each
+(default widths: 1000 2000 4000 8000).
+
+For each width, print the time taken by build_generic_tree() for the
+expected tree, by compare_trees() on two equal trees, and by
+compare_trees() on trees that differ in one entry per directory.  If
+those operations are linear in the directory width, the time per entry
+stays about the same as the width grows.
+
+This only needs the svntest package, not any Subversion binaries."""
+
+import optparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', '..', '..', '..',
+                                'subversion', 'tests', 'cmdline'))
+import svntest
+
+
+def make_nodelist(width, dirs, missing=None):
+  "Return a build_generic_tree() list of DIRS dirs of WIDTH files each."
+  nodelist = []
+  for d in range(dirs):
+    dirname = 'dir%d' % d
+    nodelist.append([dirname, None, {}, {'status' : '  ', 'wc_rev' : '1'}])
+    for f in range(width):
+      if f == missing:
+        continue
+      nodelist.append(['%s/file%d' % (dirname, f), 'This is file %d.\n' % f,
+                       {}, {'status' : '  ', 'wc_rev' : '1'}])
+  return nodelist
+
+def count_extra(node, baton):
+  baton.append(node.name)
+
+def time_call(func, *args):
+  start = time.time()
+  result = func(*args)
+  return time.time() - start, result
+
+def run(width, dirs):
+  entries = width * dirs
+
+  t_build, expected = time_call(svntest.tree.build_generic_tree,
+                                make_nodelist(width, dirs))
+  actual = svntest.tree.build_generic_tree(make_nodelist(width, dirs))
+  t_equal, _ = time_call(svntest.tree.compare_trees, 'bench',
+                         actual, expected)
+
+  actual = svntest.tree.build_generic_tree(make_nodelist(width, dirs,
+                                                         missing=width // 2))
+  extra = []
+  t_differ, _ = time_call(svntest.tree.compare_trees, 'bench',
+                          actual, expected, None, None, count_extra, extra)
+  assert len(extra) == dirs
+
+  print('%7d %9d %10.3f %10.3f %10.3f %11.2f'
+        % (width, entries, t_build, t_equal, t_differ,
+           1000000.0 * (t_build + t_equal + t_differ) / entries))
+
+def main():
+  parser = optparse.OptionParser(usage=__doc__)
+  parser.add_option('-d', '--dirs', action='store', type='int', default=4,
+                    help='Number of wide directories in each tree '
+                         '(default: %default)')
+  options, args = parser.parse_args()
+
+  widths = [int(arg) for arg in args] or [1000, 2000, 4000, 8000]
+
+  print('%7s %9s %10s %10s %10s %11s'
+        % ('width', 'entries', 'build [s]', 'equal [s]', 'differ [s]',
+           'us/entry'))
+  for width in widths:
+    run(width, options.dirs)
+
+if __name__ == '__main__':
+  main()
@@ -33,10 +33,14 @@
 #                              [CONFIG-FILE]
 #        mailer.py lock        REPOS AUTHOR [CONFIG-FILE]
 #        mailer.py unlock      REPOS AUTHOR [CONFIG-FILE]
+#        mailer.py deliver     REPOS [CONFIG-FILE]
 #
 #   Using CONFIG-FILE, deliver an email describing the changes between
 #   REV and REV-1 for the repository REPOS.
 #
+#   If CONFIG-FILE sets a spool_dir, the emails are written there instead,
+#   and 'mailer.py deliver' sends them.
+#
 #   ACTION was added as a fifth argument to the post-revprop-change hook
 #   in Subversion 1.2.0.  Its value is one of 'A', 'M' or 'D' to indicate
 #   if the property was added, modified or deleted, respectively.
@@ -56,11 +60,14 @@ else:
   from urllib import quote as  _url_quote
 import time
 import subprocess
-from io import BytesIO
 import smtplib
+import socket
+import json
 import re
 import tempfile
 import codecs
+import shutil
+import hashlib
 
 # Minimal version of Subversion's bindings required
 _MIN_SVN_VERSION = [1, 5, 0]
@@ -69,6 +76,7 @@ _MIN_SVN_VERSION = [1, 5, 0]
 # minimum version requirements.
 import svn.fs
 import svn.delta
+import svn.diff
 import svn.repos
 import svn.core
 if _MIN_SVN_VERSION > [svn.core.SVN_VER_MAJOR,
@@ -104,6 +112,9 @@ else:
 
 SEPARATOR = '=' * 78
 
+# The default for [general].max_buffer_size, in bytes.
+_MAX_BUFFER_SIZE = 1024 * 1024
+
 def main(pool, cmd, config_fname, repos_dir, cmd_args):
   ### TODO:  Sanity check the incoming args
 
@@ -141,6 +152,14 @@ def main(pool, cmd, config_fname, repos_dir, cmd_args):
                   'repos_basename': os.path.basename(repos.repos_dir)
                  })
     messenger = Lock(pool, cfg, repos, author, cmd == 'lock')
+  elif cmd == 'deliver':
+    repos = Repository(repos_dir, 0, pool) ### any old revision will do
+    cfg = Config(config_fname, repos,
+                 {'repos_basename': os.path.basename(repos.repos_dir)})
+    if not cfg.is_set('general.spool_dir'):
+      sys.stderr.write("mailer.py: No spool_dir is configured\n")
+      return 1
+    return SpoolDelivery(cfg).run()
   else:
     raise UnknownSubcommand(cmd)
 
@@ -200,6 +219,15 @@ class OutputBase:
     author of the action being reported."""
     raise NotImplementedError
 
+  def message_key(self, group, params):
+    """Override this method, if the output can deliver one message to the
+    recipients of several groups.
+    Return a hashable key such that groups with the same key and the same
+    message body may share a message, or None if every group must get its
+    own message; start() must then accept an ALSO argument (see
+    MailedOutput.start())."""
+    return None
+
   def finish(self):
     """Override this method.
     Flush any cached information and finish writing the output
@@ -236,7 +264,21 @@ class MailedOutput(OutputBase):
   def __init__(self, cfg, repos, prefix_param):
     OutputBase.__init__(self, cfg, repos, prefix_param)
 
-  def start(self, group, params):
+  def start(self, group, params, also=()):
+    """Begin a message for GROUP and PARAMS, as OutputBase.start() does.
+    ALSO is a sequence of other (group, params) pairs whose recipients
+    receive the same message; they are added to its To: header."""
+    self.to_addrs, self.from_addr, self.reply_to = \
+      self.get_addresses(group, params)
+    self.project = str(group)
+    for other_group, other_params in also:
+      for addr in self.get_addresses(other_group, other_params)[0]:
+        if addr not in self.to_addrs:
+          self.to_addrs.append(addr)
+      self.project = '%s, %s' % (self.project, other_group)
+
+  def get_addresses(self, group, params):
+    "Return the (to_addrs, from_addr, reply_to) of GROUP and PARAMS."
     # whitespace (or another character) separated list of addresses
     # which must be split into a clean list
     to_addr_in = self.cfg.get('to_addr', group, params)
@@ -245,23 +287,31 @@ class MailedOutput(OutputBase):
     # else use whitespaces
     if len(to_addr_in) >= 3 and to_addr_in[0] == '[' \
                             and to_addr_in[2] == ']':
-      self.to_addrs = \
+      to_addrs = \
         [_f for _f in to_addr_in[3:].split(to_addr_in[1]) if _f]
     else:
-      self.to_addrs = [_f for _f in to_addr_in.split() if _f]
-    self.from_addr = self.cfg.get('from_addr', group, params) \
-                     or self.repos.author or 'no_author'
+      to_addrs = [_f for _f in to_addr_in.split() if _f]
+    from_addr = self.cfg.get('from_addr', group, params) \
+                or self.repos.author or 'no_author'
     # if the from_addr (also) starts with '[.]' (may happen if one
     # map is used for both to_addr and from_addr) remove '[.]'
-    if len(self.from_addr) >= 3 and self.from_addr[0] == '[' \
-                                and self.from_addr[2] == ']':
-      self.from_addr = self.from_addr[3:]
-    self.reply_to = self.cfg.get('reply_to', group, params)
+    if len(from_addr) >= 3 and from_addr[0] == '[' \
+                           and from_addr[2] == ']':
+      from_addr = from_addr[3:]
+    reply_to = self.cfg.get('reply_to', group, params)
     # if the reply_to (also) starts with '[.]' (may happen if one
     # map is used for both to_addr and reply_to) remove '[.]'
-    if len(self.reply_to) >= 3 and self.reply_to[0] == '[' \
-                               and self.reply_to[2] == ']':
-      self.reply_to = self.reply_to[3:]
+    if len(reply_to) >= 3 and reply_to[0] == '[' \
+                          and reply_to[2] == ']':
+      reply_to = reply_to[3:]
+    return to_addrs, from_addr, reply_to
+
+  def message_key(self, group, params):
+    """Return what, besides the body and the recipients, tells apart the
+    messages of different groups: the sender, the Reply-To: address and
+    the subject."""
+    to_addrs, from_addr, reply_to = self.get_addresses(group, params)
+    return from_addr, reply_to, self.make_subject(group, params)
 
   def _rfc2047_encode(self, hdr):
     # Return the result of splitting HDR into tokens (on space
@@ -298,7 +348,7 @@ class MailedOutput(OutputBase):
            'X-Svn-Commit-Revision: %d\n' \
            'X-Svn-Commit-Repository: %s\n' \
            % (from_hdr, to_hdr, subject,
-              utils.formatdate(), utils.make_msgid(), group,
+              utils.formatdate(), utils.make_msgid(), self.project,
               self.repos.author or 'no_author', self.repos.rev,
               os.path.basename(self.repos.repos_dir))
     if self.reply_to:
@@ -309,10 +359,10 @@ class MailedOutput(OutputBase):
 class SMTPOutput(MailedOutput):
   "Deliver a mail message to an MTA using SMTP."
 
-  def start(self, group, params):
-    MailedOutput.start(self, group, params)
+  def start(self, group, params, also=()):
+    MailedOutput.start(self, group, params, also)
 
-    self.buffer = BytesIO()
+    self.buffer = tempfile.SpooledTemporaryFile(get_max_buffer_size(self.cfg))
     self.write_binary = self.buffer.write
 
     self.write(self.mail_headers(group, params))
@@ -332,32 +382,11 @@ class SMTPOutput(MailedOutput):
     (to minimize the chances of said lockout).
     """
 
-    if self.cfg.is_set('general.smtp_port'):
-       smtp_port = self.cfg.general.smtp_port
-    else:
-       smtp_port = 0
-    try:
-      if self.cfg.is_set('general.smtp_ssl') and self.cfg.general.smtp_ssl == 'yes':
-        server = smtplib.SMTP_SSL(self.cfg.general.smtp_hostname, smtp_port)
-      else:
-        server = smtplib.SMTP(self.cfg.general.smtp_hostname, smtp_port)
-    except Exception as detail:
-      sys.stderr.write("mailer.py: Failed to instantiate SMTP object: %s\n" % (detail,))
-      # Any error to instantiate is fatal
-      raise
+    server = smtp_connect(self.cfg)
 
     try:
-      if self.cfg.is_set('general.smtp_username'):
-        try:
-          server.login(self.cfg.general.smtp_username,
-                       self.cfg.general.smtp_password)
-        except smtplib.SMTPException as detail:
-          sys.stderr.write("mailer.py: SMTP login failed with username %s and/or password: %s\n"
-                           % (self.cfg.general.smtp_username, detail,))
-          # Any error at login is fatal
-          raise
-
-      server.sendmail(self.from_addr, self.to_addrs, self.buffer.getvalue())
+      self.buffer.seek(0)
+      smtp_send_file(server, self.from_addr, self.to_addrs, self.buffer)
 
     ### TODO: 'raise .. from' is Python 3+. When we convert this
     ###       script to Python 3, uncomment 'from detail' below
@@ -380,11 +409,122 @@ class SMTPOutput(MailedOutput):
       raise
 
     finally:
-      try:
-        server.quit()
-      except smtplib.SMTPException as detail:
-        sys.stderr.write("mailer.py: Error occurred during SMTP session cleanup: %s\n"
-                             % (detail,))
+      smtp_quit(server)
+      self.buffer.close()
+
+
+def smtp_connect(cfg):
+  """Return an SMTP (or SMTP_SSL) object connected to the server of the
+  configuration CFG, and logged in if a username is specified.
+
+  Errors are reported to stderr and re-raised; they should be considered
+  fatal (see SMTPOutput.finish())."""
+
+  if cfg.is_set('general.smtp_port'):
+     smtp_port = cfg.general.smtp_port
+  else:
+     smtp_port = 0
+  try:
+    if cfg.is_set('general.smtp_ssl') and cfg.general.smtp_ssl == 'yes':
+      server = smtplib.SMTP_SSL(cfg.general.smtp_hostname, smtp_port)
+    else:
+      server = smtplib.SMTP(cfg.general.smtp_hostname, smtp_port)
+  except Exception as detail:
+    sys.stderr.write("mailer.py: Failed to instantiate SMTP object: %s\n" % (detail,))
+    # Any error to instantiate is fatal
+    raise
+
+  if cfg.is_set('general.smtp_username'):
+    try:
+      server.login(cfg.general.smtp_username,
+                   cfg.general.smtp_password)
+    except smtplib.SMTPException as detail:
+      sys.stderr.write("mailer.py: SMTP login failed with username %s and/or password: %s\n"
+                       % (cfg.general.smtp_username, detail,))
+      smtp_quit(server)
+      # Any error at login is fatal
+      raise
+
+  return server
+
+
+def smtp_send_file(server, from_addr, to_addrs, fp):
+  """Send the message read from the binary file FP, from FROM_ADDR to
+  TO_ADDRS, over the SMTP connection SERVER.
+
+  This does what SERVER.sendmail() does, returning the recipients that
+  were refused and raising the same exceptions, but the message is sent
+  as it is read from FP, a chunk at a time, rather than held in memory."""
+  server.ehlo_or_helo_if_needed()
+
+  code, resp = server.mail(from_addr)
+  if code != 250:
+    _smtp_abort(server, code)
+    raise smtplib.SMTPSenderRefused(code, resp, from_addr)
+
+  refused = { }
+  for addr in to_addrs:
+    code, resp = server.rcpt(addr)
+    if code != 250 and code != 251:
+      refused[addr] = (code, resp)
+    if code == 421:
+      _smtp_abort(server, code)
+      raise smtplib.SMTPRecipientsRefused(refused)
+  if len(refused) == len(to_addrs):
+    _smtp_abort(server, code)
+    raise smtplib.SMTPRecipientsRefused(refused)
+
+  server.putcmd('data')
+  code, resp = server.getreply()
+  if code != 354:
+    _smtp_abort(server, code)
+    raise smtplib.SMTPDataError(code, resp)
+
+  # send the lines with CRLF endings, and with their leading dots doubled
+  chunk = [ ]
+  chunk_size = 0
+  for line in iter(fp.readline, b''):
+    if line[-2:] == b'\r\n':
+      line = line[:-2]
+    elif line[-1:] == b'\n':
+      line = line[:-1]
+    if line[:1] == b'.':
+      line = b'.' + line
+    chunk.append(line)
+    chunk_size = chunk_size + len(line) + 2
+    if chunk_size >= 64 * 1024:
+      chunk.append(b'')
+      server.send(b'\r\n'.join(chunk))
+      chunk = [ ]
+      chunk_size = 0
+  chunk.append(b'.\r\n')
+  server.send(b'\r\n'.join(chunk))
+
+  code, resp = server.getreply()
+  if code != 250:
+    _smtp_abort(server, code)
+    raise smtplib.SMTPDataError(code, resp)
+  return refused
+
+
+def _smtp_abort(server, code):
+  "Give up on the current message of SERVER, after the reply CODE."
+  if code == 421:
+    server.close()
+  else:
+    try:
+      server.rset()
+    except smtplib.SMTPServerDisconnected:
+      pass
+
+
+def smtp_quit(server):
+  "Close the SMTP session of SERVER, reporting any error to stderr."
+  try:
+    server.quit()
+  except smtplib.SMTPException as detail:
+    sys.stderr.write("mailer.py: Error occurred during SMTP session cleanup: %s\n"
+                         % (detail,))
 
 
 class StandardOutput(OutputBase):
@@ -417,8 +557,8 @@ class PipeOutput(MailedOutput):
     # figure out the command for delivery
     self.cmd = cfg.general.mail_command.split()
 
-  def start(self, group, params):
-    MailedOutput.start(self, group, params)
+  def start(self, group, params, also=()):
+    MailedOutput.start(self, group, params, also)
 
     ### gotta fix this. this is pretty specific to sendmail and qmail's
     ### mailwrapper program. should be able to use option param substitution
@@ -440,13 +580,431 @@ class PipeOutput(MailedOutput):
     self.pipe.wait()
 
 
+class SpoolOutput(MailedOutput):
+  """Write each mail message into the spool directory, for
+  'mailer.py deliver' to deliver later on."""
+
+  def __init__(self, cfg, repos, prefix_param):
+    MailedOutput.__init__(self, cfg, repos, prefix_param)
+    self.spool = Spool(cfg.general.spool_dir)
+
+  def start(self, group, params, also=()):
+    MailedOutput.start(self, group, params, also)
+
+    self.message = self.spool.create(self.from_addr, self.to_addrs)
+    self.write_binary = self.message.write
+
+    self.write(self.mail_headers(group, params))
+
+  def finish(self):
+    # the message only becomes visible to the delivery once complete
+    self.spool.add(self.message)
+
+
+class Spool:
+  """The directory of the mail messages waiting for delivery.
+
+  Each message is a file holding its envelope, as a line of JSON, followed
+  by the message itself. Messages are written as NAME.tmp and renamed to
+  NAME.msg once complete. A delivery claims a message by renaming it to
+  NAME.sending, so that several deliveries may run at the same time.
+  Messages which cannot be delivered are moved to the 'failed'
+  subdirectory."""
+
+  # How long a claimed message may stay unsent before it is assumed that
+  # the delivery which claimed it died, in seconds.
+  _CLAIM_TIMEOUT = 3600
+
+  def __init__(self, spool_dir):
+    self.spool_dir = spool_dir
+    self.failed_dir = os.path.join(spool_dir, 'failed')
+
+  def create(self, from_addr, to_addrs):
+    """Return a new message from FROM_ADDR to TO_ADDRS, as a file to be
+    written and then passed to add()."""
+    # the names sort in the order the messages were created
+    fd, fname = tempfile.mkstemp('.tmp', '%012d-' % time.time(),
+                                 self.spool_dir)
+    os.close(fd)
+    fp = open(fname, 'wb')
+    fp.write(self._envelope(from_addr, to_addrs, 0, 0))
+    return fp
+
+  def add(self, fp):
+    "Make the message FP, as returned by create(), available for delivery."
+    fp.close()
+    os.rename(fp.name, fp.name[:-len('.tmp')] + '.msg')
+
+  def _envelope(self, from_addr, to_addrs, attempts, next_try):
+    return to_bytes(json.dumps({ 'from' : from_addr,
+                                 'to' : to_addrs,
+                                 'attempts' : attempts,
+                                 'next_try' : next_try,
+                                 }) + '\n')
+
+  def claim_due(self):
+    """Yield the messages due for delivery, oldest first, as SpooledMessage
+    objects claimed by this process."""
+    now = time.time()
+    for fname in sorted(os.listdir(self.spool_dir)):
+      path = os.path.join(self.spool_dir, fname)
+      if fname.endswith('.sending'):
+        # give the messages of a delivery that died back to the spool
+        try:
+          if os.path.getmtime(path) < now - self._CLAIM_TIMEOUT:
+            os.rename(path, path[:-len('.sending')] + '.msg')
+        except OSError:
+          pass
+        continue
+      if not fname.endswith('.msg'):
+        continue
+
+      try:
+        message = SpooledMessage(path)
+        if message.next_try > now:
+          continue
+        message.path = path[:-len('.msg')] + '.sending'
+        os.rename(path, message.path)
+      except (IOError, OSError):
+        # another delivery took it
+        continue
+      os.utime(message.path, None)
+      yield message
+
+  def release(self, message):
+    "Give the claimed MESSAGE back to the spool, unchanged."
+    os.rename(message.path, message.path[:-len('.sending')] + '.msg')
+
+  def remove(self, message):
+    "Remove the claimed MESSAGE, once it is delivered."
+    os.remove(message.path)
+
+  def retry(self, message, delay):
+    "Give the claimed MESSAGE back to the spool, to retry in DELAY seconds."
+    fp = open(message.path[:-len('.sending')] + '.tmp', 'wb')
+    try:
+      fp.write(self._envelope(message.from_addr, message.to_addrs,
+                              message.attempts + 1, time.time() + delay))
+      message_fp = message.open()
+      try:
+        shutil.copyfileobj(message_fp, fp)
+      finally:
+        message_fp.close()
+    finally:
+      fp.close()
+    os.remove(message.path)
+    self.add(fp)
+
+  def fail(self, message):
+    "Move the claimed MESSAGE to the failed messages, for good."
+    if not os.path.isdir(self.failed_dir):
+      os.mkdir(self.failed_dir)
+    os.rename(message.path,
+              os.path.join(self.failed_dir,
+                           os.path.basename(message.path)[:-len('.sending')]
+                           + '.msg'))
+
+
+class SpooledMessage:
+  "A mail message of the spool."
+
+  def __init__(self, path):
+    self.path = path
+    fp = open(path, 'rb')
+    try:
+      envelope = json.loads(to_str(fp.readline()))
+    finally:
+      fp.close()
+    self.from_addr = envelope['from']
+    self.to_addrs = envelope['to']
+    self.attempts = envelope['attempts']
+    self.next_try = envelope['next_try']
+
+  def open(self):
+    "Return a file to read the message from, without its envelope."
+    fp = open(self.path, 'rb')
+    fp.readline()
+    return fp
+
+
+class SpoolDelivery:
+  """Deliver the messages of the spool, using one SMTP connection for up to
+  [general].spool_batch_size messages, or the [general].mail_command.
+
+  Messages that fail to be delivered are retried with an exponential
+  backoff, starting after [general].spool_retry_delay seconds, up to
+  [general].spool_max_attempts times. A message refused by the server is
+  not retried."""
+
+  # The longest delay between two delivery attempts, in seconds.
+  _MAX_RETRY_DELAY = 6 * 3600
+
+  def __init__(self, cfg):
+    self.cfg = cfg
+    self.spool = Spool(cfg.general.spool_dir)
+    self.batch_size = self._get_int('spool_batch_size', 100)
+    self.retry_delay = self._get_int('spool_retry_delay', 60)
+    self.max_attempts = self._get_int('spool_max_attempts', 10)
+    self.poll_interval = self._get_int('spool_poll_interval', 0)
+    self.server = None
+
+  def _get_int(self, option, default):
+    try:
+      return int(self.cfg.is_set('general.' + option) or default)
+    except ValueError:
+      return default
+
+  def run(self):
+    """Deliver the messages which are due. If [general].spool_poll_interval
+    is set, keep on doing so every that many seconds.
+
+    Return 1 if any message failed to be delivered, 0 otherwise."""
+    while True:
+      ret = self.deliver()
+      if not self.poll_interval:
+        return ret
+      time.sleep(self.poll_interval)
+
+  def deliver(self):
+    "Deliver the messages which are due, and return as run() does."
+    ret = 0
+    sent = 0
+    try:
+      for message in self.spool.claim_due():
+        try:
+          if self.server is None \
+             and not self.cfg.is_set('general.mail_command'):
+            try:
+              self.server = smtp_connect(self.cfg)
+            except (smtplib.SMTPConnectError, smtplib.SMTPServerDisconnected,
+                    socket.error):
+              # already reported; the next delivery will try again
+              self.spool.release(message)
+              return 1
+          delivered = self._send(message)
+        except MessageSendFailure:
+          self.spool.fail(message)
+          ret = 1
+          continue
+        except:
+          # the delivery cannot go on; leave the message to the next one
+          self.spool.release(message)
+          raise
+
+        if delivered:
+          self.spool.remove(message)
+          sent = sent + 1
+          if self.server is not None and sent % self.batch_size == 0:
+            smtp_quit(self.server)
+            self.server = None
+        else:
+          ret = 1
+          if message.attempts + 1 >= self.max_attempts:
+            sys.stderr.write("mailer.py: Giving up on %s after %d attempts\n"
+                             % (message.path, message.attempts + 1))
+            self.spool.fail(message)
+          else:
+            self.spool.retry(message,
+                             min(self.retry_delay * 2 ** message.attempts,
+                                 self._MAX_RETRY_DELAY))
+    finally:
+      if self.server is not None:
+        smtp_quit(self.server)
+        self.server = None
+    return ret
+
+  def _send(self, message):
+    """Send MESSAGE. Return True if it was delivered, False if it should be
+    retried later on, or raise MessageSendFailure if it was refused."""
+    if self.cfg.is_set('general.mail_command'):
+      cmd = self.cfg.general.mail_command.split() \
+            + [ '-f', message.from_addr ] + message.to_addrs
+      pipe = subprocess.Popen(cmd, stdin=subprocess.PIPE,
+                              close_fds=sys.platform != "win32")
+      fp = message.open()
+      try:
+        shutil.copyfileobj(fp, pipe.stdin)
+      finally:
+        fp.close()
+      pipe.stdin.close()
+      if pipe.wait():
+        sys.stderr.write("mailer.py: %s exited with status %d\n"
+                         % (cmd[0], pipe.returncode))
+        return False
+      return True
+
+    fp = message.open()
+    try:
+      refused = smtp_send_file(self.server, message.from_addr,
+                               message.to_addrs, fp)
+      for addr, detail in refused.items():
+        sys.stderr.write("mailer.py: SMTP recipient refused: %s: %s\n"
+                         % (addr, detail,))
+      return True
+
+    except smtplib.SMTPRecipientsRefused as detail:
+      sys.stderr.write("mailer.py: SMTP recipient(s) refused: %s: %s\n"
+                       % (message.to_addrs, detail,))
+      codes = [code for code, msg in detail.recipients.values()]
+      if min(codes) >= 500:
+        raise MessageSendFailure ### from detail
+
+    except smtplib.SMTPResponseException as detail:
+      # this includes SMTPSenderRefused and SMTPDataError
+      sys.stderr.write("mailer.py: SMTP error occurred: %s\n" % (detail,))
+      if detail.smtp_code >= 500:
+        raise MessageSendFailure ### from detail
+
+    except (smtplib.SMTPException, socket.error) as detail:
+      # the connection was lost
+      sys.stderr.write("mailer.py: SMTP error occurred: %s\n" % (detail,))
+      self.server.close()
+      self.server = None
+
+    finally:
+      fp.close()
+
+    return False
+
+
+def get_max_buffer_size(cfg):
+  """Return how many bytes of a message, or of the diffs of a commit, are
+  kept in memory before they go to a temporary file."""
+  try:
+    return int(cfg.is_set('general.max_buffer_size') or _MAX_BUFFER_SIZE)
+  except ValueError:
+    return _MAX_BUFFER_SIZE
+
+
+class OutputRecorder:
+  """Record what is written to it, so it may be written to any number of
+  outputs later on. The data is kept in a temporary file, which stays in
+  memory up to MAX_MEMORY bytes.
+
+  If MAX_SIZE is not 0, the writes beyond MAX_SIZE bytes are dropped, and
+  a notice of how much was dropped ends the recording."""
+
+  def __init__(self, max_memory, max_size=0):
+    self.file = tempfile.SpooledTemporaryFile(max_memory)
+    self.max_size = max_size
+    self.size = 0
+    self.omitted = 0
+    # [is_text, length] for each run of writes of the same kind
+    self.segments = [ ]
+    self.digest = hashlib.sha1()
+
+  def write_binary(self, output):
+    self._append(False, output)
+
+  def write(self, output):
+    self._append(True, to_bytes(output))
+
+  def _append(self, is_text, data):
+    if self.omitted or self.max_size and self.size + len(data) > self.max_size:
+      self.omitted = self.omitted + len(data)
+      return
+    if not self.segments or self.segments[-1][0] != is_text:
+      self.segments.append([is_text, 0])
+    self.segments[-1][1] = self.segments[-1][1] + len(data)
+    self.size = self.size + len(data)
+    self.file.write(data)
+    self.digest.update(data)
+
+  def finish(self):
+    """Finish the recording. From then on, recordings compare equal when
+    they produce the same output."""
+    if self.omitted:
+      omitted = self.omitted
+      self.omitted = 0
+      self.max_size = 0
+      self.write('\n[Message truncated: %d more bytes not shown.]\n'
+                 % omitted)
+    self.key = (self.digest.digest(),
+                tuple([tuple(segment) for segment in self.segments]))
+
+  def __eq__(self, other):
+    return self.key == other.key
+
+  def __ne__(self, other):
+    return self.key != other.key
+
+  def __hash__(self):
+    return hash(self.key)
+
+  def replay(self, output):
+    "Write the recording to OUTPUT."
+    self.file.seek(0)
+    for is_text, length in self.segments:
+      if is_text and PY3:
+        decoder = codecs.getincrementaldecoder('utf-8')()
+      while length:
+        data = self.file.read(min(length, 64 * 1024))
+        length = length - len(data)
+        if not is_text:
+          output.write_binary(data)
+        elif PY3:
+          output.write(decoder.decode(data, not length))
+        else:
+          output.write(data)
+
+  def close(self):
+    self.file.close()
+
+
+class DiffCache:
+  """The diffs of a commit, computed once and shared by all of its
+  messages. Their lines are kept in a temporary file, which stays in
+  memory up to MAX_MEMORY bytes."""
+
+  def __init__(self, max_memory):
+    self.file = tempfile.SpooledTemporaryFile(max_memory)
+    # key -> (binary, sizes, (offset, length) of the lines or None)
+    self.entries = { }
+
+  def add(self, key, binary, sizes, content, max_size=0):
+    """Keep the diff of KEY: the BINARY flag, the SIZES of files too large
+    to diff (see get_file_sizes()), and the lines of CONTENT, if not None.
+    If MAX_SIZE is not 0, the lines beyond MAX_SIZE bytes are replaced by
+    a notice of how much was dropped."""
+    extent = None
+    if content is not None:
+      self.file.seek(0, 2)
+      offset = self.file.tell()
+      size = omitted = 0
+      for line in content:
+        if omitted or max_size and size + len(line.raw) > max_size:
+          omitted = omitted + len(line.raw)
+          continue
+        self.file.write(line.raw)
+        size = size + len(line.raw)
+      if omitted:
+        self.file.write(to_bytes('[Diff truncated: %d more bytes not shown.]\n'
+                                 % omitted))
+      extent = (offset, self.file.tell() - offset)
+    self.entries[key] = (binary, sizes, extent)
+
+  def get(self, key):
+    """Return the (binary, sizes, content) of the diff of KEY, where
+    CONTENT is a new CachedDiffContent or None. Raise KeyError if the diff
+    is not known."""
+    binary, sizes, extent = self.entries[key]
+    if extent is None:
+      return binary, sizes, None
+    return binary, sizes, CachedDiffContent(self.file, extent[0], extent[1])
+
+  def close(self):
+    self.file.close()
+
+
 class Messenger:
   def __init__(self, pool, cfg, repos, prefix_param):
     self.pool = pool
     self.cfg = cfg
     self.repos = repos
 
-    if cfg.is_set('general.mail_command'):
+    if cfg.is_set('general.spool_dir'):
+      cls = SpoolOutput
+    elif cfg.is_set('general.mail_command'):
       cls = PipeOutput
     elif cfg.is_set('general.smtp_hostname'):
       cls = SMTPOutput
@@ -509,35 +1067,85 @@ class Commit(Messenger):
     else:
       self.output.subject = 'r%d - %s' % (repos.rev, dirlist)
 
+  # The options that generate_content() looks up. The body of a message
+  # depends on nothing else than their values, the group's paths and the
+  # commit itself.
+  _content_options = ('generate_diffs', 'suppress_deletes', 'suppress_adds',
+                      'show_nonmatching_paths', 'commit_url', 'diff',
+                      'diff_max_size', 'truncate_diff', 'truncate_message',
+                      'diff_add_url', 'diff_copy_url', 'diff_delete_url',
+                      'diff_modify_url')
+
+  def _body_key(self, group, params, paths):
+    """Return a hashable key for the body of the message for GROUP,
+    PARAMS and PATHS: groups with equal keys get the same body."""
+    values = tuple([self.cfg.get_raw(option, group)
+                    for option in self._content_options])
+    # the params only matter when they may be substituted into a value
+    for option, value in zip(self._content_options, values):
+      if '%' in value or self.cfg.is_set('maps.' + option):
+        return frozenset(paths), values, tuple(sorted(params.items()))
+    return frozenset(paths), values
+
   def generate(self):
     "Generate email for the various groups and option-params."
 
-    ### the groups need to be further compressed. if the headers and
-    ### body are the same across groups, then we can have multiple To:
-    ### addresses. SMTPOutput holds the entire message body in memory,
-    ### so if the body doesn't change, then it can be sent N times
-    ### rather than rebuilding it each time.
-
     subpool = svn.core.svn_pool_create(self.pool)
     ret = 0
 
-    # build a renderer, tied to our output stream
-    renderer = TextCommitRenderer(self.output)
-
+    # Render the body of each message once per distinct _body_key(); the
+    # diff of each file is computed once for all of them.
+    max_memory = get_max_buffer_size(self.cfg)
+    diff_cache = DiffCache(max_memory)
+    bodies = { }
+    messages = [ ]
+    coalesced = { }
     for (group, param_tuple), (params, paths) in sorted(self.groups.items()):
-      try:
-        self.output.start(group, params)
+      key = self._body_key(group, params, paths)
+      if key not in bodies:
+        try:
+          max_size = int(self.cfg.get('truncate_message', group, params))
+        except ValueError:
+          max_size = 0
+        recorder = OutputRecorder(max_memory, max_size)
 
         # generate the content for this group and set of params
-        generate_content(renderer, self.cfg, self.repos, self.changelist,
-                         group, params, paths, subpool)
+        generate_content(TextCommitRenderer(recorder), self.cfg, self.repos,
+                         self.changelist, group, params, paths, subpool,
+                         diff_cache)
+        recorder.finish()
+        bodies[key] = recorder
+        svn.core.svn_pool_clear(subpool)
+
+      # if the headers and body are the same across groups, send a single
+      # message to the recipients of all of them.
+      body = bodies[key]
+      message_key = self.output.message_key(group, params)
+      if message_key is not None and (message_key, body) in coalesced:
+        coalesced[message_key, body].append((group, params))
+        continue
+      also = [ ]
+      if message_key is not None:
+        coalesced[message_key, body] = also
+      messages.append((group, params, body, also))
 
+    svn.core.svn_pool_destroy(subpool)
+    diff_cache.close()
+
+    for group, params, body, also in messages:
+      try:
+        if also:
+          self.output.start(group, params, also)
+        else:
+          self.output.start(group, params)
+        body.replay(self.output)
         self.output.finish()
       except MessageSendFailure:
         ret = 1
-      svn.core.svn_pool_clear(subpool)
 
-    svn.core.svn_pool_destroy(subpool)
+    for body in bodies.values():
+      body.close()
+
     return ret
 
 
@@ -577,18 +1185,25 @@ class PropChange(Messenger):
           self.output.write(propvalue)
         elif self.action == 'M':
           self.output.write('Property diff:\n')
-          tempfile1 = tempfile.NamedTemporaryFile()
-          tempfile1.write(_stdin.read())
-          tempfile1.flush()
-          tempfile2 = tempfile.NamedTemporaryFile()
-          tempfile2.write(self.repos.get_rev_prop(self.propname))
-          tempfile2.flush()
-          self.output.run(self.cfg.get_diff_cmd(group, {
-            'label_from' : 'old property value',
-            'label_to' : 'new property value',
-            'from' : tempfile1.name,
-            'to' : tempfile2.name,
-            }))
+          if self.cfg.get('diff', group, None).strip() == 'internal':
+            for line in internal_diff(_stdin.read(),
+                                      self.repos.get_rev_prop(self.propname),
+                                      'old property value',
+                                      'new property value', self.pool):
+              self.output.write_binary(line)
+          else:
+            tempfile1 = tempfile.NamedTemporaryFile()
+            tempfile1.write(_stdin.read())
+            tempfile1.flush()
+            tempfile2 = tempfile.NamedTemporaryFile()
+            tempfile2.write(self.repos.get_rev_prop(self.propname))
+            tempfile2.flush()
+            self.output.run(self.cfg.get_diff_cmd(group, {
+              'label_from' : 'old property value',
+              'label_to' : 'new property value',
+              'from' : tempfile1.name,
+              'to' : tempfile2.name,
+              }))
         self.output.finish()
       except MessageSendFailure:
         ret = 1
@@ -764,7 +1379,13 @@ class DiffURLSelections:
     return self._get_url('modify', repos_rev, change)
 
 def generate_content(renderer, cfg, repos, changelist, group, params, paths,
-                     pool):
+                     pool, diff_cache=None):
+  """Render the message for GROUP and PARAMS about PATHS with RENDERER.
+  DIFF_CACHE is a DiffCache in which the diffs are kept, to be shared by
+  all the calls for one commit."""
+
+  if diff_cache is None:
+    diff_cache = DiffCache(get_max_buffer_size(cfg))
 
   svndate = repos.get_rev_prop(svn.core.SVN_PROP_REVISION_DATE)
   ### pick a different date format?
@@ -791,7 +1412,8 @@ def generate_content(renderer, cfg, repos, changelist, group, params, paths,
 
   if len(paths) != len(changelist) and show_nonmatching_paths == 'yes':
     other_diffs = DiffGenerator(changelist, paths, False, cfg, repos, date,
-                                group, params, diffsels, diffurls, pool)
+                                group, params, diffsels, diffurls, pool,
+                                diff_cache)
   else:
     other_diffs = None
 
@@ -811,7 +1433,7 @@ def generate_content(renderer, cfg, repos, changelist, group, params, paths,
     other_deleted_data=other_deleted_data,
     other_modified_data=other_modified_data,
     diffs=DiffGenerator(changelist, paths, True, cfg, repos, date, group,
-                        params, diffsels, diffurls, pool),
+                        params, diffsels, diffurls, pool, diff_cache),
     other_diffs=other_diffs,
     )
   renderer.render(data)
@@ -850,7 +1472,7 @@ class DiffGenerator:
   "This is a generator-like object returning DiffContent objects."
 
   def __init__(self, changelist, paths, in_paths, cfg, repos, date, group,
-               params, diffsels, diffurls, pool):
+               params, diffsels, diffurls, pool, diff_cache=None):
     self.changelist = changelist
     self.paths = paths
     self.in_paths = in_paths
@@ -862,6 +1484,9 @@ class DiffGenerator:
     self.diffsels = diffsels
     self.diffurls = diffurls
     self.pool = pool
+    if diff_cache is None:
+      diff_cache = DiffCache(get_max_buffer_size(cfg))
+    self.diff_cache = diff_cache
 
     self.diff = self.diff_url = None
 
@@ -887,6 +1512,7 @@ class DiffGenerator:
       dst_fname = None
       binary = None
       singular = None
+      sizes = None
       content = None
 
       # just skip directories. they have no diffs.
@@ -1002,21 +1628,48 @@ class DiffGenerator:
           singular = False
 
       if diff:
-        binary = diff.either_binary()
-        if binary:
-          content = src_fname = dst_fname = None
-        else:
-          src_fname, dst_fname = diff.get_files()
-          try:
-            content = DiffContent(self.cfg.get_diff_cmd(self.group, {
-              'label_from' : label1,
-              'label_to' : label2,
-              'from' : src_fname,
-              'to' : dst_fname,
-              }))
-          except OSError:
-            # diff command does not exist, try difflib.unified_diff()
-            content = DifflibDiffContent(label1, label2, src_fname, dst_fname)
+        # The labels name the paths and revisions, so along with the diff
+        # command they identify the diff. Groups that show the same diff
+        # reuse its lines, and do not get the names of the temporary files.
+        diff_cmd = self.cfg.get('diff', self.group, None)
+        try:
+          max_size = int(self.cfg.get('diff_max_size', self.group, None))
+        except ValueError:
+          max_size = 0
+        try:
+          truncate_diff = int(self.cfg.get('truncate_diff', self.group, None))
+        except ValueError:
+          truncate_diff = 0
+        cache_key = (kind, label1, label2, diff_cmd, max_size, truncate_diff)
+        try:
+          binary, sizes, content = self.diff_cache.get(cache_key)
+        except KeyError:
+          binary = diff.either_binary()
+          sizes = content = None
+          if not binary and max_size:
+            sizes = get_file_sizes(diff, self.pool)
+            if max(sizes) <= max_size:
+              sizes = None
+          if binary or sizes:
+            src_fname = dst_fname = None
+          elif diff_cmd.strip() == 'internal':
+            content = InternalDiffContent(diff, label1, label2, self.pool)
+          else:
+            src_fname, dst_fname = diff.get_files()
+            try:
+              content = DiffContent(self.cfg.get_diff_cmd(self.group, {
+                'label_from' : label1,
+                'label_to' : label2,
+                'from' : src_fname,
+                'to' : dst_fname,
+                }))
+            except OSError:
+              # diff command does not exist, try difflib.unified_diff()
+              content = DifflibDiffContent(label1, label2, src_fname,
+                                           dst_fname)
+          self.diff_cache.add(cache_key, binary, sizes, content,
+                              truncate_diff)
+          binary, sizes, content = self.diff_cache.get(cache_key)
 
       # return a data item for this diff
       return _data(
@@ -1031,6 +1684,7 @@ class DiffGenerator:
         from_fname=src_fname,
         to_fname=dst_fname,
         binary=binary,
+        sizes=sizes,
         singular=singular,
         content=content,
         )
@@ -1096,6 +1750,35 @@ class DiffContent:
       type=ltype,
       )
 
+class CachedDiffContent:
+  """This is a generator-like object returning annotated lines of a diff,
+  read from the LENGTH bytes at OFFSET in the file FP (see DiffCache)."""
+
+  def __init__(self, fp, offset, length):
+    self.seen_change = False
+    self.fp = fp
+    self.pos = offset
+    self.end = offset + length
+
+  def __nonzero__(self):
+    # we always have some items
+    return True
+
+  def __getitem__(self, idx):
+    if self.pos == self.end:
+      raise IndexError
+
+    self.fp.seek(self.pos)
+    line = self.fp.readline(self.end - self.pos)
+    self.pos = self.pos + len(line)
+
+    line, ltype, self.seen_change = _classify_diff_line(line, self.seen_change)
+    return _data(
+      raw=line,
+      text=line[1:-1],  # remove indicator and newline
+      type=ltype,
+      )
+
 class DifflibDiffContent():
   "This is a generator-like object returning annotated lines of a diff."
 
@@ -1125,6 +1808,102 @@ class DifflibDiffContent():
       type=ltype,
       )
 
+def get_file_sizes(diff, pool):
+  """Return the sizes of the files compared by the svn.fs.FileDiff DIFF,
+  as a (from size, to size) pair; a missing file has a size of 0."""
+  sizes = [ ]
+  for root, path in ((diff.root1, diff.path1), (diff.root2, diff.path2)):
+    if path is None:
+      sizes.append(0)
+    else:
+      sizes.append(svn.fs.file_length(root, path, pool))
+  return tuple(sizes)
+
+
+class _DiffLineSplitter:
+  "A file-like object splitting what is written to it into lines."
+
+  def __init__(self):
+    self.lines = [ ]
+    self.partial = b''
+
+  def write(self, data):
+    lines = (self.partial + data).split(b'\n')
+    self.partial = lines.pop()
+    self.lines.extend([line + b'\n' for line in lines])
+
+  def close(self):
+    if self.partial:
+      self.lines.append(self.partial + b'\n')
+      self.partial = b''
+
+
+def internal_diff(original, modified, label_from, label_to, pool):
+  """Return the lines of the unified diff between the byte strings
+  ORIGINAL and MODIFIED, as made by Subversion's diff library."""
+  options = svn.diff.file_options_create(pool)
+  diffobj = svn.diff.mem_string_diff(original, modified, options, pool)
+  output = _DiffLineSplitter()
+  svn.diff.mem_string_output_unified3(output, diffobj, True, None,
+                                      to_bytes(label_from),
+                                      to_bytes(label_to),
+                                      b'utf8', original, modified,
+                                      options.context_size, None, pool)
+  output.close()
+  return output.lines
+
+
+class InternalDiffContent:
+  """This is a generator-like object returning annotated lines of a diff,
+  made by Subversion's diff library from the repository contents, without
+  temporary files nor diff process."""
+
+  def __init__(self, diff, label_from, label_to, pool):
+    self.seen_change = False
+
+    subpool = svn.core.svn_pool_create(pool)
+    try:
+      self.lines = internal_diff(self._read(diff.root1, diff.path1, subpool),
+                                 self._read(diff.root2, diff.path2, subpool),
+                                 label_from, label_to, subpool)
+    finally:
+      svn.core.svn_pool_destroy(subpool)
+    self.idx = 0
+
+  def _read(self, root, path, pool):
+    if path is None:
+      return b''
+    stream = svn.fs.file_contents(root, path, pool)
+    chunks = [ ]
+    try:
+      while True:
+        chunk = svn.core.svn_stream_read(stream,
+                                         svn.core.SVN_STREAM_CHUNK_SIZE)
+        if not chunk:
+          break
+        chunks.append(chunk)
+    finally:
+      svn.core.svn_stream_close(stream)
+    return b''.join(chunks)
+
+  def __nonzero__(self):
+    # we always have some items
+    return True
+
+  def __getitem__(self, idx):
+    if self.idx == len(self.lines):
+      raise IndexError
+
+    line = self.lines[self.idx]
+    self.idx = self.idx + 1
+
+    line, ltype, self.seen_change = _classify_diff_line(line, self.seen_change)
+    return _data(
+      raw=line,
+      text=line[1:-1],  # remove indicator and newline
+      type=ltype,
+      )
+
 class TextCommitRenderer:
   "This class will render the commit mail in plain text."
 
@@ -1244,6 +2023,14 @@ class TextCommitRenderer:
           w('Binary file (source and/or target). No diff available.\n')
         continue
 
+      if diff.sizes:
+        if diff.singular:
+          w('Large file (%d bytes). No diff available.\n' % max(diff.sizes))
+        else:
+          w('Large file (source %d bytes, target %d bytes).'
+            ' No diff available.\n' % diff.sizes)
+        continue
+
       wb = self.output.write_binary
       for line in diff.content:
         wb(line.raw)
@@ -1335,16 +2122,21 @@ class Config:
       ob = getattr(ob, part)
     return ob
 
-  def get(self, option, group, params):
-    "Get a config value with appropriate substitutions and value mapping."
-
-    # find the right value
+  def get_raw(self, option, group):
+    "Get a config value as written, without substitutions or value mapping."
     value = None
     if group:
       sub = getattr(self, group)
       value = getattr(sub, option, None)
     if value is None:
       value = getattr(self.defaults, option, '')
+    return value
+
+  def get(self, option, group, params):
+    "Get a config value with appropriate substitutions and value mapping."
+
+    # find the right value
+    value = self.get_raw(option, group)
 
     # parameterize it
     if params is not None:
@@ -1471,13 +2263,38 @@ class Config:
       # there is no self.defaults.for_paths
       pass
 
+    self._group_matcher = _GroupMatcher(self._group_re)
+
+    # the search_logmsg matches of each group, for self._logmsg
+    self._logmsg = None
+    self._logmsg_matches = { }
+
+  def _get_logmsg_matches(self, idx, search_logmsg_re, logmsg):
+    """Return the list of the groupdicts of the matches of SEARCH_LOGMSG_RE,
+    the regex of group number IDX, in LOGMSG. They are computed once per
+    log message, rather than once per path."""
+    if logmsg is not self._logmsg and logmsg != self._logmsg:
+      self._logmsg = logmsg
+      self._logmsg_matches = { }
+    try:
+      return self._logmsg_matches[idx]
+    except KeyError:
+      matches = self._logmsg_matches[idx] = \
+        [match.groupdict() for match in search_logmsg_re.finditer(logmsg)]
+      return matches
+
   def which_groups(self, path, logmsg):
     "Return the path's associated groups."
     groups = []
-    for group, pattern, exclude_pattern, repos_params, search_logmsg_re in self._group_re:
-      match = pattern.match(to_str(path))
+    path = to_str(path)
+    if logmsg is None:
+      logmsg = ''
+    for idx in self._group_matcher.candidates(path):
+      group, pattern, exclude_pattern, repos_params, search_logmsg_re = \
+        self._group_re[idx]
+      match = pattern.match(path)
       if match:
-        if exclude_pattern and exclude_pattern.match(to_str(path)):
+        if exclude_pattern and exclude_pattern.match(path):
           continue
         params = repos_params.copy()
         params.update(match.groupdict())
@@ -1485,13 +2302,11 @@ class Config:
         if search_logmsg_re is None:
           groups.append((group, params))
         else:
-          if logmsg is None:
-            logmsg = ''
-
-          for match in search_logmsg_re.finditer(logmsg):
+          for groupdict in self._get_logmsg_matches(idx, search_logmsg_re,
+                                                    logmsg):
             # Add captured variables to (a copy of) params
             msg_params = params.copy()
-            msg_params.update(match.groupdict())
+            msg_params.update(groupdict)
             groups.append((group, msg_params))
 
     if not groups:
@@ -1500,6 +2315,95 @@ class Config:
     return groups
 
 
+def _literal_prefix(regex):
+  """Return the literal text which starts every string that the compiled
+  regular expression REGEX matches (with re.match()). This is
+  conservative: it may be shorter than it could be, down to the empty
+  string."""
+  pattern = regex.pattern
+  if '|' in pattern or regex.flags & (re.IGNORECASE | re.VERBOSE):
+    # the alternatives might not share anything, and the flags change the
+    # meaning of literal characters
+    return ''
+  prefix = [ ]
+  i = 0
+  if pattern[:1] == '^':
+    i = 1
+  while i < len(pattern):
+    c = pattern[i]
+    if c == '\\':
+      c = pattern[i+1:i+2]
+      if not c or c.isalnum() or c == '_':
+        # a character class, a backreference or some special character
+        break
+      i = i + 2
+    elif c in '.^$*+?{}[]()':
+      break
+    else:
+      i = i + 1
+    if pattern[i:i+1] in ('*', '?', '{'):
+      # this character may not be there at all
+      break
+    prefix.append(c)
+    if pattern[i:i+1] == '+':
+      break
+  return ''.join(prefix)
+
+
+class _GroupMatcher:
+  """Find the groups whose for_paths regex may match a path, without
+  trying the regex of every group on every path.
+
+  The literal prefixes of the regexes are kept in a trie, so the
+  candidates for a path are found by walking the trie along the path. The
+  walk along the directory of the path is cached, and shared by the paths
+  of that directory."""
+
+  def __init__(self, group_re):
+    # The nodes of the trie are dictionaries mapping a character to the
+    # child node, and None to the numbers of the groups (in GROUP_RE) whose
+    # prefix ends there.
+    self.trie = { }
+    for idx, (group, pattern, exclude_pattern, repos_params,
+              search_logmsg_re) in enumerate(group_re):
+      node = self.trie
+      for c in _literal_prefix(pattern):
+        node = node.setdefault(c, { })
+      node.setdefault(None, [ ]).append(idx)
+
+    # directory -> (groups found along it, trie node at its end or None)
+    self.dir_cache = { }
+
+  def _walk(self, node, text, found):
+    """Walk the trie from NODE along TEXT, adding the groups met to FOUND.
+    Return the node reached, or None if the walk fell off the trie."""
+    for c in text:
+      node = node.get(c)
+      if node is None:
+        return None
+      found.extend(node.get(None, ()))
+    return node
+
+  def candidates(self, path):
+    """Return the numbers of the groups, in order, whose for_paths regex
+    may match PATH; the other ones do not."""
+    dirname = path[:path.rfind('/') + 1]
+    try:
+      found, node = self.dir_cache[dirname]
+    except KeyError:
+      found = list(self.trie.get(None, ()))
+      node = self._walk(self.trie, dirname, found)
+      found.sort()
+      self.dir_cache[dirname] = found, node
+
+    if node is None:
+      return found
+    found = found[:]
+    self._walk(node, path[len(dirname):], found)
+    found.sort()
+    return found
+
+
 class _sub_section:
   pass
 
@@ -1529,6 +2433,7 @@ if __name__ == '__main__':
        %s propchange2 REPOS REVISION AUTHOR REVPROPNAME ACTION [CONFIG-FILE]
        %s lock        REPOS AUTHOR [CONFIG-FILE]
        %s unlock      REPOS AUTHOR [CONFIG-FILE]
+       %s deliver     REPOS [CONFIG-FILE]
 
 If no CONFIG-FILE is provided, the script will first search for a mailer.conf
 file in REPOS/conf/.  Failing that, it will search the directory in which
@@ -1538,7 +2443,11 @@ ACTION was added as a fifth argument to the post-revprop-change hook
 in Subversion 1.2.0.  Its value is one of 'A', 'M' or 'D' to indicate
 if the property was added, modified or deleted, respectively.
 
-""" % (scriptname, scriptname, scriptname, scriptname, scriptname))
+The deliver subcommand sends the messages written into the spool_dir of
+the configuration file by the other subcommands.
+
+""" % (scriptname, scriptname, scriptname, scriptname, scriptname,
+       scriptname))
     sys.exit(1)
 
   # Command list:  subcommand -> number of arguments expected (not including
@@ -1548,6 +2457,7 @@ if the property was added, modified or deleted, respectively.
               'propchange2': 4,
               'lock'       : 1,
               'unlock'     : 1,
+              'deliver'    : 0,
               }
 
   config_fname = None
@@ -0,0 +1,81 @@
+#!/bin/sh
+#
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+#
+#
+# mailer-t2.sh: test #2 for the mailer.py script
+#
+# This test generates the same "email" as mailer-t1.sh, but with the
+# diffs made by Subversion's diff library ("diff = internal") rather than
+# by /usr/bin/diff.  The output must be the same.  It then checks the
+# property diff of a revprop change, which uses the same engine.
+#
+# Note: mailer-tweak.py must have been run to make the test outputs
+#       consistent and reproducible
+#
+# USAGE: ./mailer-t2.sh REPOS MAILER-SCRIPT
+#
+
+if test "$#" != 2; then
+    echo "USAGE: ./mailer-t2.sh REPOS MAILER-SCRIPT"
+    exit 1
+fi
+
+scripts="`dirname $0`"
+scripts="`cd $scripts && pwd`"
+
+glom=$scripts/mailer-t2.current
+orig=$scripts/mailer-t1.output
+conf=$scripts/mailer-t2.conf
+rm -f $glom
+
+sed 's/^diff = .*/diff = internal/' $scripts/mailer.conf > $conf
+
+export TZ=GST
+
+youngest="`svnlook youngest $1`"
+for rev in `python -c "print(\" \".join(map(str, range(1,$youngest+1))))"`; do
+  $2 commit $1 $rev $conf >> $glom
+done
+
+echo "current mailer.py output in: $glom"
+
+dos2unix $glom
+
+echo diff -q $orig $glom
+diff -q $orig $glom || exit 1
+
+# The log message of r1 is "initial load", without a newline.
+propdiff=$scripts/mailer-t2.propdiff
+printf 'old log' | $2 propchange2 $1 1 "mailer test" svn:log M $conf \
+  | sed -n '/^Property diff:$/,$p' > $propdiff
+cat <<'END' | diff - $propdiff || exit 1
+Property diff:
+--- old property value
++++ new property value
+@@ -1 +1 @@
+-old log
+\ No newline at end of file
++initial load
+\ No newline at end of file
+END
+
+rm -f $conf $propdiff
+echo "SUCCESS: no differences detected"
@@ -0,0 +1,138 @@
+#!/usr/local/bin/python
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+#
+# A variant of commit-hook.py which reads the commit through the Subversion
+# Python bindings, instead of running svnlook three times, and hands the
+# notification to pubsub-relay.py, which keeps a connection open to the
+# svnpubsub server.  If the relay is not running, the notification is PUT
+# to the server directly.
+#
+# Usage, from the post-commit hook:
+#   commit-hook-bindings.py $REPOS $REV
+#
+
+HOST="127.0.0.1"
+PORT=2069
+
+import sys
+import socket
+try:
+    import simplejson as json
+except ImportError:
+    import json
+try:
+    import httplib
+except ImportError:
+    import http.client as httplib
+
+import svn.core
+import svn.fs
+import svn.repos
+
+import svnpubsub.relay
+
+RELAY_SOCKET = svnpubsub.relay.SOCKET
+
+
+def to_str(value):
+    "The bindings give bytes under Python 3; the JSON needs text."
+    if isinstance(value, bytes) and str is not bytes:
+        return value.decode('utf-8')
+    return value
+
+def changed_paths(fs, root, revision):
+    """Return the paths changed in ROOT, with their flags, the way
+    'svnlook changed' prints them."""
+    base_root = None
+    changed = {}
+    for path, change in svn.fs.paths_changed2(root).items():
+        flags = ['_', ' ', ' ']
+        # svnlook shows replacements as additions
+        if change.change_kind in (svn.fs.path_change_add,
+                                  svn.fs.path_change_replace):
+            flags[0] = 'A'
+        elif change.change_kind == svn.fs.path_change_delete:
+            flags[0] = 'D'
+        else:
+            if not change.text_mod and not change.prop_mod:
+                continue
+            if change.text_mod:
+                flags[0] = 'U'
+            if change.prop_mod:
+                flags[1] = 'U'
+
+        kind = change.node_kind
+        if kind == svn.core.svn_node_unknown:
+            # Older filesystems don't record the kind of the node.
+            if change.change_kind == svn.fs.path_change_delete:
+                if base_root is None:
+                    base_root = svn.fs.revision_root(fs, revision - 1)
+                kind = svn.fs.check_path(base_root, path)
+            else:
+                kind = svn.fs.check_path(root, path)
+        path = to_str(path).lstrip('/')
+        if kind == svn.core.svn_node_dir:
+            path += '/'
+        changed[path] = {'flags': ''.join(flags)}
+    return changed
+
+def commit_data(repo, revision):
+    "Return the notification of REVISION in the repository REPO."
+    fs = svn.repos.fs(svn.repos.open(svn.core.svn_path_canonicalize(repo)))
+    props = svn.fs.revision_proplist(fs, revision)
+    root = svn.fs.revision_root(fs, revision)
+
+    props = dict([(to_str(name), to_str(value))
+                  for name, value in props.items()])
+    date = props.get(svn.core.SVN_PROP_REVISION_DATE)
+    if date:
+        date = to_str(svn.core.svn_time_to_human_cstring(
+                        svn.core.svn_time_from_cstring(date)))
+    return {'type': 'svn',
+            'format': 1,
+            'id': revision,
+            'changed': changed_paths(fs, root, revision),
+            'repository': to_str(svn.fs.get_uuid(fs)),
+            'committer': props.get(svn.core.SVN_PROP_REVISION_AUTHOR, ''),
+            'log': (props.get(svn.core.SVN_PROP_REVISION_LOG) or '').strip(),
+            'date': date or '',
+            }
+
+def do_put(body):
+    conn = httplib.HTTPConnection(HOST, PORT)
+    conn.request('PUT', '/commits', body,
+                 {'Content-Type': 'application/json'})
+    conn.getresponse().read()
+    conn.close()
+
+
+def main(repo, revision):
+    revision = int(revision.lstrip('r'))
+    body = json.dumps(commit_data(repo, revision))
+    try:
+        svnpubsub.relay.submit(RELAY_SOCKET, '/commits', body)
+    except (socket.error, svnpubsub.relay.RelayException):
+        do_put(body)
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4):
+        sys.stderr.write("invalid args\n")
+        sys.exit(1)
+
+    main(*sys.argv[1:3])
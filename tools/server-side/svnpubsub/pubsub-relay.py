@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+#
+# pubsub-relay - Queue the notifications of the hooks, and send them to
+# the svnpubsub server over a persistent connection.
+#
+# Example:
+#  pubsub-relay.py --socket=/var/run/svnpubsub/relay.sock
+#
+# See svnpubsub/relay.py, and commit-hook-bindings.py for a hook using it.
+#
+
+import sys
+import os
+import logging
+import optparse
+
+import daemonize
+import svnpubsub.relay
+
+
+class Daemon(daemonize.Daemon):
+    def __init__(self, logfile, pidfile, relay):
+        daemonize.Daemon.__init__(self, logfile, pidfile)
+
+        self.relay = relay
+
+    def setup(self):
+        # There is no setup which the parent needs to wait for.
+        pass
+
+    def run(self):
+        logging.info('pubsub-relay started, pid=%d', os.getpid())
+        self.relay.serve_forever()
+
+
+def main(args):
+    parser = optparse.OptionParser(
+        description='Relay the notifications of the hooks to an SvnPubSub '
+                    'server.',
+        usage='Usage: %prog [options]',
+        )
+    parser.add_option('--socket', default=svnpubsub.relay.SOCKET,
+                      help='the socket the hooks write to (default: %default)')
+    parser.add_option('--host', default='127.0.0.1',
+                      help='the SvnPubSub server (default: %default)')
+    parser.add_option('--port', type='int', default=2069,
+                      help='the SvnPubSub port (default: %default)')
+    parser.add_option('--logfile',
+                      help='filename for logging')
+    parser.add_option('--pidfile',
+                      help="the process' PID will be written to this file")
+    parser.add_option('--daemon', action='store_true',
+                      help='run as a background daemon')
+
+    options, extra = parser.parse_args(args)
+
+    if extra:
+        parser.error('unexpected arguments')
+    if options.daemon and not options.logfile:
+        parser.error('LOGFILE is required when running as a daemon')
+    if options.daemon and not options.pidfile:
+        parser.error('PIDFILE is required when running as a daemon')
+
+    if options.logfile:
+        handler = logging.FileHandler(options.logfile)
+    else:
+        handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter(
+        '%(asctime)s [%(levelname)s] %(message)s', '%Y-%m-%d %H:%M:%S'))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+
+    relay = svnpubsub.relay.Relay(options.socket, options.host, options.port)
+    d = Daemon('/dev/null', options.pidfile and os.path.abspath(options.pidfile),
+               relay)
+    if options.daemon:
+        # Daemonize the process and call sys.exit() with appropriate code
+        d.daemonize_exit()
+    else:
+        # Just run in the foreground (the default)
+        d.foreground()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
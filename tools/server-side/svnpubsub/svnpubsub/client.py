@@ -31,6 +31,12 @@
 #   ping:      the server has sent a keepalive
 #   stale:     no activity has been seen, so the connection will be closed
 #                 and reopened
+#   missed:    some of the notifications sent while the client was
+#                 disconnected could not be replayed by the server
+#
+# MultiClient remembers the sequence number of the last notification seen
+# from each server, and asks for the notifications that followed it when
+# it reconnects.  Those are delivered before the new ones, as usual.
 #
 
 import asyncore
@@ -63,7 +69,7 @@ class SvnpubsubClientException(Exception):
 class Client(asynchat.async_chat):
 
   def __init__(self, url, commit_callback, event_callback,
-               metadata_callback = None):
+               metadata_callback = None, since = None, seq_callback = None):
     asynchat.async_chat.__init__(self)
 
     self.last_activity = time.time()
@@ -76,15 +82,19 @@ class Client(asynchat.async_chat):
     host = parsed_url.hostname
     port = parsed_url.port
     resource = parsed_url.path
-    if parsed_url.query:
-      resource += "?%s" % parsed_url.query
+    query = parsed_url.query
+    if since is not None:
+      # Ask for the notifications that followed the last one seen.
+      query = '&'.join(filter(None, [query, 'since=%d' % since]))
+    if query:
+      resource += "?%s" % query
     if parsed_url.fragment:
       resource += "#%s" % parsed_url.fragment
 
     self.event_callback = event_callback
 
     self.parser = JSONRecordHandler(commit_callback, event_callback,
-                                    metadata_callback)
+                                    metadata_callback, seq_callback)
 
     # Wait for the end of headers. Then we start parsing JSON.
     self.set_terminator(b'\r\n\r\n')
@@ -140,10 +150,12 @@ class Metadata(Notification):
 
 
 class JSONRecordHandler:
-  def __init__(self, commit_callback, event_callback, metadata_callback):
+  def __init__(self, commit_callback, event_callback, metadata_callback,
+               seq_callback = None):
     self.commit_callback = commit_callback
     self.event_callback = event_callback
     self.metadata_callback = metadata_callback
+    self.seq_callback = seq_callback
 
   EXPECTED_VERSION = 1
 
@@ -156,14 +168,25 @@ class JSONRecordHandler:
           "Unknown svnpubsub format: %r != %d"
           % (actual_version, self.EXPECTED_VERSION))
       self.event_callback('version', obj['svnpubsub']['version'])
+      if obj['svnpubsub'].get('missed'):
+        self.event_callback('missed', None)
     elif 'commit' in obj:
       commit = Commit(obj['commit'])
       self.commit_callback(commit)
+      self._seen(commit)
     elif 'stillalive' in obj:
       self.event_callback('ping', obj['stillalive'])
-    elif 'metadata' in obj and self.metadata_callback:
+    elif 'metadata' in obj:
       metadata = Metadata(obj['metadata'])
-      self.metadata_callback(metadata)
+      if self.metadata_callback:
+        self.metadata_callback(metadata)
+      self._seen(metadata)
+
+  def _seen(self, notification):
+    # Only once the callback has dealt with it, so that a notification
+    # whose callback failed is sent again after reconnecting.
+    if self.seq_callback and hasattr(notification, 'seq'):
+      self.seq_callback(notification.seq)
 
 
 class MultiClient(object):
@@ -177,6 +200,9 @@ class MultiClient(object):
     self.target_time = 0
     self.work_items = [ ]
 
+    # The sequence number of the last notification seen from each URL
+    self.last_seq = { }
+
     for url in urls:
       self._add_channel(url)
 
@@ -198,18 +224,22 @@ class MultiClient(object):
     if not self.target_time:
       self.target_time = time.time() + RECONNECT_DELAY
 
+  def _seen(self, url, seq):
+    self.last_seq[url] = seq
+
   def _add_channel(self, url):
     # Simply instantiating the client will install it into the global map
     # for processing in the main event loop.
     if self.metadata_callback:
-      Client(url,
-             functools.partial(self.commit_callback, url),
-             functools.partial(self._reconnect, url),
-             functools.partial(self.metadata_callback, url))
+      metadata_callback = functools.partial(self.metadata_callback, url)
     else:
-      Client(url,
-             functools.partial(self.commit_callback, url),
-             functools.partial(self._reconnect, url))
+      metadata_callback = None
+    Client(url,
+           functools.partial(self.commit_callback, url),
+           functools.partial(self._reconnect, url),
+           metadata_callback,
+           self.last_seq.get(url),
+           functools.partial(self._seen, url))
 
   def _check_stale(self):
     now = time.time()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+#
+# Relay the notifications of the hooks to the svnpubsub server.
+#
+# The hooks hand each notification to submit(), which passes it over a
+# local socket to the relay daemon (see pubsub-relay.py) and returns as
+# soon as the daemon has queued it.  The daemon PUTs the notifications,
+# in order, over a single HTTP connection which it keeps open to the
+# server, reconnecting and retrying when that fails.
+#
+# On the local socket, a notification is sent as
+#     ${resource} ${length}\n${body}
+# where resource is /commits or /metadata, and the daemon answers "ok\n"
+# once it has queued it.  Queued notifications are only kept in memory.
+#
+
+import os
+import socket
+import threading
+import logging
+import time
+try:
+  import httplib
+except ImportError:
+  import http.client as httplib
+try:
+  import Queue
+except ImportError:
+  import queue as Queue
+
+# The default socket between the hooks and the relay daemon
+SOCKET = '/var/run/svnpubsub/relay.sock'
+
+# The resources a notification can be PUT to
+RESOURCES = ('/commits', '/metadata')
+
+# The largest notification accepted, in bytes
+MAX_BODY = 64 * 1024 * 1024
+
+# How long to wait on the local socket, and on the server
+TIMEOUT = 30.0
+
+# How long to wait before retrying when the server can't be reached.
+RETRY_DELAY = 5.0
+
+# Log a warning each time the queue grows by this many notifications.
+BACKLOG_TOO_HIGH = 100
+
+
+class RelayException(Exception):
+  pass
+
+
+def submit(socket_path, resource, body):
+  """Hand the notification BODY, to be PUT to RESOURCE, to the relay daemon
+  listening on SOCKET_PATH.  Raise socket.error if it can't be reached, or
+  RelayException if it refused the notification."""
+  if not isinstance(body, bytes):
+    body = body.encode('utf-8')
+  s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  try:
+    s.settimeout(TIMEOUT)
+    s.connect(socket_path)
+    s.sendall(('%s %d\n' % (resource, len(body))).encode('ascii') + body)
+    reply = _read_line(s)
+  finally:
+    s.close()
+  if reply != b'ok':
+    raise RelayException('notification refused: %r' % reply)
+
+
+def _read_line(s, limit=1024):
+  "Read a line from the socket S, and return it without its newline."
+  data = b''
+  while not data.endswith(b'\n'):
+    if len(data) > limit:
+      raise RelayException('line too long')
+    chunk = s.recv(1)
+    if not chunk:
+      raise RelayException('connection closed')
+    data += chunk
+  return data[:-1]
+
+def _read_exactly(s, size):
+  chunks = [ ]
+  while size:
+    chunk = s.recv(min(size, 65536))
+    if not chunk:
+      raise RelayException('connection closed')
+    chunks.append(chunk)
+    size -= len(chunk)
+  return b''.join(chunks)
+
+
+class Relay(object):
+  "The relay daemon, from SOCKET_PATH to the server at HOST:PORT."
+
+  def __init__(self, socket_path, host, port):
+    self.socket_path = socket_path
+    self.host = host
+    self.port = port
+    self.queue = Queue.Queue()
+
+  def serve_forever(self):
+    sender = threading.Thread(target=self._send_forever)
+    # The main thread/process should not wait for this thread to exit.
+    sender.setDaemon(True)
+    sender.start()
+
+    # Remove the socket left behind by a previous run.
+    if os.path.exists(self.socket_path):
+      os.remove(self.socket_path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(self.socket_path)
+    listener.listen(16)
+    logging.info('relaying from %s to %s:%d',
+                 self.socket_path, self.host, self.port)
+
+    while True:
+      conn, address = listener.accept()
+      try:
+        conn.settimeout(TIMEOUT)
+        self._receive(conn)
+      except (socket.error, RelayException):
+        logging.exception('receiving a notification')
+      conn.close()
+
+  def _receive(self, conn):
+    try:
+      resource, length = _read_line(conn).decode('ascii').split(' ')
+      length = int(length)
+    except ValueError:
+      raise RelayException('invalid header')
+    if resource not in RESOURCES or not 0 < length <= MAX_BODY:
+      conn.sendall(b'invalid\n')
+      raise RelayException('invalid notification: %s %d'
+                           % (resource, length))
+    body = _read_exactly(conn, length)
+    self.queue.put((resource, body))
+    conn.sendall(b'ok\n')
+
+    # Warn if the server doesn't keep up.
+    qsize = self.queue.qsize()
+    if qsize and qsize % BACKLOG_TOO_HIGH == 0:
+      logging.warn('relay backlog is at %d', qsize)
+
+  def _send_forever(self):
+    conn = None
+    while True:
+      # This will block until something arrives
+      resource, body = self.queue.get()
+
+      # Retry at once the first time: the server may just have closed
+      # the idle connection.
+      delay = 0
+      while True:
+        try:
+          if conn is None:
+            conn = httplib.HTTPConnection(self.host, self.port,
+                                          timeout=TIMEOUT)
+            conn.connect()
+            # The request may be written in two parts; don't let the
+            # second one wait for the acknowledgement of the first.
+            conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+          conn.request('PUT', resource, body,
+                       {'Content-Type': 'application/json'})
+          response = conn.getresponse()
+          response.read()
+          break
+        except (socket.error, httplib.HTTPException):
+          logging.exception('sending to %s:%d', self.host, self.port)
+          if conn is not None:
+            conn.close()
+            conn = None
+          time.sleep(delay)
+          delay = RETRY_DELAY
+
+      if response.status != 200:
+        # Resending it won't make it any better.
+        logging.error('%s refused by the server: %d %s',
+                      resource, response.status, response.reason)
@@ -51,6 +51,14 @@
 #   messages about that repository.  The repository can be * and then you
 #   will receive messages about all repositories.
 #
+#   Each notification has a sequence number, in its "seq" field.  A client
+#   which reconnects can add "?since=${seq}" to the URL, with the last
+#   sequence number it saw, to first receive the notifications it missed:
+#     curl -sN 'http://127.0.0.1:2069/commits?since=1234'
+#   They are taken from a log of the last notifications (see EventLog).
+#   If some of the missed notifications are no longer in the log, the
+#   first record says so, with "missed": true.
+#
 # Example Pub clients:
 #   curl -T revinfo.json -i http://127.0.0.1:2069/commits
 #
@@ -68,6 +76,8 @@ except ImportError:
     import json
 
 import sys
+import os
+import collections
 
 import twisted
 from twisted.internet import reactor
@@ -130,6 +140,145 @@ class Metadata(Notification):
             self.revprop['name'])
 
 
+# The number of notifications kept by an EventLog.
+EVENT_LOG_SIZE = 10000
+
+class EventLog(object):
+    """The last notifications, for the clients that reconnect to catch up
+    with the ones they missed.
+
+    Each notification is numbered, one more than the previous one.  The
+    last SIZE ones are kept in memory and, if FNAME is given, appended to
+    that file.  The file is rewritten with the last SIZE notifications only
+    once it grows to twice that, and is read back on startup, so that the
+    numbers carry on across restarts of the server."""
+
+    def __init__(self, fname=None, size=EVENT_LOG_SIZE):
+        self.fname = fname
+        self.size = size
+        # (seq, notification, data) of the last notifications
+        self.entries = collections.deque()
+        self.last_seq = 0
+        self.fp = None
+        self.lines = 0
+        if fname:
+            self._load()
+
+    def _load(self):
+        if os.path.exists(self.fname):
+            for line in open(self.fname):
+                try:
+                    obj = json.loads(line)
+                except ValueError:
+                    # the end of the file may have been cut short
+                    continue
+                for cls in (Commit, Metadata):
+                    if cls.KIND.lower() in obj:
+                        notification = cls(obj[cls.KIND.lower()])
+                        self._keep(notification.seq, notification,
+                                   line.rstrip('\n'))
+        self._rewrite()
+
+    def _rewrite(self):
+        if self.fp:
+            self.fp.close()
+        tmpname = self.fname + '.tmp'
+        fp = open(tmpname, 'w')
+        for seq, notification, data in self.entries:
+            fp.write(data + '\n')
+        fp.close()
+        os.rename(tmpname, self.fname)
+        self.fp = open(self.fname, 'a')
+        self.lines = len(self.entries)
+
+    def _keep(self, seq, notification, data):
+        self.entries.append((seq, notification, data))
+        if len(self.entries) > self.size:
+            self.entries.popleft()
+        self.last_seq = max(self.last_seq, seq)
+
+    def add(self, notification):
+        """Number NOTIFICATION, setting its seq attribute, and keep it.
+        Return its rendering."""
+        notification.seq = self.last_seq + 1
+        data = notification.render()
+        self._keep(notification.seq, notification, data)
+        if self.fp:
+            self.fp.write(data + '\n')
+            self.fp.flush()
+            self.lines += 1
+            if self.lines >= 2 * self.size:
+                self._rewrite()
+        return data
+
+    def since(self, seq):
+        """Return (missed, entries): the (seq, notification, data) of the
+        notifications after SEQ, oldest first, and whether some of them
+        are no longer known."""
+        if seq > self.last_seq:
+            # this log was started anew after the client saw SEQ
+            return True, list(self.entries)
+        entries = [ ]
+        for entry in reversed(self.entries):
+            if entry[0] <= seq:
+                break
+            entries.append(entry)
+        entries.reverse()
+        if entries:
+            missed = entries[0][0] > seq + 1
+        else:
+            missed = seq < self.last_seq
+        return missed, entries
+
+
+class Subscriptions(object):
+    """The connected clients, indexed by what they subscribed to.
+
+    Each client is in the bucket of its (kind, type, repository), where
+    type and repository are None for the wildcard, so that a notification
+    only visits the four buckets which may be interested in it."""
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, c):
+        key = (c.kind, c.type, c.repository)
+        self.buckets.setdefault(key, set()).add(c)
+        self.count += 1
+
+    def remove(self, c):
+        key = (c.kind, c.type, c.repository)
+        bucket = self.buckets.get(key)
+        if bucket is None or c not in bucket:
+            raise ValueError('Unknown client')
+        bucket.remove(c)
+        if not bucket:
+            del self.buckets[key]
+        self.count -= 1
+
+    def interested_in(self, notification):
+        """Yield the clients interested in NOTIFICATION."""
+        kind = notification.KIND
+        for type in (notification.type, None):
+            for repository in (notification.repository, None):
+                bucket = self.buckets.get((kind, type, repository))
+                if bucket:
+                    # a copy, as a client may go away while being written to
+                    for c in list(bucket):
+                        yield c
+
+
+def encode_record(data):
+    """Return the record sent to the clients for the JSON DATA."""
+    if not isinstance(data, bytes):
+        data = data.encode('utf-8')
+    return data + b"\n\0"
+
+
 HEARTBEAT_TIME = 15
 
 class Client(object):
@@ -166,8 +315,17 @@ class Client(object):
     def notify(self, data):
         self.write(data)
 
-    def start(self):
-        self.write_start()
+    def start(self, since=None):
+        """Start the stream.  If SINCE is not None, first send the logged
+        notifications that followed the one numbered SINCE."""
+        if since is None:
+            self.write_start()
+        else:
+            missed, entries = self.pubsub.event_log.since(since)
+            self.write_start(missed)
+            for seq, notification, data in entries:
+                if self.interested_in(notification):
+                    self.write_record(encode_record(data))
         reactor.callLater(HEARTBEAT_TIME, self.heartbeat, None)
 
     def heartbeat(self, args):
@@ -178,14 +336,23 @@ class Client(object):
     def write_data(self, data):
         self.write(data + "\n\0")
 
+    def write_record(self, record):
+        """Write RECORD, as returned by encode_record()."""
+        self.r.write(record)
+
     """ "Data must not be unicode" is what the interfaces.ITransport says... grr. """
     def write(self, input):
         self.r.write(str(input))
 
-    def write_start(self):
+    def write_start(self, missed=None):
         self.r.setHeader('X-SVNPubSub-Version', '1')
         self.r.setHeader('content-type', 'application/vnd.apache.vc-notify+json')
-        self.write('{"svnpubsub": {"version": 1}}\n\0')
+        if missed is None:
+            self.write('{"svnpubsub": {"version": 1}}\n\0')
+        else:
+            self.write(json.dumps({"svnpubsub": {"version": 1,
+                                                 "missed": missed}})
+                       + "\n\0")
 
     def write_heartbeat(self):
         self.write(json.dumps({"stillalive": time.time()}) + "\n\0")
@@ -193,14 +360,15 @@ class Client(object):
 
 class SvnPubSub(resource.Resource):
     isLeaf = True
-    clients = []
+    clients = Subscriptions()
 
     __notification_uri_map = {'commits': Commit.KIND,
                               'metadata': Metadata.KIND}
 
-    def __init__(self, notification_class):
+    def __init__(self, notification_class, event_log):
         resource.Resource.__init__(self)
         self.__notification_class = notification_class
+        self.event_log = event_log
 
     def cc(self):
         return len(self.clients)
@@ -215,7 +383,15 @@ class SvnPubSub(resource.Resource):
         repository = None
         type = None
 
-        uri = request.uri.split('/')
+        since = request.args.get('since')
+        if since is not None:
+            try:
+                since = int(since[0])
+            except ValueError:
+                request.setResponseCode(400)
+                return "Invalid since\n"
+
+        uri = request.path.split('/')
         uri_len = len(uri)
         if uri_len < 2 or uri_len > 4:
             request.setResponseCode(400)
@@ -233,24 +409,25 @@ class SvnPubSub(resource.Resource):
           repository = uri[3]
 
         # Convert wild card to None.
-        if type == '*':
+        if not type or type == '*':
           type = None
-        if repository == '*':
+        if not repository or repository == '*':
           repository = None
 
         c = Client(self, request, kind, type, repository)
-        self.clients.append(c)
-        c.start()
+        self.clients.add(c)
+        c.start(since)
         return twisted.web.server.NOT_DONE_YET
 
     def notifyAll(self, notification):
-        data = notification.render()
+        data = self.event_log.add(notification)
 
         log.msg("%s: %s (%d clients)"
                 % (notification.KIND, notification.render_log(), self.cc()))
-        for client in self.clients:
-            if client.interested_in(notification):
-                client.write_data(data)
+        # Encode the record once for all the clients.
+        record = encode_record(data)
+        for client in self.clients.interested_in(notification):
+            client.write_record(record)
 
     def render_PUT(self, request):
         request.setHeader('content-type', 'text/plain')
@@ -273,10 +450,14 @@ class SvnPubSub(resource.Resource):
         return "Ok"
 
 
-def svnpubsub_server():
+def svnpubsub_server(event_log_fname=None):
+    """Return the site serving the notifications.  They are logged into
+    the file EVENT_LOG_FNAME, if given, so that clients can catch up with
+    them even after a restart of the server."""
     root = resource.Resource()
-    c = SvnPubSub(Commit)
-    m = SvnPubSub(Metadata)
+    event_log = EventLog(event_log_fname)
+    c = SvnPubSub(Commit, event_log)
+    m = SvnPubSub(Metadata, event_log)
     root.putChild('commits', c)
     root.putChild('metadata', m)
     return server.Site(root)
@@ -284,6 +465,7 @@ def svnpubsub_server():
 if __name__ == "__main__":
     log.startLogging(sys.stdout)
     # Port 2069 "HTTP Event Port", whatever, sounds good to me
-    reactor.listenTCP(2069, svnpubsub_server())
+    # The optional argument is the file where the notifications are logged.
+    reactor.listenTCP(2069, svnpubsub_server(*sys.argv[1:2]))
     reactor.run()
 
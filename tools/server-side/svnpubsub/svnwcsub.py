@@ -37,8 +37,6 @@
 # - remove wc_ready(). assume all WorkingCopy instances are usable.
 #   place the instances into .watch at creation. the .update_applies()
 #   just returns if the wc is disabled (eg. could not find wc dir)
-# - figure out way to avoid the ASF-specific PRODUCTION_RE_FILTER
-#   (a base path exclusion list should work for the ASF)
 # - add support for SIGHUP to reread the config and reinitialize working copies
 # - joes will write documentation for svnpubsub as these items become fulfilled
 # - make LOGLEVEL configurable
@@ -49,20 +47,15 @@ import threading
 import sys
 import stat
 import os
-import re
-import posixpath
 try:
   import ConfigParser
 except ImportError:
   import configparser as ConfigParser
 import time
 import logging.handlers
-try:
-  import Queue
-except ImportError:
-  import queue as Queue
 import optparse
 import functools
+import collections
 try:
   import urlparse
 except ImportError:
@@ -134,27 +127,6 @@ class WorkingCopy(object):
         except:
             logging.exception('problem with working copy: %s', path)
 
-    def update_applies(self, uuid, path):
-        if self.uuid != uuid:
-            return False
-
-        path = str(path)
-        if path == self.match:
-            #print "ua: Simple match"
-            # easy case. woo.
-            return True
-        if len(path) < len(self.match):
-            # path is potentially a parent directory of match?
-            #print "ua: parent check"
-            if self.match[0:len(path)] == path:
-                return True
-        if len(path) > len(self.match):
-            # path is potentially a sub directory of match
-            #print "ua: sub dir check"
-            if path[0:len(self.match)] == self.match:
-                return True
-        return False
-
     def _get_match(self, svnbin, env):
         ### quick little hack to auto-checkout missing working copies
         dotsvn = os.path.join(self.path, ".svn")
@@ -177,7 +149,44 @@ class WorkingCopy(object):
         return str(relpath), uuid
 
 
-PRODUCTION_RE_FILTER = re.compile("/websites/production/[^/]+/")
+def path_components(path):
+    "Return the list of the components of the repository PATH."
+    return [name for name in path.split('/') if name]
+
+class WorkingCopyTrie(object):
+    """The watched working copies, by repository UUID and by the components
+    of their path in that repository, to find those a changed path touches.
+
+    Each node is a pair ({name: child node}, [working copies])."""
+
+    def __init__(self):
+        self.roots = { }
+
+    def add(self, wc):
+        node = self.roots.setdefault(wc.uuid, ({ }, [ ]))
+        for name in path_components(wc.match):
+            node = node[0].setdefault(name, ({ }, [ ]))
+        node[1].append(wc)
+
+    def lookup(self, uuid, path):
+        """Return the set of the working copies of the repository UUID
+        that contain PATH, or that PATH contains."""
+        node = self.roots.get(uuid)
+        if node is None:
+            return set()
+        found = set(node[1])
+        for name in path_components(path):
+            node = node[0].get(name)
+            if node is None:
+                return found
+            found.update(node[1])
+        stack = list(node[0].values())
+        while stack:
+            node = stack.pop()
+            found.update(node[1])
+            stack.extend(node[0].values())
+        return found
+
 
 class BigDoEverythingClasss(object):
     def __init__(self, config):
@@ -186,8 +195,11 @@ class BigDoEverythingClasss(object):
         self.tracking = config.get_track()
         self.hook = config.get_optional_value('hook')
         self.streams = config.get_value('streams').split()
-        self.worker = BackgroundWorker(self.svnbin, self.env, self.hook)
+        self.worker = WorkScheduler(self.svnbin, self.env, self.hook,
+                                    int(config.get_optional_value(
+                                          'workers', DEFAULT_WORKERS)))
         self.watch = [ ]
+        self.trie = WorkingCopyTrie()
 
     def start(self):
         for path, url in self.tracking.items():
@@ -199,12 +211,12 @@ class BigDoEverythingClasss(object):
         # Add it to our watchers, and trigger an svn update.
         logging.info("Watching WC at %s <-> %s" % (wc.path, wc.url))
         self.watch.append(wc)
+        self.trie.add(wc)
         self.worker.add_work(OP_BOOT, wc)
 
-    def _normalize_path(self, path):
-        if path[0] != '/':
-            return "/" + path
-        return posixpath.abspath(path)
+    def update_all(self):
+        for wc in self.watch:
+            self.worker.add_work(OP_UPDATE, wc)
 
     def commit(self, url, commit):
         if commit.type != 'svn' or commit.format != 1:
@@ -214,22 +226,13 @@ class BigDoEverythingClasss(object):
         logging.info("COMMIT r%d (%d paths) from %s"
                      % (commit.id, len(commit.changed), url))
 
-        paths = map(self._normalize_path, commit.changed)
-        if len(paths):
-            pre = posixpath.commonprefix(paths)
-            if pre == "/websites/":
-                # special case for svnmucc "dynamic content" buildbot commits
-                # just take the first production path to avoid updating all cms working copies
-                for p in paths:
-                    m = PRODUCTION_RE_FILTER.match(p)
-                    if m:
-                        pre = m.group(0)
-                        break
-
-            #print "Common Prefix: %s" % (pre)
-            wcs = [wc for wc in self.watch if wc.update_applies(commit.repository, pre)]
+        # Only update the working copies which a changed path touches.
+        wcs = set()
+        for path in commit.changed:
+            wcs.update(self.trie.lookup(commit.repository, path))
+        if commit.changed:
             logging.info("Updating %d WC for r%d" % (len(wcs), commit.id))
-            for wc in wcs:
+            for wc in sorted(wcs, key=lambda wc: wc.path):
                 self.worker.add_work(OP_UPDATE, wc)
 
 
@@ -239,32 +242,60 @@ OP_BOOT = 'boot'
 OP_UPDATE = 'update'
 OP_CLEANUP = 'cleanup'
 
-class BackgroundWorker(threading.Thread):
-    def __init__(self, svnbin, env, hook):
-        threading.Thread.__init__(self)
+# When more operations are pending for a working copy, only the one first
+# in this list is run: a boot is also an update, and updates clean up the
+# working copy when needed.
+OP_PRECEDENCE = [OP_BOOT, OP_UPDATE, OP_CLEANUP]
+
+# The default number of working copies updated at the same time
+DEFAULT_WORKERS = 4
 
-        # The main thread/process should not wait for this thread to exit.
-        ### compat with Python 2.5
-        self.setDaemon(True)
+class WorkScheduler(object):
+    """Run the operations on the working copies in background threads.
 
+    At most one operation is pending for each working copy: an update
+    requested while another is pending is the same update, since updates
+    go to HEAD.  Up to WORKERS working copies are operated on at the same
+    time, but never one working copy by two threads."""
+
+    def __init__(self, svnbin, env, hook, workers=DEFAULT_WORKERS):
         self.svnbin = svnbin
         self.env = env
         self.hook = hook
-        self.q = Queue.Queue()
+        self.workers = workers
+
+        self.cond = threading.Condition()
+        # {wc: operation} of the pending operations
+        self.pending = { }
+        # the working copies with a pending operation, none running, in
+        # the order they became pending
+        self.ready = collections.deque()
+        self.running = set()
+        # the working copies whose last operation failed
+        self.failed = set()
 
         self.has_started = False
 
-    def run(self):
-        while True:
-            # This will block until something arrives
-            operation, wc = self.q.get()
+    def _start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run)
+            # The main thread/process should not wait for this thread to exit.
+            ### compat with Python 2.5
+            thread.setDaemon(True)
+            thread.start()
 
-            # Warn if the queue is too long.
-            # (Note: the other thread might have added entries to self.q
-            # after the .get() and before the .qsize().)
-            qsize = self.q.qsize()+1
-            if operation != OP_BOOT and qsize > BACKLOG_TOO_HIGH:
-                logging.warn('worker backlog is at %d', qsize)
+    def _run(self):
+        while True:
+            self.cond.acquire()
+            try:
+                # This will block until something arrives
+                while not self.ready:
+                    self.cond.wait()
+                wc = self.ready.popleft()
+                operation = self.pending.pop(wc)
+                self.running.add(wc)
+            finally:
+                self.cond.release()
 
             try:
                 if operation == OP_UPDATE:
@@ -275,27 +306,53 @@ class BackgroundWorker(threading.Thread):
                     self._cleanup(wc)
                 else:
                     logging.critical('unknown operation: %s', operation)
+                self.failed.discard(wc)
             except:
                 logging.exception('exception in worker')
+                self.failed.add(wc)
 
-            # In case we ever want to .join() against the work queue
-            self.q.task_done()
+            self.cond.acquire()
+            try:
+                self.running.remove(wc)
+                # Work which arrived meanwhile can now proceed.
+                if wc in self.pending:
+                    self.ready.append(wc)
+                    self.cond.notify()
+            finally:
+                self.cond.release()
 
     def add_work(self, operation, wc):
-        # Start the thread when work first arrives. Thread-start needs to
+        # Start the threads when work first arrives. Thread-start needs to
         # be delayed in case the process forks itself to become a daemon.
         if not self.has_started:
-            self.start()
+            self._start()
             self.has_started = True
 
-        self.q.put((operation, wc))
+        self.cond.acquire()
+        try:
+            if wc in self.pending:
+                operation = min(operation, self.pending[wc],
+                                key=OP_PRECEDENCE.index)
+            else:
+                if wc not in self.running:
+                    self.ready.append(wc)
+                    self.cond.notify()
+            self.pending[wc] = operation
+
+            # Warn if the backlog is too long.
+            backlog = len(self.pending)
+            if operation != OP_BOOT and backlog > BACKLOG_TOO_HIGH:
+                logging.warn('worker backlog is at %d', backlog)
+        finally:
+            self.cond.release()
 
     def _update(self, wc, boot=False):
         "Update the specified working copy."
 
-        # For giggles, let's clean up the working copy in case something
-        # happened earlier.
-        self._cleanup(wc)
+        # Clean up the working copy in case the previous operation left it
+        # locked, or in case we were stopped during one.
+        if boot or wc in self.failed:
+            self._cleanup(wc)
 
         logging.info("updating: %s", wc.path)
 
@@ -441,6 +498,10 @@ class Daemon(daemonize.Daemon):
             logging.exception('from %s', url)
         elif event_name == 'ping':
             logging.debug('ping from %s', url)
+        elif event_name == 'missed':
+            # We can't tell which working copies the missed commits touched.
+            logging.warning('missed commits from %s, updating everything', url)
+            self.bdec.update_all()
         else:
             logging.info('"%s" from %s', event_name, url)
 